@@ -46,6 +46,10 @@ from tools.llm.guard import LLMGuard
 from tools.energy.ocpi_client import OCPIClient
 from api.middleware import request_id_and_logging_middleware
 from tools.events.bus import bus
+from tools.events.publisher import publisher
+from tools.mapping.dynamic import suggest_mappings
+from tools.mapping.incremental import IncrementalMappingSuggester
+from database.api_database import get_session_factory
 
 # Performance enhancements
 from api.performance_middleware import (
@@ -171,6 +175,22 @@ def create_app() -> FastAPI:
 
     coordinator = CoordinatorAgent(CoordinatorConfig())
     engine = AutomationEngine()
+    mapping_suggester = (
+        IncrementalMappingSuggester(settings.mapping_source_provider, settings.mapping_top_k)
+        if settings.mapping_incremental
+        else None
+    )
+    mapping_session_factory = get_session_factory(settings.database_url)
+    mapping_reload_task: Optional[asyncio.Task] = None
+
+    async def reload_mapping_suggestions() -> None:
+        # Writes from other processes (the event worker) never reach listen()
+        while True:
+            await asyncio.sleep(settings.mapping_reload_interval_seconds)
+            try:
+                await asyncio.to_thread(mapping_suggester.load, mapping_session_factory)
+            except Exception:
+                pass
     llm_guard = LLMGuard()
 
     api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
@@ -193,6 +213,12 @@ def create_app() -> FastAPI:
         
         await coordinator.start()
         await engine.start()
+        if mapping_suggester is not None:
+            nonlocal mapping_reload_task
+            await asyncio.to_thread(mapping_suggester.load, mapping_session_factory)
+            mapping_suggester.listen()
+            if settings.mapping_reload_interval_seconds > 0:
+                mapping_reload_task = asyncio.create_task(reload_mapping_suggestions())
         # Register capability adapters (optional/no-op if not available)
         try:
             register_capability_adapters()
@@ -203,6 +229,12 @@ def create_app() -> FastAPI:
     async def on_stop() -> None:
         await coordinator.stop()
         await engine.stop()
+        if mapping_suggester is not None:
+            if mapping_reload_task is not None:
+                mapping_reload_task.cancel()
+            mapping_suggester.unlisten()
+        await publisher.aclose()
+        twin_store.close()
         
         # Stop performance components
         await enhanced_cache.stop()
@@ -215,7 +247,9 @@ def create_app() -> FastAPI:
 
     @app.get("/events/health")
     async def events_health() -> Dict[str, Any]:
-        return bus.health()
+        health = bus.health()
+        health["publisher"] = publisher.stats()
+        return health
 
     # Performance monitoring endpoints
     @app.get("/performance/health")
@@ -797,6 +831,40 @@ def create_app() -> FastAPI:
         except Exception as exc:
             return {"suggestions": {}, "error": str(exc)}
 
+    async def computed_mapping_suggestions() -> List[Dict[str, Any]]:
+        if mapping_suggester is not None:
+            return mapping_suggester.suggestions()
+        return await asyncio.to_thread(
+            suggest_mappings,
+            mapping_session_factory,
+            settings.mapping_source_provider,
+            settings.mapping_top_k,
+        )
+
+    # Mapping suggestions computed from the stored twins
+    @app.get("/mapping/suggestions/auto", dependencies=[Depends(rate_limiter), Depends(require_api_key)])
+    async def get_auto_mapping_suggestions() -> Dict[str, Any]:
+        return {"suggestions": await computed_mapping_suggestions()}
+
+    @app.get(
+        "/mapping/suggestions/auto/{provider}/{external_id}",
+        dependencies=[Depends(rate_limiter), Depends(require_api_key)],
+    )
+    async def get_auto_mapping_suggestions_for(provider: str, external_id: str) -> Dict[str, Any]:
+        if mapping_suggester is not None:
+            row = mapping_suggester.suggestions_for(provider, external_id)
+        else:
+            row = next(
+                (
+                    r for r in await computed_mapping_suggestions()
+                    if r["source"].get("provider") == provider and r["source"].get("external_id") == external_id
+                ),
+                None,
+            )
+        if row is None:
+            raise HTTPException(status_code=404, detail="not found")
+        return row
+
     # Home Assistant local (re-added after extended endpoints)
     @app.get("/integrations/home_assistant/entities", dependencies=[Depends(rate_limiter), Depends(require_api_key)])
     async def home_assistant_entities() -> Dict[str, Any]:
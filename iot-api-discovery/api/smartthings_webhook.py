@@ -9,7 +9,7 @@ from fastapi import APIRouter, Request, HTTPException
 
 from config.settings import settings
 from storage.twins import store as twin_store
-from tools.events.bus import bus
+from tools.events.publisher import publisher
 from api.webhook_security import verify_hmac_base64, seen_event
 
 try:
@@ -49,13 +49,13 @@ async def smartthings_webhook(request: Request) -> Dict[str, Any]:
 
     # Event handling
     events: List[Dict[str, Any]] = (payload.get("eventData") or {}).get("events", [])
+    to_publish: List[Dict[str, Any]] = []
     for e in events:
         try:
             dev = e.get("deviceEvent") or {}
             if seen_event(dev.get("eventId", ""), ttl=300, prefix="st"):
                 continue
-            # Publish to event bus
-            bus.publish("smartthings.device_event", dev)
+            to_publish.append(dev)
             device_id = dev.get("deviceId")
             name = dev.get("displayName")
             capability = dev.get("capability")
@@ -67,5 +67,14 @@ async def smartthings_webhook(request: Request) -> Dict[str, Any]:
                 twin_store.upsert("smartthings", device_id, name, caps, state)
         except Exception as exc:
             _dlq_push({"error": str(exc), "event": e})
+    # Publish to event bus in one buffered batch
+    if to_publish:
+        results = await publisher.publish_many(
+            [("smartthings.device_event", dev) for dev in to_publish], return_exceptions=True
+        )
+        for dev, result in zip(to_publish, results):
+            # None means no backend is configured, which is not a failure
+            if isinstance(result, Exception):
+                _dlq_push({"error": f"publish failed: {result}", "event": dev})
     return {"ok": True}
 
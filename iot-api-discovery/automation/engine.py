@@ -8,6 +8,7 @@ from typing import Any, Dict, List, Optional
 
 from database.api_database import get_session_factory
 from database.models import AutomationRuleModel
+from automation.trigger_index import TriggerIndex
 
 
 @dataclass
@@ -23,6 +24,7 @@ class Rule:
 class AutomationEngine:
     def __init__(self) -> None:
         self._rules: Dict[str, Rule] = {}
+        self._index = TriggerIndex()
         self._event_queue: asyncio.Queue = asyncio.Queue()
         self._task: Optional[asyncio.Task] = None
         self._session_factory = get_session_factory("sqlite:///./iot_discovery.db")
@@ -41,13 +43,26 @@ class AutomationEngine:
             self._task = None
 
     def add_rule(self, rule: Rule) -> None:
-        self._rules[rule.id] = rule
+        self._register_rule(rule)
         asyncio.create_task(self._persist_rule(rule))
 
     def remove_rule(self, rule_id: str) -> None:
-        self._rules.pop(rule_id, None)
+        self._unregister_rule(rule_id)
         asyncio.create_task(self._delete_rule(rule_id))
 
+    def _register_rule(self, rule: Rule) -> None:
+        self._rules[rule.id] = rule
+        self._index.add(rule.id, rule.trigger)
+
+    def _unregister_rule(self, rule_id: str) -> None:
+        self._rules.pop(rule_id, None)
+        self._index.remove(rule_id)
+        self._last_fire_time.pop(rule_id, None)
+
+    def candidate_rules(self, event: Dict[str, Any]) -> List[Rule]:
+        rules = self._rules
+        return [rules[rid] for rid in self._index.candidates(event) if rid in rules]
+
     async def emit_event(self, event: Dict[str, Any]) -> None:
         await self._event_queue.put(event)
 
@@ -61,7 +76,7 @@ class AutomationEngine:
                 await self._tick_schedules()
 
     async def _evaluate(self, event: Dict[str, Any]) -> None:
-        for rule in list(self._rules.values()):
+        for rule in self.candidate_rules(event):
             if not rule.enabled:
                 continue
             if not self._match_trigger(rule.trigger, event):
@@ -168,13 +183,15 @@ class AutomationEngine:
         session = self._session_factory()
         try:
             for row in session.query(AutomationRuleModel).all():
-                self._rules[row.id] = Rule(
-                    id=row.id,
-                    trigger=json.loads(row.trigger),
-                    conditions=json.loads(row.conditions or "[]"),
-                    actions=json.loads(row.actions),
-                    enabled=row.enabled,
-                    throttle_seconds=None,  # not persisted; can be set at runtime
+                self._register_rule(
+                    Rule(
+                        id=row.id,
+                        trigger=json.loads(row.trigger),
+                        conditions=json.loads(row.conditions or "[]"),
+                        actions=json.loads(row.actions),
+                        enabled=row.enabled,
+                        throttle_seconds=None,  # not persisted; can be set at runtime
+                    )
                 )
         finally:
             session.close()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+
+BucketKey = Tuple[str, Hashable]
+
+
+def _bucket_key(key: str, value: Any) -> Optional[BucketKey]:
+    # a None trigger value also matches events that lack the key, so it can't anchor a rule
+    if value is None:
+        return None
+    try:
+        hash(value)
+    except TypeError:
+        return None
+    return (key, value)
+
+
+class TriggerIndex:
+    """Hash index from trigger key/value pairs to rule ids.
+
+    Each rule is filed under exactly one of its trigger pairs (the one whose
+    bucket is smallest at insert time), so an event only has to look up its own
+    key/value pairs to find every rule that could possibly match. Rules without
+    a hashable trigger pair (empty trigger, None or list/dict values) are kept in a
+    wildcard set and are always candidates. Callers still run the full trigger
+    match on the returned candidates.
+    """
+
+    def __init__(self) -> None:
+        self._buckets: Dict[BucketKey, Set[str]] = {}
+        self._wildcard: Set[str] = set()
+        self._anchor: Dict[str, Optional[BucketKey]] = {}
+        self._order: Dict[str, int] = {}
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._anchor)
+
+    def __contains__(self, rule_id: object) -> bool:
+        return rule_id in self._anchor
+
+    def add(self, rule_id: str, trigger: Dict[str, Any]) -> None:
+        if rule_id in self._anchor:
+            self.remove(rule_id, keep_order=True)
+        else:
+            self._order[rule_id] = self._seq
+            self._seq += 1
+        anchor: Optional[BucketKey] = None
+        best = -1
+        for k, v in (trigger or {}).items():
+            bk = _bucket_key(k, v)
+            if bk is None:
+                continue
+            size = len(self._buckets.get(bk, ()))
+            if anchor is None or size < best:
+                anchor, best = bk, size
+        self._anchor[rule_id] = anchor
+        if anchor is None:
+            self._wildcard.add(rule_id)
+        else:
+            self._buckets.setdefault(anchor, set()).add(rule_id)
+
+    def remove(self, rule_id: str, keep_order: bool = False) -> None:
+        if rule_id not in self._anchor:
+            return
+        anchor = self._anchor.pop(rule_id)
+        if not keep_order:
+            self._order.pop(rule_id, None)
+        if anchor is None:
+            self._wildcard.discard(rule_id)
+            return
+        bucket = self._buckets.get(anchor)
+        if bucket is not None:
+            bucket.discard(rule_id)
+            if not bucket:
+                del self._buckets[anchor]
+
+    def clear(self) -> None:
+        self._buckets.clear()
+        self._wildcard.clear()
+        self._anchor.clear()
+        self._order.clear()
+
+    def candidates(self, event: Dict[str, Any]) -> List[str]:
+        """Rule ids whose anchor pair is present in ``event``, in insertion order."""
+        found: Set[str] = set(self._wildcard)
+        for k, v in event.items():
+            bk = _bucket_key(k, v)
+            if bk is None:
+                continue
+            bucket = self._buckets.get(bk)
+            if bucket:
+                found.update(bucket)
+        if len(found) > 1:
+            order = self._order
+            return sorted(found, key=order.__getitem__)
+        return list(found)
+
+    def stats(self) -> Dict[str, int]:
+        sizes: Iterable[int] = (len(b) for b in self._buckets.values())
+        return {
+            "rules": len(self._anchor),
+            "buckets": len(self._buckets),
+            "wildcard": len(self._wildcard),
+            "largest_bucket": max(sizes, default=0),
+        }
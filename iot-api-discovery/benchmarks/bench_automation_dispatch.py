@@ -0,0 +1,79 @@
+"""Events/sec through AutomationEngine._evaluate, indexed vs. full rule scan.
+
+Usage: python -m benchmarks.bench_automation_dispatch --rules 10000 --events 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Dict, List
+
+from automation.engine import AutomationEngine, Rule
+
+
+def build_rules(n: int, devices: int) -> List[Rule]:
+    rules: List[Rule] = []
+    for i in range(n):
+        trigger: Dict[str, Any] = {"topic": "state", "deviceId": f"dev-{i % devices}"}
+        if i % 3 == 0:
+            trigger["attribute"] = random.choice(["switch", "level", "motion"])
+        rules.append(Rule(id=f"rule-{i}", trigger=trigger, conditions=[], actions=[]))
+    return rules
+
+
+def build_events(n: int, devices: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "topic": "state",
+            "deviceId": f"dev-{random.randrange(devices)}",
+            "attribute": random.choice(["switch", "level", "motion"]),
+        }
+        for _ in range(n)
+    ]
+
+
+async def _scan(engine: AutomationEngine, event: Dict[str, Any]) -> None:
+    # Pre-index behaviour: every rule is tested against every event.
+    for rule in list(engine._rules.values()):
+        if rule.enabled and engine._match_trigger(rule.trigger, event):
+            for action in rule.actions:
+                await engine._execute_action(action, event)
+
+
+async def run(rules: int, events: int, devices: int) -> None:
+    random.seed(7)
+    engine = AutomationEngine()
+    for rule in build_rules(rules, devices):
+        engine._register_rule(rule)
+    sample = build_events(events, devices)
+
+    start = time.perf_counter()
+    for ev in sample:
+        await engine._evaluate(ev)
+    indexed = time.perf_counter() - start
+
+    scan_sample = sample[: max(1, events // 20)]
+    start = time.perf_counter()
+    for ev in scan_sample:
+        await _scan(engine, ev)
+    scanned = time.perf_counter() - start
+
+    print(f"rules={rules} devices={devices} index={engine._index.stats()}")
+    print(f"indexed: {len(sample) / indexed:,.0f} events/sec")
+    print(f"scan:    {len(scan_sample) / scanned:,.0f} events/sec")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="AutomationEngine dispatch benchmark")
+    parser.add_argument("--rules", type=int, default=10_000)
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--devices", type=int, default=2_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.rules, args.events, args.devices))
+
+
+if __name__ == "__main__":
+    main()
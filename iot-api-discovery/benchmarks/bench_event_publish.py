@@ -0,0 +1,55 @@
+"""Publish throughput: blocking EventBus.publish vs. AsyncEventPublisher.
+
+Needs a reachable backend, e.g. REDIS_URL=redis://localhost:6379/0 EVENT_BUS_BACKEND=redis
+Usage: python -m benchmarks.bench_event_publish --messages 20000 --producers 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from tools.events.bus import bus
+from tools.events.publisher import AsyncEventPublisher
+
+
+def payload(i: int) -> dict:
+    return {"deviceId": f"dev-{i % 500}", "capability": "switch", "value": "on", "eventId": f"bench-{i}"}
+
+
+async def run(messages: int, producers: int, batch_size: int, linger_ms: int) -> None:
+    start = time.perf_counter()
+    for i in range(messages):
+        bus.publish("bench.event", payload(i))
+    sync_elapsed = time.perf_counter() - start
+
+    pub = AsyncEventPublisher(bus, batch_size=batch_size, linger_ms=linger_ms)
+    per_producer = messages // producers
+
+    async def producer(offset: int) -> None:
+        for i in range(offset, offset + per_producer):
+            await pub.publish("bench.event", payload(i))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(producer(p * per_producer) for p in range(producers)))
+    async_elapsed = time.perf_counter() - start
+    await pub.aclose()
+
+    print(f"backend={bus.backend} messages={messages} producers={producers} batch={batch_size}")
+    print(f"sync publish:  {messages / sync_elapsed:,.0f} msgs/sec")
+    print(f"async batched: {per_producer * producers / async_elapsed:,.0f} msgs/sec")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Event publish benchmark")
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--producers", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--linger-ms", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.producers, args.batch_size, args.linger_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""suggest_mappings candidate generation at 1k/10k/50k twins.
+
+Compares the full pairwise scan (small sizes only), the inverted-index path
+and, when numpy/scipy are installed, the sparse-matrix path.
+Usage: python -m benchmarks.bench_mapping --sizes 1000 10000 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from types import SimpleNamespace
+from typing import List
+
+from tools.mapping.index import MappingFeatureIndex, TwinFeatures, np, pair_score, rank_sparse, sparse
+
+ROOMS = ["kitchen", "living", "bed", "hall", "office", "garage", "bath", "porch", "attic", "den"]
+KINDS = ["light", "lamp", "sensor", "motion", "door", "fan", "tv", "plug", "blind", "thermostat"]
+CAPS = ["light", "switch", "sensor", "binary_sensor", "fan", "media", "cover", "temperature", "lock", "energy"]
+STATE = ["on", "level", "color", "temp", "battery", "power", "position"]
+
+
+def build_twins(n: int) -> List[SimpleNamespace]:
+    twins = []
+    for i in range(n):
+        provider = "home_assistant" if i % 3 == 0 else random.choice(["smartthings", "hue", "zigbee2mqtt"])
+        name = f"{random.choice(ROOMS)} {random.choice(KINDS)} {i % 97}"
+        caps = random.sample(CAPS, random.randint(1, 4))
+        state = {k: 1 for k in random.sample(STATE, random.randint(1, 4))}
+        twins.append(
+            SimpleNamespace(
+                provider=provider, external_id=f"d{i}", name=name, capabilities=json.dumps(caps), state=json.dumps(state)
+            )
+        )
+    return twins
+
+
+def scan(sources: List[TwinFeatures], targets: List[TwinFeatures], k: int) -> None:
+    for s in sources:
+        scored = []
+        for t in targets:
+            ni = len(s.name_tokens & t.name_tokens)
+            ci = len(s.cap_set & t.cap_set)
+            ki = len(s.key_set & t.key_set)
+            score = pair_score(s, t, ni, ci, ki)
+            if score > 0:
+                scored.append((score, t))
+        scored.sort(key=lambda x: x[0], reverse=True)
+        scored[:k]
+
+
+def run(size: int, k: int, scan_max: int, index_max: int) -> None:
+    twins = build_twins(size)
+    start = time.perf_counter()
+    feats = [TwinFeatures.from_twin(t) for t in twins]
+    parse = time.perf_counter() - start
+    sources = [f for f in feats if f.provider == "home_assistant"]
+    targets = [f for f in feats if f.provider != "home_assistant"]
+    print(f"twins={size} sources={len(sources)} targets={len(targets)} parse={parse:.2f}s")
+
+    if size <= scan_max:
+        start = time.perf_counter()
+        scan(sources, targets, k)
+        print(f"  full scan:      {time.perf_counter() - start:8.2f}s")
+
+    if size <= index_max:
+        start = time.perf_counter()
+        index = MappingFeatureIndex()
+        for t in targets:
+            index.add(t)
+        for s in sources:
+            index.top_k(s, k)
+        print(f"  inverted index: {time.perf_counter() - start:8.2f}s")
+
+    if np is not None and sparse is not None:
+        start = time.perf_counter()
+        rank_sparse(sources, targets, k)
+        print(f"  sparse matrix:  {time.perf_counter() - start:8.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mapping suggestion benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--scan-max", type=int, default=1_000, help="largest size to run the full scan for")
+    parser.add_argument("--index-max", type=int, default=10_000, help="largest size to run the pure-Python index for")
+    args = parser.parse_args()
+    random.seed(5)
+    for size in args.sizes:
+        run(size, args.top_k, args.scan_max, args.index_max)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Twin-update worker throughput against SQLite: per-event vs. batched.
+
+Usage: python -m benchmarks.bench_twin_worker --events 5000 --devices 200 --batch-size 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List
+
+
+def build_events(n: int, devices: int) -> List[Dict[str, Any]]:
+    events = []
+    for i in range(n):
+        payload = {
+            "deviceId": f"st-{random.randrange(devices)}",
+            "displayName": "Lamp",
+            "capability": random.choice(["switch", "switchLevel", "motionSensor"]),
+            "value": random.choice(["on", "off", 42, "active"]),
+            "eventId": f"evt-{i}",
+        }
+        events.append({"topic": "smartthings.device_event", "payload": json.dumps(payload)})
+    return events
+
+
+async def run(n: int, devices: int, batch_size: int) -> None:
+    random.seed(11)
+    events = build_events(n, devices)
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("single", "batch"):
+            url = f"sqlite:///{os.path.join(tmp, mode)}.db"
+            os.environ["DATABASE_URL"] = url
+            # Import after DATABASE_URL is set so the worker binds to the temp DB
+            import config.settings as settings_mod
+            import tools.events.worker as worker
+            from database.api_database import create_all
+
+            importlib.reload(settings_mod)
+            worker = importlib.reload(worker)
+            create_all(url)
+
+            start = time.perf_counter()
+            if mode == "single":
+                for ev in events:
+                    await worker.process_event(ev)
+            else:
+                for i in range(0, len(events), batch_size):
+                    await worker.process_events_batch(events[i : i + batch_size])
+            elapsed = time.perf_counter() - start
+            print(f"{mode:>6}: {n / elapsed:,.0f} events/sec ({elapsed:.2f}s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Twin worker throughput benchmark")
+    parser.add_argument("--events", type=int, default=5_000)
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.events, args.devices, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -112,6 +112,41 @@ class Settings(BaseSettings):
     kafka_bootstrap_servers: str | None = None  # e.g., kafka:9092
     events_stream_key: str = Field(default="events:stream")
     events_maxlen: int = Field(default=10000)  # Redis stream maxlen (~)
+    # Async publisher buffering
+    events_publish_batch_size: int = Field(default=256)  # events per pipeline/flush
+    events_publish_linger_ms: int = Field(default=5)  # max wait before a partial flush
+    events_publish_max_buffer: int = Field(default=10000)  # producers wait beyond this
+    # Twin-update worker batching
+    events_batch_mode: bool = False
+    events_batch_size: int = Field(default=200)  # max entries per batch
+    events_flush_interval_ms: int = Field(default=50)  # max wait to fill a batch
+    # Twin store (storage/twins.py)
+    twin_cache_max_entries: int = Field(default=100000)  # in-memory LRU bound
+    twin_write_behind: bool = True  # queue writes and flush in batches
+    twin_flush_interval_ms: int = Field(default=200)
+    twin_flush_batch_size: int = Field(default=500)  # flush early past this many dirty twins
+    twin_store_persist_db: bool = False  # also write DeviceTwin rows (off when the event worker owns them)
+    # Mapping suggestions (tools/mapping)
+    mapping_incremental: bool = False  # serve top-k kept current from this process's DeviceTwin writes
+    mapping_source_provider: str = Field(default="home_assistant")
+    mapping_top_k: int = Field(default=3)
+    mapping_reload_interval_seconds: float = Field(default=300.0)  # full reload for other processes' writes; 0 disables
+    # Outbox publisher
+    outbox_batch_size: int = Field(default=200)  # rows claimed per drain pass
+    outbox_drains: int = Field(default=1)  # concurrent drain loops per process
+    outbox_lease_seconds: int = Field(default=30)  # claim visibility timeout
+    outbox_max_attempts: int = Field(default=10)
+    outbox_backoff_base_seconds: float = Field(default=1.0)
+    outbox_backoff_max_seconds: float = Field(default=300.0)
+    outbox_poll_interval_seconds: float = Field(default=1.0)
+    outbox_stats_interval_seconds: float = Field(default=15.0)
+    # Twin-update worker pool
+    events_consumer_name: str = Field(default="worker-1")  # per-device order holds within one consumer only
+    events_pool_partitions: int = Field(default=1)  # >1 enables the partitioned pool
+    events_claim_min_idle_ms: int = Field(default=60000)  # XAUTOCLAIM threshold
+    events_claim_interval_seconds: float = Field(default=30.0)
+    events_retry_attempts: int = Field(default=3)  # in-place retries before a device is held back
+    events_retry_backoff_seconds: float = Field(default=0.5)
 
     class Config:
         env_file = ".env"
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import json
+import threading
 import time
-from typing import Any, Dict, Optional
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from config.settings import settings
 
@@ -19,52 +21,290 @@ except Exception:
     DeviceTwinModel = None  # type: ignore
 
 
+VERSIONS_KEY = "twin:_v"
+
+# Bump the per-twin version counter by the number of coalesced writes and store
+# the document with that version spliced in, without reading it back first.
+# ARGV[3] is the JSON document minus "_v" and must be a non-empty object. A
+# missing counter is first seeded from the stored document's "_v" (or ARGV[4],
+# the last version known to the writer) so versions never go backwards.
+_UPSERT_LUA = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 0 then
+  local base = tonumber(ARGV[4]) or 0
+  local current = redis.call('GET', KEYS[2])
+  if current then
+    local ok, stored = pcall(cjson.decode, current)
+    if ok and type(stored) == 'table' and tonumber(stored['_v']) then
+      base = math.max(base, tonumber(stored['_v']))
+    end
+  end
+  redis.call('HSET', KEYS[1], ARGV[1], base)
+end
+local v = redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+redis.call('SET', KEYS[2], '{"_v":' .. v .. ',' .. string.sub(ARGV[3], 2))
+return v
+"""
+
+
 class TwinStore:
-    def __init__(self) -> None:
-        self._mem: Dict[str, Dict[str, Any]] = {}
+    """Device twin cache: bounded in-memory LRU over Redis over Postgres.
+
+    Writes land in memory and are queued; a background thread flushes dirty
+    twins every ``twin_flush_interval_ms`` (or once ``twin_flush_batch_size``
+    are waiting) with one Redis pipeline and, if enabled, one Postgres
+    transaction. Several writes to a twin between flushes are coalesced into a
+    single Redis round trip that bumps its version by the number of writes.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, write_behind: Optional[bool] = None) -> None:
+        self._mem: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._max_entries = max_entries or settings.twin_cache_max_entries
+        self._write_behind = settings.twin_write_behind if write_behind is None else write_behind
         self._rds = redis.Redis.from_url(settings.redis_url) if settings.redis_url and redis is not None else None
         self._SessionFactory = get_session_factory(settings.database_url) if get_session_factory else None
+        self._upsert_script = self._rds.register_script(_UPSERT_LUA) if self._rds else None
+        self._lock = threading.RLock()
+        # key -> (latest doc, number of writes since last flush)
+        self._dirty: Dict[str, Tuple[Dict[str, Any], int]] = {}
+        # the batch a flush is writing out; still the freshest copy until it lands
+        self._flushing: Dict[str, Tuple[Dict[str, Any], int]] = {}
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._flusher: Optional[threading.Thread] = None
 
     def _key(self, provider: str, external_id: str) -> str:
         return f"twin:{provider.lower()}:{external_id}"
 
-    def upsert(self, provider: str, external_id: str, name: Optional[str], capabilities: list[str] | None, state: Dict[str, Any] | None) -> None:
-        now = int(time.time())
-        k = self._key(provider, external_id)
-        existing = self.get(provider, external_id) or {}
-        version = int(existing.get("_v", 0)) + 1
-        doc = {
-            "_v": version,
-            "_ts": now,
+    # --- memory tier -----------------------------------------------------
+
+    def _mem_get(self, k: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            doc = self._mem.get(k)
+            if doc is not None:
+                self._mem.move_to_end(k)
+            return doc
+
+    def _unflushed(self, k: str) -> Optional[Dict[str, Any]]:
+        """Latest doc for ``k`` not yet written out (memory may have evicted it)."""
+        with self._lock:
+            entry = self._dirty.get(k) or self._flushing.get(k)
+            return entry[0] if entry is not None else None
+
+    def _mem_put(self, k: str, doc: Dict[str, Any]) -> None:
+        with self._lock:
+            self._mem[k] = doc
+            self._mem.move_to_end(k)
+            # Evicting a dirty twin is safe: the flush queue holds its own reference and reads check it
+            while len(self._mem) > self._max_entries:
+                self._mem.popitem(last=False)
+
+    # --- writes ----------------------------------------------------------
+
+    def _build_doc(
+        self, provider: str, external_id: str, name: Optional[str], capabilities: list[str] | None, state: Dict[str, Any] | None
+    ) -> Dict[str, Any]:
+        return {
+            "_ts": int(time.time()),
             "provider": provider,
             "external_id": external_id,
             "name": name,
             "capabilities": capabilities or [],
             "state": state or {},
         }
-        self._mem[k] = doc
-        if self._rds:
+
+    def _stage(self, provider: str, external_id: str, doc: Dict[str, Any]) -> None:
+        k = self._key(provider, external_id)
+        recovered = None
+        if self._rds is None and self._mem_get(k) is None and self._unflushed(k) is None:
+            # No Redis counter to lean on; recover the version from Postgres (outside the lock)
+            recovered = self.get(provider, external_id)
+        with self._lock:
+            previous = self._mem.get(k) or self._unflushed(k) or recovered
+            # Provisional until the flush returns the authoritative Redis version
+            doc = {"_v": int((previous or {}).get("_v", 0)) + 1, **doc}
+            self._mem_put(k, doc)
+            _, pending = self._dirty.get(k, (None, 0))
+            self._dirty[k] = (doc, pending + 1)
+
+    def _after_write(self) -> None:
+        if not self._write_behind:
+            self.flush()
+            return
+        if len(self._dirty) >= settings.twin_flush_batch_size:
+            self._wake.set()
+        self._ensure_flusher()
+
+    def upsert(self, provider: str, external_id: str, name: Optional[str], capabilities: list[str] | None, state: Dict[str, Any] | None) -> None:
+        self._stage(provider, external_id, self._build_doc(provider, external_id, name, capabilities, state))
+        self._after_write()
+
+    def upsert_many(self, items: Iterable[Dict[str, Any]]) -> None:
+        """Upsert several twins; each item has provider, external_id and optional name/capabilities/state."""
+        for item in items:
+            provider, external_id = item["provider"], item["external_id"]
+            doc = self._build_doc(provider, external_id, item.get("name"), item.get("capabilities"), item.get("state"))
+            self._stage(provider, external_id, doc)
+        self._after_write()
+
+    # --- flushing --------------------------------------------------------
+
+    def _ensure_flusher(self) -> None:
+        if self._stopped:
+            return
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._flush_loop, name="twin-store-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        interval = settings.twin_flush_interval_ms / 1000.0
+        while not self._stopped:
+            self._wake.wait(interval)
+            self._wake.clear()
             try:
-                self._rds.set(k, json.dumps(doc))
+                self.flush()
             except Exception:
                 pass
 
+    def flush(self) -> int:
+        """Write all dirty twins out now; returns how many were flushed.
+
+        If a tier fails, the batch goes back on the dirty queue (merged with
+        any newer writes) and is retried on the next flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return 0
+                dirty, self._dirty = self._dirty, {}
+                self._flushing = dirty
+            try:
+                versions: Dict[str, int] = {}
+                if self._rds is not None and self._upsert_script is not None:
+                    try:
+                        pipe = self._rds.pipeline(transaction=False)
+                        for k, (doc, pending) in dirty.items():
+                            body = {f: v for f, v in doc.items() if f != "_v"}
+                            known = int(doc.get("_v", pending)) - pending
+                            self._upsert_script(
+                                keys=[VERSIONS_KEY, k], args=[k, pending, json.dumps(body), known], client=pipe
+                            )
+                        for k, v in zip(dirty, pipe.execute()):
+                            versions[k] = int(v)
+                    except Exception:
+                        self._requeue(dirty)
+                        return 0
+                with self._lock:
+                    for k, v in versions.items():
+                        doc = dirty[k][0]
+                        doc["_v"] = v
+                if settings.twin_store_persist_db and not self._flush_db(dirty, versions):
+                    self._requeue(dirty)
+                    return 0
+                return len(dirty)
+            finally:
+                with self._lock:
+                    self._flushing = {}
+
+    def _requeue(self, dirty: Dict[str, Tuple[Dict[str, Any], int]]) -> None:
+        with self._lock:
+            for k, (doc, pending) in dirty.items():
+                newer = self._dirty.get(k)
+                if newer is None:
+                    self._dirty[k] = (doc, pending)
+                else:
+                    # keep the newer document but still count the failed writes
+                    self._dirty[k] = (newer[0], newer[1] + pending)
+
+    def _flush_db(self, dirty: Dict[str, Tuple[Dict[str, Any], int]], versions: Dict[str, int]) -> bool:
+        if not self._SessionFactory or DeviceTwinModel is None:
+            return True
+        from datetime import datetime
+
+        by_provider: Dict[str, Dict[str, Tuple[Dict[str, Any], int]]] = {}
+        for k, (doc, pending) in dirty.items():
+            by_provider.setdefault(doc["provider"], {})[doc["external_id"]] = (doc, pending)
+        session = self._SessionFactory()
+        try:
+            now = datetime.utcnow()
+            for provider, docs in by_provider.items():
+                rows = {
+                    row.external_id: row
+                    for row in session.query(DeviceTwinModel)
+                    .filter(DeviceTwinModel.provider == provider, DeviceTwinModel.external_id.in_(list(docs)))
+                    .all()
+                }
+                for external_id, (doc, pending) in docs.items():
+                    row = rows.get(external_id)
+                    if row is None:
+                        row = DeviceTwinModel(provider=provider, external_id=external_id, version=0)
+                        session.add(row)
+                    version = (row.version or 0) + pending
+                    redis_v = versions.get(self._key(provider, external_id))
+                    row.version = max(version, redis_v or 0)
+                    row.name = doc.get("name")
+                    row.capabilities = json.dumps(doc.get("capabilities") or [])
+                    row.state = json.dumps(doc.get("state") or {})
+                    row.updated_at = now
+            session.commit()
+            return True
+        except Exception:
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    def close(self) -> None:
+        self._stopped = True
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+            self._flusher = None
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._mem), "max_entries": self._max_entries, "dirty": len(self._dirty)}
+
+    # --- reads -----------------------------------------------------------
+
+    def _doc_from_row(self, twin: Any) -> Dict[str, Any]:
+        caps = []
+        try:
+            caps = json.loads(twin.capabilities) if twin.capabilities else []
+        except Exception:
+            caps = []
+        state = {}
+        try:
+            state = json.loads(twin.state) if twin.state else {}
+        except Exception:
+            state = {}
+        return {
+            "_v": int(twin.version or 1),
+            "_ts": int(time.time()),
+            "provider": twin.provider,
+            "external_id": twin.external_id,
+            "name": twin.name,
+            "capabilities": caps,
+            "state": state,
+        }
+
     def get(self, provider: str, external_id: str) -> Optional[Dict[str, Any]]:
         k = self._key(provider, external_id)
-        if k in self._mem:
-            return self._mem[k]
+        doc = self._mem_get(k) or self._unflushed(k)
+        if doc is not None:
+            return doc
         if self._rds:
             try:
                 v = self._rds.get(k)
                 if v:
                     doc = json.loads(v)
-                    self._mem[k] = doc
+                    self._mem_put(k, doc)
                     return doc
             except Exception:
                 pass
         # Fallback to Postgres if available
         if self._SessionFactory and DeviceTwinModel is not None:
-            from contextlib import contextmanager
             try:
                 session = self._SessionFactory()
                 try:
@@ -75,28 +315,9 @@ class TwinStore:
                     )
                     if twin is None:
                         return None
-                    # Build doc from DB
-                    caps = []
-                    try:
-                        caps = json.loads(twin.capabilities) if twin.capabilities else []
-                    except Exception:
-                        caps = []
-                    state = {}
-                    try:
-                        state = json.loads(twin.state) if twin.state else {}
-                    except Exception:
-                        state = {}
-                    doc = {
-                        "_v": int(twin.version or 1),
-                        "_ts": int(time.time()),
-                        "provider": twin.provider,
-                        "external_id": twin.external_id,
-                        "name": twin.name,
-                        "capabilities": caps,
-                        "state": state,
-                    }
+                    doc = self._doc_from_row(twin)
                     # warm caches
-                    self._mem[k] = doc
+                    self._mem_put(k, doc)
                     if self._rds:
                         try:
                             self._rds.set(k, json.dumps(doc))
@@ -109,6 +330,60 @@ class TwinStore:
                 return None
         return None
 
+    def get_many(self, keys: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[Dict[str, Any]]]:
+        """Batch ``get``: memory hits, then one MGET, then one query per provider."""
+        result: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+        missing: List[Tuple[str, str]] = []
+        for provider, external_id in keys:
+            k = self._key(provider, external_id)
+            doc = self._mem_get(k) or self._unflushed(k)
+            result[(provider, external_id)] = doc
+            if doc is None:
+                missing.append((provider, external_id))
+        if missing and self._rds:
+            try:
+                values = self._rds.mget([self._key(p, e) for p, e in missing])
+                still: List[Tuple[str, str]] = []
+                for (p, e), v in zip(missing, values):
+                    if v:
+                        doc = json.loads(v)
+                        self._mem_put(self._key(p, e), doc)
+                        result[(p, e)] = doc
+                    else:
+                        still.append((p, e))
+                missing = still
+            except Exception:
+                pass
+        if missing and self._SessionFactory and DeviceTwinModel is not None:
+            by_provider: Dict[str, List[str]] = {}
+            for p, e in missing:
+                by_provider.setdefault(p, []).append(e)
+            warmed: Dict[str, str] = {}
+            try:
+                session = self._SessionFactory()
+                try:
+                    for provider, external_ids in by_provider.items():
+                        rows = (
+                            session.query(DeviceTwinModel)
+                            .filter(DeviceTwinModel.provider == provider, DeviceTwinModel.external_id.in_(external_ids))
+                            .all()
+                        )
+                        for twin in rows:
+                            doc = self._doc_from_row(twin)
+                            k = self._key(provider, twin.external_id)
+                            self._mem_put(k, doc)
+                            result[(provider, twin.external_id)] = doc
+                            warmed[k] = json.dumps(doc)
+                finally:
+                    session.close()
+            except Exception:
+                pass
+            if warmed and self._rds:
+                try:
+                    self._rds.mset(warmed)
+                except Exception:
+                    pass
+        return result
 
-store = TwinStore()
 
+store = TwinStore()
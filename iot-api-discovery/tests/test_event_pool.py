@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+
+from tools.events.pool import partition_for, partition_key
+
+
+def test_same_device_always_maps_to_same_partition():
+    ev = {"topic": "smartthings.device_event", "payload": json.dumps({"deviceId": "abc"})}
+    key = partition_key(ev)
+    assert key == "abc"
+    assert len({partition_for(key, 8) for _ in range(5)}) == 1
+    assert 0 <= partition_for(key, 8) < 8
+
+
+def test_events_without_device_fall_back_to_round_robin_slot():
+    ev = {"topic": "other", "payload": "not json"}
+    assert partition_key(ev) is None
+    assert partition_for(None, 4, fallback=6) == 2
+
+
+def test_failed_device_is_retried_in_order_before_later_events(monkeypatch):
+    import asyncio
+
+    from tools.events import pool as pool_mod
+
+    applied, acked = [], []
+    failures = {"1-0": 4}  # fails past the in-place retries, then recovers
+
+    def apply_event(event):
+        entry = event["id"]
+        if failures.get(entry, 0) > 0:
+            failures[entry] -= 1
+            raise RuntimeError("transient")
+        applied.append(entry)
+
+    monkeypatch.setattr(pool_mod, "apply_event", apply_event)
+    monkeypatch.setattr(pool_mod.bus, "ack", lambda group, entry_id: acked.append(entry_id))
+
+    def entry(entry_id, device):
+        return entry_id, {"topic": "t", "id": entry_id, "payload": json.dumps({"deviceId": device})}
+
+    async def scenario():
+        pool = pool_mod.PartitionedWorkerPool(
+            "c", 2, batch_size=10, claim_interval_seconds=0.01, retry_attempts=3, retry_backoff_seconds=0
+        )
+        pool._tasks = [asyncio.create_task(pool._partition_loop(i)) for i in range(pool.partitions)]
+        await pool.dispatch([entry("1-0", "a"), entry("2-0", "b"), entry("3-0", "a")])
+        await asyncio.sleep(0.05)
+        await pool.dispatch([entry("4-0", "a")])
+        await asyncio.sleep(0.05)
+        await pool.stop()
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert [e for e in applied if e != "2-0"] == ["1-0", "3-0", "4-0"]
+    assert sorted(acked) == ["1-0", "2-0", "3-0", "4-0"]
+    assert not pool._held and not pool._inflight
+
+
+def test_read_loop_backs_off_while_reads_fail_fast(monkeypatch):
+    import asyncio
+
+    from tools.events import pool as pool_mod
+    from tools.events import worker as worker_mod
+
+    reads, sleeps = [], []
+    real_sleep = asyncio.sleep
+
+    def read_group(group, consumer, count, block_ms):
+        reads.append(block_ms)
+        return []  # what bus.read_group does when Redis is down
+
+    async def sleep(delay):
+        sleeps.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(pool_mod.bus, "read_group", read_group)
+    monkeypatch.setattr(worker_mod.asyncio, "sleep", sleep)
+
+    async def scenario():
+        pool = pool_mod.PartitionedWorkerPool("c", 1)
+        task = asyncio.create_task(pool._read_loop())
+        while len(sleeps) < 8:
+            await real_sleep(0)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert sleeps[:7] == [0.1, 0.2, 0.4, 0.8, 1.6, 3.2, 5.0]
+    assert len(reads) == len(sleeps)
+
+
+def test_stop_waits_for_running_batches_off_the_event_loop(monkeypatch):
+    import asyncio
+    import threading
+
+    from tools.events import pool as pool_mod
+
+    started, release, done = threading.Event(), threading.Event(), []
+
+    def apply_event(event):
+        started.set()
+        release.wait(5)
+        done.append(event["id"])
+
+    monkeypatch.setattr(pool_mod, "apply_event", apply_event)
+    monkeypatch.setattr(pool_mod.bus, "ack", lambda group, entry_id: None)
+
+    async def scenario():
+        pool = pool_mod.PartitionedWorkerPool("c", 1, retry_attempts=1)
+        pool._tasks = [asyncio.create_task(pool._partition_loop(0))]
+        await pool.dispatch([("1-0", {"topic": "t", "id": "1-0", "payload": json.dumps({"deviceId": "a"})})])
+        await asyncio.to_thread(started.wait, 5)
+        stopping = asyncio.create_task(pool.stop())
+        ticks = 0
+        while ticks < 5:  # the loop keeps running while the thread finishes its batch
+            await asyncio.sleep(0.01)
+            ticks += 1
+        assert not stopping.done()
+        release.set()
+        await stopping
+
+    asyncio.run(scenario())
+    assert done == ["1-0"]
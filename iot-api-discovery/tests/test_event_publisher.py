@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import asyncio
+
+from tools.events.bus import EventBus
+from tools.events.publisher import AsyncEventPublisher, PublishError
+
+
+class _SlowPublisher(AsyncEventPublisher):
+    def __init__(self, fail: bool = False) -> None:
+        super().__init__(EventBus(), batch_size=2, linger_ms=50, max_buffer=100)
+        self.backend = "redis"
+        self.fail = fail
+        self.sent: list[str] = []
+
+    async def _send_redis(self, batch):
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise ConnectionError("redis down")
+        self.sent.extend(payload["n"] for _, payload, _ in batch)
+        return [f"{payload['n']}-0" for _, payload, _ in batch]
+
+
+def test_aclose_sends_the_batch_in_progress_and_the_rest_of_the_queue():
+    async def scenario():
+        pub = _SlowPublisher()
+        pending = asyncio.create_task(pub.publish_many([("t", {"n": str(i)}) for i in range(5)]))
+        await asyncio.sleep(0.005)  # flush loop is mid-batch
+        await pub.aclose()
+        return pub, await asyncio.wait_for(pending, 1)
+
+    pub, ids = asyncio.run(scenario())
+    assert ids == ["0-0", "1-0", "2-0", "3-0", "4-0"]
+    assert sorted(pub.sent) == ["0", "1", "2", "3", "4"]
+
+
+def test_send_failures_are_told_apart_from_missing_backend():
+    async def scenario():
+        failing = _SlowPublisher(fail=True)
+        failed = await failing.publish_many([("t", {"n": "0"})], return_exceptions=True)
+        legacy = await failing.publish_many([("t", {"n": "1"})])
+        await failing.aclose()
+        unconfigured = AsyncEventPublisher(EventBus(), batch_size=2, linger_ms=0)
+        unconfigured.backend = "none"
+        missing = await unconfigured.publish_many([("t", {"n": "2"})], return_exceptions=True)
+        await unconfigured.aclose()
+        return failed, legacy, missing
+
+    failed, legacy, missing = asyncio.run(scenario())
+    assert isinstance(failed[0], PublishError)
+    assert legacy == [None]
+    assert missing == [None]
+
+
+def test_publisher_survives_restart_on_a_new_event_loop():
+    pub = _SlowPublisher()
+
+    async def cycle(n, close):
+        ids = await pub.publish_many([("t", {"n": n})])
+        if close:
+            await pub.aclose()
+        return ids
+
+    assert asyncio.run(cycle("0", close=True)) == ["0-0"]
+    # Restart after a clean shutdown, then after one that skipped aclose
+    assert asyncio.run(cycle("1", close=False)) == ["1-0"]
+    assert asyncio.run(cycle("2", close=True)) == ["2-0"]
+
+
+def test_crashed_flush_loop_fails_waiting_producers():
+    class _Crashing(_SlowPublisher):
+        async def _send(self, batch):
+            raise RuntimeError("bug")
+
+    async def scenario():
+        pub = _Crashing()
+        results = await asyncio.wait_for(
+            pub.publish_many([("t", {"n": str(i)}) for i in range(5)], return_exceptions=True), 1
+        )
+        await pub.aclose()
+        return results
+
+    results = asyncio.run(scenario())
+    assert len(results) == 5 and all(isinstance(r, PublishError) for r in results)
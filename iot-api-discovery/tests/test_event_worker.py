@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from database.api_database import create_all, get_session_factory, session_scope
+from database.models import AuditEvent, DeviceTwin, DeviceTwinVersion
+from tools.events import worker
+
+
+def _event(n, device, capability="switch", value="on", name=None):
+    payload = {"deviceId": device, "capability": capability, "value": value, "eventId": f"e{n}"}
+    if name:
+        payload["displayName"] = name
+    return {"topic": "smartthings.device_event", "payload": json.dumps(payload)}
+
+
+EVENTS = [
+    _event(1, "a", name="Lamp"),
+    _event(2, "b", "level", 10),
+    _event(3, "a", value="off"),
+    {"topic": "other.topic", "payload": json.dumps({"x": 1})},
+    _event(4, "c", capability=None),
+    _event(5, "b", "level", 20, name="Dimmer"),
+    {"topic": "smartthings.device_event", "payload": "not json"},
+    _event(6, "a", name="Desk lamp"),
+]
+
+
+def _factory(tmp_path, name):
+    url = f"sqlite:///{tmp_path}/{name}.db"
+    create_all(url)
+    return get_session_factory(url)
+
+
+def _snapshot(factory):
+    with session_scope(factory) as session:
+        twins = sorted(
+            (t.provider, t.external_id, t.name, t.state, t.capabilities, t.version)
+            for t in session.query(DeviceTwin).all()
+        )
+        external = {t.id: t.external_id for t in session.query(DeviceTwin).all()}
+        versions = sorted(
+            (external[v.twin_id], v.version, v.full, v.event_id) for v in session.query(DeviceTwinVersion).all()
+        )
+        audits = [(a.kind, a.payload) for a in session.query(AuditEvent).order_by(AuditEvent.id).all()]
+    return twins, versions, audits
+
+
+def test_batch_apply_matches_per_event_apply(tmp_path, monkeypatch):
+    single = _factory(tmp_path, "single")
+    monkeypatch.setattr(worker, "SessionFactory", single)
+    for event in EVENTS:
+        worker.apply_event(event)
+
+    batched = _factory(tmp_path, "batched")
+    monkeypatch.setattr(worker, "SessionFactory", batched)
+    # Split so later batches update twins created by earlier ones
+    worker.apply_events_batch(EVENTS[:3])
+    worker.apply_events_batch(EVENTS[3:])
+
+    expected = _snapshot(single)
+    assert _snapshot(batched) == expected
+    assert ("smartthings", "a", "Desk lamp", json.dumps({"switch": "on"}), json.dumps(["switch"]), 3) in expected[0]
+
+
+def _entries(events):
+    return [(f"{i}-0", {k.encode(): v.encode() for k, v in event.items()}) for i, event in enumerate(events, 1)]
+
+
+def _run_consume_loop(monkeypatch, entries, done):
+    reads = [entries]
+    monkeypatch.setattr(worker.bus, "read_group", lambda group, consumer, count, block_ms: reads.pop() if reads else [])
+
+    async def scenario():
+        task = asyncio.create_task(worker.batch_consume_loop("g", "c", batch_size=10, flush_interval_ms=10))
+        for _ in range(200):
+            if done():
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_batch_is_acked_once(monkeypatch):
+    applied, acked, acked_one = [], [], []
+
+    async def process_events_batch(events):
+        applied.append([event["payload"] for event in events])
+
+    monkeypatch.setattr(worker, "process_events_batch", process_events_batch)
+    monkeypatch.setattr(worker.bus, "ack_many", lambda group, ids: acked.append(list(ids)))
+    monkeypatch.setattr(worker.bus, "ack", lambda group, entry_id: acked_one.append(entry_id))
+
+    _run_consume_loop(monkeypatch, _entries(EVENTS[:3]), lambda: bool(acked))
+    assert applied == [[event["payload"] for event in EVENTS[:3]]]
+    assert acked == [["1-0", "2-0", "3-0"]]
+    assert acked_one == []
+
+
+def test_failed_batch_is_replayed_one_by_one(monkeypatch):
+    replayed, acked = [], []
+
+    async def process_events_batch(events):
+        raise RuntimeError("bad row")
+
+    async def process_event(event):
+        replayed.append(event["payload"])
+        if "e2" in event["payload"]:
+            raise RuntimeError("bad row")
+
+    monkeypatch.setattr(worker, "process_events_batch", process_events_batch)
+    monkeypatch.setattr(worker, "process_event", process_event)
+    monkeypatch.setattr(worker.bus, "ack_many", lambda group, ids: acked.append(list(ids)))
+    monkeypatch.setattr(worker.bus, "ack", lambda group, entry_id: acked.append(entry_id))
+
+    _run_consume_loop(monkeypatch, _entries(EVENTS[:3]), lambda: len(replayed) == 3)
+    assert replayed == [event["payload"] for event in EVENTS[:3]]
+    # The failing entry stays pending for redelivery
+    assert acked == ["1-0", "3-0"]
+
+
+def test_empty_read_backoff_grows_and_resets(monkeypatch):
+    results = [[], [], [("1-0", {})], []]
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(worker.bus, "read_group", lambda group, consumer, count, block_ms: results.pop(0))
+    monkeypatch.setattr(worker.asyncio, "sleep", sleep)
+
+    async def scenario():
+        backoff = worker.EmptyReadBackoff(base_delay=0.1, max_delay=1.0)
+        return [await backoff.read("g", "c", 10, 1000) for _ in range(4)]
+
+    assert asyncio.run(scenario()) == [[], [], [("1-0", {})], []]
+    assert sleeps == [0.1, 0.2, 0.1]
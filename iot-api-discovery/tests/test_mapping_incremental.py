@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import json
+import random
+from types import SimpleNamespace
+
+from tools.mapping.incremental import IncrementalMappingSuggester
+from tools.mapping.index import MappingFeatureIndex
+
+
+WORDS = ["kitchen", "light", "lamp", "hall", "sensor", "door", "fan"]
+CAPS = ["light", "switch", "sensor", "fan", "media", "cover", "lock"]
+
+
+def _twin(provider: str, external_id: str):
+    return SimpleNamespace(
+        provider=provider,
+        external_id=external_id,
+        name=" ".join(random.sample(WORDS, random.randint(0, 3))) or None,
+        capabilities=json.dumps(random.sample(CAPS, random.randint(0, 4))),
+        state=json.dumps({k: 1 for k in random.sample(["on", "level", "temp"], random.randint(0, 2))}),
+    )
+
+
+def _expected(sugg: IncrementalMappingSuggester):
+    feats = sugg._index.features()
+    targets = MappingFeatureIndex()
+    for f in feats:
+        if f.provider != sugg.source_provider:
+            targets.add(f)
+    out = []
+    for f in feats:
+        if f.provider == sugg.source_provider:
+            top = targets.top_k(f, sugg.top_k)
+            out.append({"source": f.profile(), "suggestions": [t.suggestion(s) for s, t in top]})
+    return out
+
+
+def test_incremental_updates_match_full_recompute():
+    random.seed(4)
+    sugg = IncrementalMappingSuggester(top_k=3)
+    live = {}
+    for i in range(200):
+        provider = "home_assistant" if i % 3 == 0 else random.choice(["hue", "smartthings"])
+        live[(provider, f"d{i}")] = _twin(provider, f"d{i}")
+        sugg.on_twin_changed(live[(provider, f"d{i}")])
+    assert sugg.suggestions() == _expected(sugg)
+
+    for _ in range(150):
+        key = random.choice(list(live))
+        if random.random() < 0.2:
+            sugg.on_twin_removed(*key)
+            del live[key]
+        else:
+            live[key] = _twin(*key)  # rename / capability change
+            sugg.on_twin_changed(live[key])
+        assert sugg.suggestions() == _expected(sugg)
+
+
+def test_state_value_updates_are_ignored():
+    sugg = IncrementalMappingSuggester()
+    twin = SimpleNamespace(provider="hue", external_id="x", name="lamp", capabilities='["light"]', state='{"on": 1}')
+    assert sugg.on_twin_changed(twin) is True
+    twin.state = '{"on": 0}'
+    assert sugg.on_twin_changed(twin) is False
+
+
+def test_listen_applies_committed_changes_only():
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import Session, sessionmaker
+
+    from database.models import Base, DeviceTwin
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    sugg = IncrementalMappingSuggester()
+    sugg.listen()
+    try:
+        session = factory()
+        session.add(DeviceTwin(provider="hue", external_id="x", name="lamp", capabilities='["light"]'))
+        session.flush()
+        session.rollback()
+        assert sugg._index.get(("hue", "x")) is None
+
+        session.add(DeviceTwin(provider="hue", external_id="y", name="lamp", capabilities='["light"]'))
+        session.add(DeviceTwin(provider="home_assistant", external_id="a", name="lamp", capabilities='["light"]'))
+        session.flush()
+        assert sugg.suggestions() == []  # flushed, not committed
+        session.commit()
+        [row] = sugg.suggestions()
+        assert [s["external_id"] for s in row["suggestions"]] == ["y"]
+
+        session.delete(session.query(DeviceTwin).filter_by(external_id="y").one())
+        session.flush()
+        session.rollback()
+        assert sugg._index.get(("hue", "y")) is not None
+        session.close()
+    finally:
+        sugg.unlisten()
+    assert not event.contains(DeviceTwin, "after_insert", sugg._on_row_changed)
+    assert not event.contains(Session, "after_commit", sugg._on_commit)
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import json
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from tools.mapping.index import MappingFeatureIndex, TwinFeatures, pair_score
+
+
+def _twins(n: int):
+    random.seed(1)
+    words = ["kitchen", "light", "lamp", "hall", "sensor", "door", "fan"]
+    caps = ["light", "switch", "sensor", "fan", "media", "cover", "lock"]
+    out = []
+    for i in range(n):
+        out.append(
+            TwinFeatures.from_twin(
+                SimpleNamespace(
+                    provider="home_assistant" if i % 3 == 0 else "hue",
+                    external_id=f"e{i}",
+                    name=" ".join(random.sample(words, random.randint(0, 3))) or None,
+                    capabilities=json.dumps(random.sample(caps, random.randint(0, 5))),
+                    state=json.dumps({k: 1 for k in random.sample(["on", "level", "temp"], random.randint(0, 2))}),
+                )
+            )
+        )
+    return [t for t in out if t.provider == "home_assistant"], [t for t in out if t.provider != "home_assistant"]
+
+
+def _brute(s, targets, k):
+    scored = []
+    for t in targets:
+        score = pair_score(
+            s, t, len(s.name_tokens & t.name_tokens), len(s.cap_set & t.cap_set), len(s.key_set & t.key_set)
+        )
+        if score > 0:
+            scored.append((score, t))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return scored[:k]
+
+
+def test_index_top_k_matches_full_scan():
+    sources, targets = _twins(300)
+    index = MappingFeatureIndex()
+    for t in targets:
+        index.add(t)
+    for s in sources:
+        assert index.top_k(s, 3) == _brute(s, targets, 3)
+
+
+def test_rank_sparse_matches_full_scan():
+    pytest.importorskip("scipy")
+    from tools.mapping.index import rank_sparse
+
+    sources, targets = _twins(300)
+    ranked = rank_sparse(sources, targets, 3, max_cells=1000)
+    for s, top in zip(sources, ranked):
+        expected = _brute(s, targets, 3)
+        assert [t.key for _, t in top] == [t.key for _, t in expected]
+        assert [round(v, 9) for v, _ in top] == [round(v, 9) for v, _ in expected]
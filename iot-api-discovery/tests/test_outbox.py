@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import json
+
+from database.api_database import create_all, get_session_factory, session_scope
+from database.models import Outbox
+from tools.events.outbox import claim_batch, finalize_batch
+
+
+def test_claim_leases_rows_and_finalize_deletes_published(tmp_path):
+    url = f"sqlite:///{tmp_path}/outbox.db"
+    create_all(url)
+    factory = get_session_factory(url)
+    with session_scope(factory) as session:
+        for i in range(3):
+            session.add(Outbox(topic="t", payload=json.dumps({"i": i})))
+
+    claimed = claim_batch(factory, 10)
+    assert len(claimed) == 3
+    # leased rows are invisible to a second publisher
+    assert claim_batch(factory, 10) == []
+
+    finalize_batch(factory, claimed, ["1-0", None, "1-1"])
+    with session_scope(factory) as session:
+        rows = session.query(Outbox).all()
+        assert len(rows) == 1
+        assert rows[0].attempts == 1
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from automation.trigger_index import TriggerIndex
+
+
+def test_candidates_only_touch_matching_buckets():
+    idx = TriggerIndex()
+    idx.add("a", {"topic": "state", "deviceId": "d1"})
+    idx.add("b", {"topic": "state", "deviceId": "d2"})
+    idx.add("c", {})
+    idx.add("d", {"tags": ["x"]})
+
+    cands = idx.candidates({"topic": "state", "deviceId": "d1"})
+    assert "a" in cands and "b" not in cands
+    # wildcard rules (empty or unhashable triggers) are always candidates
+    assert "c" in cands and "d" in cands
+
+
+def test_remove_and_readd_keeps_insertion_order():
+    idx = TriggerIndex()
+    idx.add("r1", {"topic": "t"})
+    idx.add("r2", {"topic": "t"})
+    idx.add("r1", {"topic": "t", "deviceId": "x"})
+    assert idx.candidates({"topic": "t", "deviceId": "x"}) == ["r1", "r2"]
+
+    idx.remove("r2")
+    assert idx.candidates({"topic": "t", "deviceId": "x"}) == ["r1"]
+    assert len(idx) == 1 and idx.stats()["buckets"] == 1
+
+
+def test_none_trigger_values_do_not_anchor_rules():
+    idx = TriggerIndex()
+    idx.add("n", {"room": None})
+    idx.add("m", {"room": None, "topic": "t"})
+    # a None value matches events missing the key, so "n" must be a wildcard
+    assert idx.candidates({"topic": "t"}) == ["n", "m"]
+    assert idx.candidates({"topic": "other"}) == ["n"]
+    assert idx.stats()["wildcard"] == 1
@@ -24,9 +24,10 @@ except Exception:
     KafkaConsumer = None  # type: ignore
 
 try:
-    from prometheus_client import Counter
+    from prometheus_client import Counter, Gauge
 except Exception:
     Counter = None  # type: ignore
+    Gauge = None  # type: ignore
 
 
 STREAM_KEY = settings.events_stream_key or "events:stream"
@@ -36,6 +37,13 @@ _events_consumed = None
 if Counter is not None:
     _events_published = Counter("events_published_total", "Events published", ["backend", "topic"])
     _events_consumed = Counter("events_consumed_total", "Events consumed", ["backend", "topic"])
+_partition_lag = None
+_partition_lag_seconds = None
+if Gauge is not None:
+    _partition_lag = Gauge("events_partition_lag", "Entries waiting per worker partition", ["consumer", "partition"])
+    _partition_lag_seconds = Gauge(
+        "events_partition_lag_seconds", "Age of the oldest waiting entry per worker partition", ["consumer", "partition"]
+    )
 
 
 class EventBus:
@@ -58,13 +66,22 @@ class EventBus:
         except Exception:
             pass
 
-    def _record_consume(self, topic: str) -> None:
+    def record_consume(self, topic: str) -> None:
         try:
             if _events_consumed is not None:
                 _events_consumed.labels(self.backend, topic).inc()
         except Exception:
             pass
 
+    def record_partition_lag(self, consumer: str, partition: int, depth: int, age_seconds: float) -> None:
+        try:
+            if _partition_lag is not None:
+                _partition_lag.labels(consumer, str(partition)).set(depth)
+            if _partition_lag_seconds is not None:
+                _partition_lag_seconds.labels(consumer, str(partition)).set(age_seconds)
+        except Exception:
+            pass
+
     def health(self) -> Dict[str, Any]:
         ok = True
         detail: Dict[str, Any] = {"backend": self.backend}
@@ -142,6 +159,27 @@ class EventBus:
         # For non-redis backends, not used by Redis worker path
         return []
 
+    def autoclaim(
+        self, group: str, consumer: str, min_idle_ms: int, start_id: str = "0-0", count: int = 100
+    ) -> Tuple[str, List[Tuple[str, Dict[bytes, bytes]]]]:
+        """Take over entries pending longer than ``min_idle_ms`` on other consumers."""
+        if self.backend == "redis":
+            if not self._rds:
+                return "0-0", []
+            try:
+                res = self._rds.xautoclaim(STREAM_KEY, group, consumer, min_idle_ms, start_id=start_id, count=count)
+                next_id = res[0].decode() if isinstance(res[0], bytes) else res[0]
+                # Entries trimmed from the stream come back without fields;
+                # ack them so they leave the pending list
+                entries = [(eid, fields) for eid, fields in res[1] if fields]
+                gone = [eid for eid, fields in res[1] if not fields]
+                if gone:
+                    self._rds.xack(STREAM_KEY, group, *gone)
+                return next_id, entries
+            except Exception:
+                return "0-0", []
+        return "0-0", []
+
     async def subscribe_nats(self, subject: str, handler) -> None:
         if self.backend != "nats" or NATS is None:
             return
@@ -153,7 +191,7 @@ class EventBus:
                 data = json.loads(msg.data.decode())
             except Exception:
                 data = {}
-            self._record_consume(subject)
+            self.record_consume(subject)
             await handler(subject, data)
         await self._nats.subscribe(subject, cb=_cb)
 
@@ -166,5 +204,14 @@ class EventBus:
             except Exception:
                 pass
 
+    def ack_many(self, group: str, entry_ids: List[str]) -> None:
+        if self.backend == "redis":
+            if not self._rds or not entry_ids:
+                return
+            try:
+                self._rds.xack(STREAM_KEY, group, *entry_ids)
+            except Exception:
+                pass
+
 
 bus = EventBus()
\ No newline at end of file
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, update
+
+from config.settings import settings
+from database.api_database import session_scope
+from database.models import Outbox
+from tools.events.publisher import AsyncEventPublisher, publisher as default_publisher
+
+try:
+    from prometheus_client import Gauge
+except Exception:
+    Gauge = None  # type: ignore
+
+
+_outbox_depth = None
+_outbox_age = None
+if Gauge is not None:
+    _outbox_depth = Gauge("outbox_depth", "Outbox rows waiting to be published")
+    _outbox_age = Gauge("outbox_oldest_age_seconds", "Age of the oldest publishable outbox row")
+
+
+# (id, topic, payload, attempts)
+Claimed = Tuple[int, str, Dict[str, Any], int]
+
+
+def backoff_seconds(attempts: int) -> float:
+    base = settings.outbox_backoff_base_seconds
+    return min(base * (2 ** max(0, attempts - 1)), settings.outbox_backoff_max_seconds)
+
+
+def claim_batch(session_factory, limit: int) -> List[Claimed]:
+    """Lease up to ``limit`` publishable rows to this publisher.
+
+    Claiming moves ``available_at`` to a lease deadline in the future, so other
+    publishers skip the rows until the lease expires (e.g. if this process dies
+    mid-publish). On Postgres candidates are selected with FOR UPDATE SKIP
+    LOCKED so replicas never contend for the same rows; on SQLite, which has no
+    row locks, the conditional UPDATE plus the lease stamp decides the winner.
+    """
+    now = datetime.utcnow()
+    lease_until = now + timedelta(seconds=settings.outbox_lease_seconds)
+    with session_scope(session_factory) as session:
+        query = (
+            session.query(Outbox.id)
+            .filter(Outbox.available_at <= now)
+            .order_by(Outbox.available_at.asc())
+            .limit(limit)
+        )
+        if session.get_bind().dialect.name == "postgresql":
+            query = query.with_for_update(skip_locked=True)
+        ids = [row.id for row in query.all()]
+        if not ids:
+            return []
+        session.execute(
+            update(Outbox)
+            .where(Outbox.id.in_(ids), Outbox.available_at <= now)
+            .values(available_at=lease_until, attempts=Outbox.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        rows = (
+            session.query(Outbox)
+            .filter(Outbox.id.in_(ids), Outbox.available_at == lease_until)
+            .all()
+        )
+        claimed: List[Claimed] = []
+        for row in rows:
+            try:
+                payload = json.loads(row.payload) if isinstance(row.payload, str) else row.payload
+            except Exception:
+                payload = {}
+            claimed.append((row.id, row.topic, payload or {}, row.attempts or 0))
+        return claimed
+
+
+def finalize_batch(session_factory, claimed: List[Claimed], published_ids: List[Optional[str]]) -> None:
+    done: List[int] = []
+    # failed rows grouped by attempt count share one backoff deadline
+    retry: Dict[int, List[int]] = {}
+    for (row_id, _, _, attempts), published_id in zip(claimed, published_ids):
+        if published_id or attempts >= settings.outbox_max_attempts:
+            done.append(row_id)
+        else:
+            retry.setdefault(attempts, []).append(row_id)
+    now = datetime.utcnow()
+    with session_scope(session_factory) as session:
+        if done:
+            session.execute(delete(Outbox).where(Outbox.id.in_(done)).execution_options(synchronize_session=False))
+        for attempts, row_ids in retry.items():
+            session.execute(
+                update(Outbox)
+                .where(Outbox.id.in_(row_ids))
+                .values(available_at=now + timedelta(seconds=backoff_seconds(attempts)))
+                .execution_options(synchronize_session=False)
+            )
+
+
+def outbox_stats(session_factory) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    with session_scope(session_factory) as session:
+        depth = session.query(func.count(Outbox.id)).scalar() or 0
+        oldest = session.query(func.min(Outbox.available_at)).filter(Outbox.available_at <= now).scalar()
+    age = (now - oldest).total_seconds() if oldest is not None else 0.0
+    try:
+        if _outbox_depth is not None:
+            _outbox_depth.set(depth)
+        if _outbox_age is not None:
+            _outbox_age.set(age)
+    except Exception:
+        pass
+    return {"depth": depth, "oldest_age_seconds": age}
+
+
+async def drain_once(session_factory, pub: AsyncEventPublisher, limit: int) -> int:
+    claimed = await asyncio.to_thread(claim_batch, session_factory, limit)
+    if not claimed:
+        return 0
+    published_ids = await pub.publish_many([(topic, payload) for _, topic, payload, _ in claimed])
+    await asyncio.to_thread(finalize_batch, session_factory, claimed, published_ids)
+    return len(claimed)
+
+
+async def run_outbox_publisher(
+    session_factory,
+    pub: Optional[AsyncEventPublisher] = None,
+    drains: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> None:
+    """Run ``drains`` concurrent claim/publish loops; safe to run on many replicas."""
+    pub = pub or default_publisher
+    drains = max(1, drains or settings.outbox_drains)
+    batch_size = batch_size or settings.outbox_batch_size
+
+    async def _drain() -> None:
+        while True:
+            try:
+                n = await drain_once(session_factory, pub, batch_size)
+            except Exception:
+                n = 0
+            # keep going while there is a backlog; otherwise poll
+            if n < batch_size:
+                await asyncio.sleep(settings.outbox_poll_interval_seconds)
+
+    async def _report() -> None:
+        while True:
+            try:
+                await asyncio.to_thread(outbox_stats, session_factory)
+            except Exception:
+                pass
+            await asyncio.sleep(settings.outbox_stats_interval_seconds)
+
+    await asyncio.gather(_report(), *(_drain() for _ in range(drains)))
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.settings import settings
+from tools.events.bus import bus
+from tools.events.worker import GROUP, EmptyReadBackoff, _decode_entry, apply_event, apply_events_batch
+
+
+Entry = Tuple[Any, Dict[str, Any], float]  # (entry_id, decoded event, enqueued_at)
+
+
+def partition_key(event: Dict[str, Any]) -> Optional[str]:
+    payload = event.get("payload")
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except Exception:
+            payload = None
+    if isinstance(payload, dict):
+        device_id = payload.get("deviceId") or payload.get("external_id")
+        if device_id:
+            return str(device_id)
+    return None
+
+
+def partition_for(key: Optional[str], partitions: int, fallback: int = 0) -> int:
+    if key is None:
+        return fallback % partitions
+    # crc32 rather than hash(): stable across processes and restarts
+    return zlib.crc32(key.encode()) % partitions
+
+
+class PartitionedWorkerPool:
+    """Runs K partition consumers behind one reader of the ``workers`` group.
+
+    The reader hashes every entry it receives by device id onto a partition
+    queue; each partition applies its entries strictly in order on its own
+    executor thread, so partitions run their database work in parallel while
+    events for one device are never processed concurrently or out of order.
+
+    Ordering holds for the entries this consumer reads. Redis hands entries of
+    one group to any of its consumers, so deployments that need per-device
+    order run a single consumer per group and scale with ``partitions``.
+
+    A failing event is retried in place. If it still fails, its device is
+    held back: the entry and every later one for that device wait, unacked,
+    in a local list that is retried in order every claim interval until it
+    drains. If the consumer dies meanwhile, the entries are still pending and
+    XAUTOCLAIM hands them to another consumer in id order.
+    """
+
+    def __init__(
+        self,
+        consumer: str,
+        partitions: int,
+        group: str = GROUP,
+        batch_size: Optional[int] = None,
+        claim_min_idle_ms: Optional[int] = None,
+        claim_interval_seconds: Optional[float] = None,
+        retry_attempts: Optional[int] = None,
+        retry_backoff_seconds: Optional[float] = None,
+    ) -> None:
+        self.consumer = consumer
+        self.partitions = max(1, partitions)
+        self.group = group
+        self.batch_size = batch_size or settings.events_batch_size
+        self.claim_min_idle_ms = claim_min_idle_ms or settings.events_claim_min_idle_ms
+        self.claim_interval_seconds = claim_interval_seconds or settings.events_claim_interval_seconds
+        self.retry_attempts = max(1, retry_attempts or settings.events_retry_attempts)
+        self.retry_backoff_seconds = (
+            settings.events_retry_backoff_seconds if retry_backoff_seconds is None else retry_backoff_seconds
+        )
+        self._queues: List[asyncio.Queue] = [
+            asyncio.Queue(maxsize=self.batch_size * 4) for _ in range(self.partitions)
+        ]
+        # One thread per partition keeps its database work serial and off the loop
+        self._executors: List[ThreadPoolExecutor] = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"events-partition-{i}")
+            for i in range(self.partitions)
+        ]
+        self._tasks: List[asyncio.Task] = []
+        self._inflight: set = set()
+        # device key -> its entries waiting behind a failed one, oldest first
+        self._held: Dict[str, List[Entry]] = {}
+        self._retry_tasks: set = set()
+        self._rr = 0
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        bus.ensure_consumer_group(self.group)
+        self._tasks = [asyncio.create_task(self._partition_loop(i)) for i in range(self.partitions)]
+        self._tasks.append(asyncio.create_task(self._read_loop()))
+        self._tasks.append(asyncio.create_task(self._claim_loop()))
+
+    async def stop(self) -> None:
+        tasks = self._tasks + list(self._retry_tasks)
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(BaseException):
+                await task
+        self._tasks = []
+        # Cancelled partitions may still have a DB batch running in their thread
+        await asyncio.gather(*(asyncio.to_thread(executor.shutdown, True) for executor in self._executors))
+
+    async def run(self) -> None:
+        await self.start()
+        await asyncio.gather(*self._tasks)
+
+    async def dispatch(self, entries: List[Tuple[Any, Dict[Any, Any]]]) -> None:
+        now = time.monotonic()
+        for entry_id, fields in entries:
+            if entry_id in self._inflight:
+                # already queued locally; a reclaim of our own slow entry
+                continue
+            self._inflight.add(entry_id)
+            event = _decode_entry(fields)
+            key = partition_key(event)
+            if key is not None and key in self._held:
+                # queue behind the device's failed entry
+                self._held[key].append((entry_id, event, now))
+                continue
+            if key is None:
+                # no ordering constraint: spread round-robin
+                self._rr += 1
+            idx = partition_for(key, self.partitions, self._rr)
+            # bounded queue: a slow partition applies backpressure to the reader
+            await self._queues[idx].put((entry_id, event, now))
+
+    async def _read_loop(self) -> None:
+        backoff = EmptyReadBackoff()
+        while True:
+            entries = await backoff.read(self.group, self.consumer, self.batch_size, 1000)
+            if entries:
+                await self.dispatch(entries)
+
+    async def _claim_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.claim_interval_seconds)
+            start_id = "0-0"
+            while True:
+                start_id, entries = await asyncio.to_thread(
+                    bus.autoclaim, self.group, self.consumer, self.claim_min_idle_ms, start_id, self.batch_size
+                )
+                if entries:
+                    await self.dispatch(entries)
+                if start_id in ("0-0", "0") or not entries:
+                    break
+
+    def _drain(self, queue: asyncio.Queue, first: Entry) -> List[Entry]:
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    def _report_lag(self, idx: int, queue: asyncio.Queue, oldest: float) -> None:
+        bus.record_partition_lag(self.consumer, idx, queue.qsize(), max(0.0, time.monotonic() - oldest))
+
+    async def _run(self, idx: int, fn, arg) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._executors[idx], fn, arg)
+
+    async def _apply_with_retry(self, idx: int, event: Dict[str, Any]) -> bool:
+        for attempt in range(self.retry_attempts):
+            if attempt:
+                await asyncio.sleep(self.retry_backoff_seconds * (2 ** (attempt - 1)))
+            try:
+                await self._run(idx, apply_event, event)
+                return True
+            except Exception:
+                continue
+        return False
+
+    def _done(self, entry_id: Any, event: Dict[str, Any]) -> None:
+        bus.ack(self.group, entry_id)
+        bus.record_consume(str(event.get("topic")))
+        self._inflight.discard(entry_id)
+
+    async def _apply_in_order(self, idx: int, batch: List[Entry]) -> None:
+        for entry in batch:
+            entry_id, event, _ = entry
+            key = partition_key(event)
+            if key is not None and key in self._held:
+                self._held[key].append(entry)
+            elif await self._apply_with_retry(idx, event):
+                self._done(entry_id, event)
+            elif key is None:
+                # no ordering constraint: left pending for the claim loop
+                self._inflight.discard(entry_id)
+            else:
+                self._held[key] = [entry]
+                task = asyncio.create_task(self._retry_held(idx, key))
+                self._retry_tasks.add(task)
+                task.add_done_callback(self._retry_tasks.discard)
+
+    async def _retry_held(self, idx: int, key: str) -> None:
+        held = self._held[key]
+        while True:
+            await asyncio.sleep(self.claim_interval_seconds)
+            while held:
+                entry_id, event, _ = held[0]
+                if not await self._apply_with_retry(idx, event):
+                    break
+                held.pop(0)
+                self._done(entry_id, event)
+            if not held:
+                del self._held[key]
+                return
+
+    async def _partition_loop(self, idx: int) -> None:
+        queue = self._queues[idx]
+        while True:
+            first = await queue.get()
+            batch = self._drain(queue, first)
+            self._report_lag(idx, queue, batch[0][2])
+            applied = False
+            if settings.events_batch_mode and not any(partition_key(e) in self._held for _, e, _ in batch):
+                try:
+                    await self._run(idx, apply_events_batch, [event for _, event, _ in batch])
+                    applied = True
+                except Exception:
+                    # replay one by one below to isolate the failing entry
+                    pass
+            if applied:
+                bus.ack_many(self.group, [entry_id for entry_id, _, _ in batch])
+                for entry_id, event, _ in batch:
+                    bus.record_consume(str(event.get("topic")))
+                    self._inflight.discard(entry_id)
+            else:
+                await self._apply_in_order(idx, batch)
+            for _ in batch:
+                queue.task_done()
+            self._report_lag(idx, queue, time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "consumer": self.consumer,
+            "partitions": {str(i): q.qsize() for i, q in enumerate(self._queues)},
+            "held_devices": len(self._held),
+        }
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.settings import settings
+from tools.events.bus import STREAM_KEY, EventBus, KafkaProducer, bus
+
+try:
+    import redis.asyncio as aioredis  # type: ignore
+except Exception:
+    aioredis = None  # type: ignore
+
+try:
+    from nats.aio.client import Client as NATS  # type: ignore
+except Exception:
+    NATS = None  # type: ignore
+
+
+_Pending = Tuple[str, Dict[str, Any], Optional[asyncio.Future]]
+
+# Queued by ``aclose`` so the flush loop sends what it holds and exits
+_STOP = object()
+
+
+class PublishError(Exception):
+    """An event could not be handed to the backend (send failure or shutdown)."""
+
+
+class AsyncEventPublisher:
+    """Buffered, non-blocking publisher in front of the event bus backend.
+
+    Events are queued and flushed by a background task when ``batch_size``
+    events are waiting or ``linger_ms`` has passed since the first one, using a
+    single Redis pipeline (or one NATS flush / Kafka flush) per batch. The
+    queue is bounded, so producers wait once ``max_buffer`` events are pending.
+
+    An event resolves to its id, to None when no backend is configured, or to
+    a ``PublishError`` when sending it failed.
+    """
+
+    def __init__(
+        self,
+        event_bus: EventBus = bus,
+        batch_size: Optional[int] = None,
+        linger_ms: Optional[int] = None,
+        max_buffer: Optional[int] = None,
+    ) -> None:
+        self._bus = event_bus
+        self.backend = event_bus.backend
+        self.batch_size = batch_size or settings.events_publish_batch_size
+        self.linger_ms = settings.events_publish_linger_ms if linger_ms is None else linger_ms
+        self.max_buffer = max_buffer or settings.events_publish_max_buffer
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None  # the loop the queue and clients belong to
+        self._task: Optional[asyncio.Task] = None
+        self._batch: List[_Pending] = []  # being collected or sent by the flush loop
+        self._rds = None
+        self._nats = None
+
+    def _ensure_started(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            # First use, or the app restarted on a new loop without ``aclose``:
+            # nothing bound to the old loop can be used from this one
+            self._queue = asyncio.Queue(maxsize=self.max_buffer)
+            self._loop = loop
+            self._task = None
+            self._batch = []
+            self._rds = None
+            self._nats = None
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+            self._task.add_done_callback(self._flush_loop_done)
+        return self._queue
+
+    async def publish(self, topic: str, payload: Dict[str, Any], wait: bool = True) -> Optional[str]:
+        """Queue one event; with ``wait`` return its id once the batch is sent.
+
+        Raises ``PublishError`` if the send failed.
+        """
+        queue = self._ensure_started()
+        fut: Optional[asyncio.Future] = asyncio.get_running_loop().create_future() if wait else None
+        await queue.put((topic, payload, fut))
+        if fut is None:
+            return None
+        return await fut
+
+    async def publish_many(
+        self, events: List[Tuple[str, Dict[str, Any]]], return_exceptions: bool = False
+    ) -> List[Any]:
+        """Queue several events and return their ids in order.
+
+        A failed event yields None, or its ``PublishError`` with
+        ``return_exceptions``, so callers can tell failures from events that
+        had no backend to go to.
+        """
+        queue = self._ensure_started()
+        loop = asyncio.get_running_loop()
+        futures: List[asyncio.Future] = []
+        for topic, payload in events:
+            fut = loop.create_future()
+            futures.append(fut)
+            await queue.put((topic, payload, fut))
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        if return_exceptions:
+            return list(results)
+        return [None if isinstance(r, BaseException) else r for r in results]
+
+    async def aclose(self, timeout: float = 10.0) -> None:
+        """Send everything queued, then stop the flush loop.
+
+        Events still unsent after ``timeout`` seconds fail with ``PublishError``.
+        """
+        if self._task is None:
+            return
+        task, queue = self._task, self._queue
+        if not task.done() and queue is not None:
+            await queue.put(_STOP)
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if not done:
+                task.cancel()
+                with contextlib.suppress(BaseException):
+                    await task
+        self._task = None
+        self._queue = None
+        self._fail(self._batch, "publisher closed")
+        self._batch = []
+        # Events queued behind the stop marker
+        if queue is not None:
+            rest: List[_Pending] = []
+            while not queue.empty():
+                item = queue.get_nowait()
+                if item is not _STOP:
+                    rest.append(item)
+            if rest:
+                try:
+                    await asyncio.wait_for(self._send(rest), timeout)
+                except Exception:
+                    pass
+                self._fail(rest, "publisher closed")
+        if self._rds is not None:
+            with contextlib.suppress(Exception):
+                await self._rds.aclose()
+            self._rds = None
+        if self._nats is not None:
+            with contextlib.suppress(Exception):
+                await self._nats.drain()
+            self._nats = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "buffered": self._queue.qsize() if self._queue is not None else 0,
+            "max_buffer": self.max_buffer,
+            "batch_size": self.batch_size,
+            "linger_ms": self.linger_ms,
+        }
+
+    async def _flush_loop(self) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        stopping = False
+        while not stopping:
+            first = await queue.get()
+            if first is _STOP:
+                return
+            batch: List[_Pending] = [first]
+            self._batch = batch
+            deadline = time.monotonic() + self.linger_ms / 1000.0
+            while len(batch) < self.batch_size:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._send(batch)
+            self._batch = []
+
+    def _flush_loop_done(self, task: asyncio.Task) -> None:
+        # A crashed loop would leave producers waiting forever: fail what it
+        # held; the next publish starts a new loop
+        if task.cancelled() or task.exception() is None:
+            return
+        self._fail(self._batch, f"publisher flush loop failed: {task.exception()}")
+        self._batch = []
+        queue = self._queue
+        if queue is not None and self._task is task:
+            rest: List[_Pending] = []
+            while not queue.empty():
+                item = queue.get_nowait()
+                if item is not _STOP:
+                    rest.append(item)
+            self._fail(rest, "publisher flush loop failed")
+
+    @staticmethod
+    def _fail(batch: List[_Pending], reason: str) -> None:
+        for _, _, fut in batch:
+            if fut is not None and not fut.done():
+                fut.set_exception(PublishError(reason))
+
+    async def _send(self, batch: List[_Pending]) -> None:
+        results: List[Any]
+        try:
+            if self.backend == "redis":
+                results = await self._send_redis(batch)
+            elif self.backend == "nats":
+                results = await self._send_nats(batch)
+            elif self.backend == "kafka":
+                results = await asyncio.to_thread(self._send_kafka, batch)
+            else:
+                results = [None] * len(batch)
+        except Exception as exc:
+            results = [PublishError(str(exc))] * len(batch)
+        for (topic, _, fut), result in zip(batch, results):
+            if isinstance(result, PublishError):
+                if fut is not None and not fut.done():
+                    fut.set_exception(result)
+                continue
+            if result is not None:
+                self._bus._record_pub(topic)
+            if fut is not None and not fut.done():
+                fut.set_result(result)
+
+    async def _send_redis(self, batch: List[_Pending]) -> List[Any]:
+        if aioredis is None or not settings.redis_url:
+            return [None] * len(batch)
+        if self._rds is None:
+            self._rds = aioredis.Redis.from_url(settings.redis_url)
+        ts = int(time.time())
+        async with self._rds.pipeline(transaction=False) as pipe:
+            for topic, payload, _ in batch:
+                data = {"topic": topic, "ts": ts, "payload": json.dumps(payload)}
+                pipe.xadd(STREAM_KEY, data, maxlen=settings.events_maxlen, approximate=True)
+            results = await pipe.execute(raise_on_error=False)
+        return [
+            (r.decode() if isinstance(r, bytes) else r) if not isinstance(r, Exception) else PublishError(str(r))
+            for r in results
+        ]
+
+    async def _send_nats(self, batch: List[_Pending]) -> List[Optional[str]]:
+        if NATS is None:
+            return [None] * len(batch)
+        if self._nats is None:
+            self._nats = NATS()
+            await self._nats.connect(settings.nats_url or "nats://nats:4222")
+        for topic, payload, _ in batch:
+            await self._nats.publish(topic, json.dumps(payload).encode())
+        await self._nats.flush()
+        return ["nats"] * len(batch)
+
+    def _send_kafka(self, batch: List[_Pending]) -> List[Optional[str]]:
+        if KafkaProducer is None:
+            return [None] * len(batch)
+        if self._bus._kafka_producer is None:
+            self._bus._kafka_producer = KafkaProducer(
+                bootstrap_servers=(settings.kafka_bootstrap_servers or "localhost:9092").split(","),
+                value_serializer=lambda v: json.dumps(v).encode(),
+            )
+        producer = self._bus._kafka_producer
+        for topic, payload, _ in batch:
+            producer.send(topic, payload)
+        producer.flush()
+        return ["kafka"] * len(batch)
+
+
+publisher = AsyncEventPublisher()
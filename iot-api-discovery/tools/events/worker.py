@@ -2,27 +2,48 @@ from __future__ import annotations
 
 import asyncio
 import json
-from typing import Any, Dict
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
 
 from tools.events.bus import bus
+from tools.events.publisher import publisher
 from config.settings import settings
 from database.api_database import get_session_factory, session_scope
-from database.models import DeviceTwin, DeviceTwinVersion, AuditEvent, Outbox
+from database.models import DeviceTwin, DeviceTwinVersion, AuditEvent
+from tools.events.outbox import run_outbox_publisher
 
 GROUP = "workers"
-CONSUMER = "worker-1"
+CONSUMER = settings.events_consumer_name
 
 SessionFactory = get_session_factory(settings.database_url)
 
 
-async def process_event(event: Dict[str, Any]) -> None:
-    topic = event.get("topic")
+def _decode_entry(fields: Dict[Any, Any]) -> Dict[str, Any]:
+    return {
+        (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+        for k, v in fields.items()
+    }
+
+
+def _event_payload(event: Dict[str, Any]) -> Dict[str, Any]:
     payload = event.get("payload", {})
     try:
         if isinstance(payload, str):
             payload = json.loads(payload)
     except Exception:
         payload = {}
+    return payload if isinstance(payload, dict) else {}
+
+
+async def process_event(event: Dict[str, Any]) -> None:
+    apply_event(event)
+
+
+def apply_event(event: Dict[str, Any]) -> None:
+    """Synchronous body of ``process_event``, for callers running it off the event loop."""
+    topic = event.get("topic")
+    payload = _event_payload(event)
 
     with session_scope(SessionFactory) as session:
         session.add(AuditEvent(kind=f"event:{topic}", payload=json.dumps(payload)))
@@ -90,31 +111,157 @@ async def process_event(event: Dict[str, Any]) -> None:
                 )
 
 
-async def outbox_publisher_loop() -> None:
-    while True:
-        with session_scope(SessionFactory) as session:
-            from datetime import datetime
+async def process_events_batch(events: List[Dict[str, Any]]) -> None:
+    apply_events_batch(events)
+
+
+def apply_events_batch(events: List[Dict[str, Any]]) -> None:
+    """Apply a batch of events in one transaction.
 
-            pending = (
-                session.query(Outbox)
-                .order_by(Outbox.available_at.asc())
-                .limit(20)
+    Equivalent to calling ``process_event`` for each event in order, but twins
+    touched by the batch are loaded with one query per provider, repeated
+    updates to a twin are folded into a single row update, and audit/version
+    rows are bulk-inserted.
+    """
+    audits: List[Dict[str, Any]] = []
+    # (provider, external_id) -> ordered list of payloads, insertion-ordered
+    by_twin: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for event in events:
+        topic = event.get("topic")
+        payload = _event_payload(event)
+        audits.append({"kind": f"event:{topic}", "payload": json.dumps(payload), "created_at": datetime.utcnow()})
+        if topic == "smartthings.device_event" and payload.get("deviceId"):
+            by_twin.setdefault(("smartthings", payload["deviceId"]), []).append(payload)
+
+    with session_scope(SessionFactory) as session:
+        session.bulk_insert_mappings(AuditEvent, audits)
+        if not by_twin:
+            return
+
+        ids_by_provider: Dict[str, List[str]] = {}
+        for provider, external_id in by_twin:
+            ids_by_provider.setdefault(provider, []).append(external_id)
+        twins: Dict[Tuple[str, str], DeviceTwin] = {}
+        for provider, external_ids in ids_by_provider.items():
+            rows = (
+                session.query(DeviceTwin)
+                .filter(DeviceTwin.provider == provider, DeviceTwin.external_id.in_(external_ids))
                 .all()
             )
-            for row in pending:
+            for row in rows:
+                twins[(row.provider, row.external_id)] = row
+
+        now = datetime.utcnow()
+        applied: List[Tuple[DeviceTwin, List[Tuple[int, str, Any]]]] = []
+        for key, payloads in by_twin.items():
+            twin = twins.get(key)
+            version = (twin.version or 0) if twin is not None else 0
+            name = twin.name if twin is not None else None
+            state_json = caps_json = ""
+            versions: List[Tuple[int, str, Any]] = []
+            for payload in payloads:
+                capability = payload.get("capability")
+                state_json = json.dumps({capability: payload.get("value")} if capability else {})
+                caps_json = json.dumps([capability] if capability else [])
+                name = payload.get("displayName") or name
+                version += 1
+                versions.append((version, state_json, payload.get("eventId")))
+            if twin is None:
+                twin = DeviceTwin(provider=key[0], external_id=key[1])
+                session.add(twin)
+            twin.name = name
+            twin.state = state_json
+            twin.capabilities = caps_json
+            twin.updated_at = now
+            twin.version = version
+            applied.append((twin, versions))
+
+        # assign primary keys to newly created twins
+        session.flush()
+        session.bulk_insert_mappings(
+            DeviceTwinVersion,
+            [
+                {"twin_id": twin.id, "version": v, "diff": None, "full": full, "event_id": event_id, "created_at": now}
+                for twin, versions in applied
+                for v, full, event_id in versions
+            ],
+        )
+
+
+async def outbox_publisher_loop() -> None:
+    await run_outbox_publisher(SessionFactory, publisher)
+
+
+class EmptyReadBackoff:
+    """Pauses a consume loop after reads that come back empty without blocking.
+
+    ``bus.read_group`` returns ``[]`` at once when Redis is missing or raising;
+    the pause doubles on each such read, up to ``max_delay``, and resets as
+    soon as a read returns entries or blocks for its full timeout.
+    """
+
+    def __init__(self, base_delay: float = 0.1, max_delay: float = 5.0) -> None:
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._delay = 0.0
+
+    async def read(self, group: str, consumer: str, count: int, block_ms: int) -> List[Tuple[Any, Dict[Any, Any]]]:
+        started = time.monotonic()
+        entries = await asyncio.to_thread(bus.read_group, group, consumer, count, block_ms)
+        # Half the timeout: a read that waited that long was not spinning
+        if entries or time.monotonic() - started >= block_ms / 2000.0:
+            self._delay = 0.0
+            return entries
+        self._delay = min(self.max_delay, self._delay * 2 if self._delay else self.base_delay)
+        await asyncio.sleep(self._delay)
+        return []
+
+
+async def _read_batch(
+    group: str, consumer: str, batch_size: int, flush_interval_ms: int, backoff: EmptyReadBackoff
+) -> List[Tuple[Any, Dict[Any, Any]]]:
+    # Block for the first entries, then keep topping up until the batch is
+    # full or the flush interval has elapsed.
+    entries = await backoff.read(group, consumer, batch_size, 1000)
+    if not entries:
+        return []
+    deadline = time.monotonic() + flush_interval_ms / 1000.0
+    while len(entries) < batch_size:
+        remaining_ms = int((deadline - time.monotonic()) * 1000)
+        if remaining_ms <= 0:
+            break
+        more = await asyncio.to_thread(bus.read_group, group, consumer, batch_size - len(entries), remaining_ms)
+        if not more:
+            break
+        entries.extend(more)
+    return entries
+
+
+async def batch_consume_loop(
+    group: str = GROUP,
+    consumer: str = CONSUMER,
+    batch_size: int | None = None,
+    flush_interval_ms: int | None = None,
+) -> None:
+    batch_size = batch_size or settings.events_batch_size
+    flush_interval_ms = settings.events_flush_interval_ms if flush_interval_ms is None else flush_interval_ms
+    backoff = EmptyReadBackoff()
+    while True:
+        entries = await _read_batch(group, consumer, batch_size, flush_interval_ms, backoff)
+        if not entries:
+            continue
+        events = [_decode_entry(fields) for _, fields in entries]
+        try:
+            await process_events_batch(events)
+            bus.ack_many(group, [entry_id for entry_id, _ in entries])
+        except Exception:
+            # Isolate the failing entry: replay one by one, acking what succeeds
+            for (entry_id, _), event in zip(entries, events):
                 try:
-                    payload = json.loads(row.payload) if isinstance(row.payload, str) else row.payload
+                    await process_event(event)
+                    bus.ack(group, entry_id)
                 except Exception:
-                    payload = {}
-                published_id = bus.publish(row.topic, payload or {})
-                row.attempts = (row.attempts or 0) + 1
-                row.available_at = datetime.utcnow()
-                if (row.attempts or 0) >= 10:
-                    session.delete(row)
-                    continue
-                if published_id:
-                    session.delete(row)
-        await asyncio.sleep(1.0)
+                    pass
 
 
 async def run_worker() -> None:
@@ -128,20 +275,28 @@ async def run_worker() -> None:
             await asyncio.sleep(1.0)
 
     # Else Redis consumer
+    if settings.events_pool_partitions > 1:
+        from tools.events.pool import PartitionedWorkerPool
+
+        pool = PartitionedWorkerPool(CONSUMER, settings.events_pool_partitions)
+        await asyncio.gather(pool.run(), outbox_publisher_loop())
+        return
+
     bus.ensure_consumer_group(GROUP)
     async def consume_loop() -> None:
         while True:
             entries = bus.read_group(GROUP, CONSUMER, count=10, block_ms=1000)
             for entry_id, fields in entries:
                 try:
-                    event = {k.decode(): v.decode() if isinstance(v, bytes) else v for k, v in fields.items()}
+                    event = _decode_entry(fields)
                     await process_event(event)
                     bus.ack(GROUP, entry_id)
                 except Exception as exc:
                     pass
             await asyncio.sleep(0.1)
 
-    await asyncio.gather(consume_loop(), outbox_publisher_loop())
+    loop = batch_consume_loop() if settings.events_batch_mode else consume_loop()
+    await asyncio.gather(loop, outbox_publisher_loop())
 
 
 if __name__ == "__main__":
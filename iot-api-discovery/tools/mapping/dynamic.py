@@ -1,37 +1,34 @@
 from __future__ import annotations
 
-import json
 import math
-import re
 from typing import Any, Dict, List, Optional, Tuple
 
 from database.models import DeviceTwin
+from tools.mapping.index import (
+    MappingFeatureIndex,
+    TwinFeatures,
+    normalize_name,
+    np,
+    parse_capabilities,
+    parse_state_keys,
+    rank_sparse,
+    sparse,
+)
+
+# Below this many source x target pairs building matrices is not worth it
+_SPARSE_MIN_PAIRS = 50_000
 
 
 def _normalize_name(name: str | None) -> str:
-    if not name:
-        return ""
-    s = name.casefold().strip()
-    s = re.sub(r"\s+", " ", s)
-    s = re.sub(r"[^a-z0-9 _-]", "", s)
-    return s
+    return normalize_name(name)
 
 
 def _capabilities(twin: DeviceTwin) -> List[str]:
-    try:
-        return list(json.loads(twin.capabilities or "[]"))
-    except Exception:
-        return []
+    return parse_capabilities(twin.capabilities)
 
 
 def _state_keys(twin: DeviceTwin) -> List[str]:
-    try:
-        st = json.loads(twin.state or "{}")
-        if isinstance(st, dict):
-            return list(st.keys()) + list((st.get("attributes") or {}).keys())
-    except Exception:
-        pass
-    return []
+    return parse_state_keys(twin.state)
 
 
 def build_signal_profile(twin: DeviceTwin) -> Dict[str, Any]:
@@ -65,58 +62,41 @@ def _name_similarity(a: str, b: str) -> float:
     return inter / union
 
 
+def rank_mappings(
+    sources: List[TwinFeatures], targets: List[TwinFeatures], top_k: int = 3
+) -> List[List[Tuple[float, TwinFeatures]]]:
+    """Top-k targets per source, using sparse matrices for large sets when available."""
+    if np is not None and sparse is not None and len(sources) * len(targets) >= _SPARSE_MIN_PAIRS:
+        return rank_sparse(sources, targets, top_k)
+    index = MappingFeatureIndex()
+    for t in targets:
+        index.add(t)
+    return [index.top_k(s, top_k) for s in sources]
+
+
 def suggest_mappings(session_factory, source_provider: str = "home_assistant", top_k: int = 3) -> List[Dict[str, Any]]:
     session = session_factory()
     try:
-        sources = (
-            session.query(DeviceTwin)
-            .filter(DeviceTwin.provider == source_provider)
-            .all()
-        )
-        targets = [t for t in session.query(DeviceTwin).all() if t.provider != source_provider]
-        # Precompute indices
-        idx_by_provider: Dict[str, List[DeviceTwin]] = {}
-        for t in targets:
-            idx_by_provider.setdefault(t.provider, []).append(t)
-        out: List[Dict[str, Any]] = []
-        for s in sources:
-            s_name = _normalize_name(s.name) or _normalize_name(s.external_id)
-            s_caps = _capabilities(s)
-            s_keys = _state_keys(s)
-            candidates: List[Tuple[float, DeviceTwin]] = []
-            for prov, twins in idx_by_provider.items():
-                for t in twins:
-                    t_name = _normalize_name(t.name) or _normalize_name(t.external_id)
-                    t_caps = _capabilities(t)
-                    t_keys = _state_keys(t)
-                    score = (
-                        0.6 * _name_similarity(s_name, t_name)
-                        + 0.3 * _jaccard(s_caps, t_caps)
-                        + 0.1 * _jaccard(s_keys, t_keys)
-                    )
-                    # penalize wildly different capability sizes
-                    if s_caps and t_caps and abs(len(s_caps) - len(t_caps)) >= 3:
-                        score *= 0.9
-                    if score > 0:
-                        candidates.append((score, t))
-            candidates.sort(key=lambda x: x[0], reverse=True)
-            top = candidates[:top_k]
-            out.append(
-                {
-                    "source": build_signal_profile(s),
-                    "suggestions": [
-                        {
-                            "provider": t.provider,
-                            "external_id": t.external_id,
-                            "name": t.name,
-                            "capabilities": _capabilities(t),
-                            "score": round(score, 3),
-                        }
-                        for score, t in top
-                    ],
-                }
-            )
-        return out
+        # Parse every twin once; candidates come from the feature index rather
+        # than scoring every source against every target.
+        sources: List[TwinFeatures] = []
+        by_provider: Dict[str, List[TwinFeatures]] = {}
+        for twin in session.query(DeviceTwin).all():
+            feat = TwinFeatures.from_twin(twin)
+            if twin.provider == source_provider:
+                sources.append(feat)
+            else:
+                by_provider.setdefault(twin.provider, []).append(feat)
+        # provider-grouped order keeps tie-breaking identical to the old scan
+        targets = [t for twins in by_provider.values() for t in twins]
+        ranked = rank_mappings(sources, targets, top_k)
+        return [
+            {
+                "source": s.profile(),
+                "suggestions": [t.suggestion(score) for score, t in top],
+            }
+            for s, top in zip(sources, ranked)
+        ]
     finally:
         session.close()
 
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import bisect
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from database.models import DeviceTwin
+from tools.mapping.dynamic import rank_mappings
+from tools.mapping.index import MappingFeatureIndex, TwinFeatures, TwinKey, pair_score
+
+
+# Entries are kept sorted ascending by (-score, seq), i.e. best first
+_Entry = Tuple[float, int, TwinKey]
+
+
+class IncrementalMappingSuggester:
+    """Keeps ``suggest_mappings`` results up to date one twin change at a time.
+
+    All twins live in one ``MappingFeatureIndex``; each source twin keeps its
+    current top-k, and every target remembers which sources rank it. A change
+    to a twin therefore only touches the sources that overlap with its new
+    features or that ranked it before, instead of rescoring every pair. State
+    value updates that don't change name, capabilities or state keys are
+    ignored outright.
+    """
+
+    def __init__(self, source_provider: str = "home_assistant", top_k: int = 3) -> None:
+        self.source_provider = source_provider
+        self.top_k = top_k
+        self._index = MappingFeatureIndex()
+        self._tops: Dict[TwinKey, List[_Entry]] = {}
+        self._ranked_by: Dict[TwinKey, Set[TwinKey]] = {}
+        self._lock = threading.RLock()
+        # session.info slot for changes flushed but not yet committed
+        self._pending_key = ("mapping_changes", id(self))
+
+    # --- bootstrap -------------------------------------------------------
+
+    def load(self, session_factory) -> None:
+        """Build the index and all top-k lists from the database in one batch pass."""
+        session = session_factory()
+        try:
+            feats = [TwinFeatures.from_twin(t) for t in session.query(DeviceTwin).all()]
+        finally:
+            session.close()
+        with self._lock:
+            self._index = MappingFeatureIndex()
+            self._tops.clear()
+            self._ranked_by.clear()
+            # targets first so their insertion order matches the batch tie order
+            by_provider: Dict[str, List[TwinFeatures]] = {}
+            sources: List[TwinFeatures] = []
+            for f in feats:
+                if f.provider == self.source_provider:
+                    sources.append(f)
+                else:
+                    by_provider.setdefault(f.provider, []).append(f)
+            targets = [t for group in by_provider.values() for t in group]
+            for f in targets + sources:
+                self._index.add(f)
+            for s, top in zip(sources, rank_mappings(sources, targets, self.top_k)):
+                self._set_top(s.key, [(-score, self._index.seq(t.key), t.key) for score, t in top])
+
+    # --- change feed -----------------------------------------------------
+
+    def on_twin_changed(self, twin: Any) -> bool:
+        """Apply a created/updated twin; returns False if nothing mapping-relevant changed."""
+        return self._apply_changed(TwinFeatures.from_twin(twin))
+
+    def _apply_changed(self, feat: TwinFeatures) -> bool:
+        with self._lock:
+            old = self._index.get(feat.key)
+            if old is not None and _same_signal(old, feat):
+                return False
+            self._index.add(feat)
+            if feat.provider == self.source_provider:
+                self._recompute(feat.key)
+            else:
+                self._target_changed(feat)
+            return True
+
+    def on_twin_removed(self, provider: str, external_id: str) -> None:
+        key = (provider, external_id)
+        with self._lock:
+            if self._index.remove(key) is None:
+                return
+            if provider == self.source_provider:
+                self._set_top(key, [])
+                self._tops.pop(key, None)
+                return
+            for source in list(self._ranked_by.pop(key, ())):
+                self._recompute(source)
+
+    def _target_changed(self, feat: TwinFeatures) -> None:
+        key = feat.key
+        seq = self._index.seq(key)
+        # sources that ranked the old version may now rank it lower: rescore them
+        stale = set(self._ranked_by.get(key, ()))
+        for source in stale:
+            self._recompute(source)
+        names, caps, keys = self._index.overlaps(feat)
+        for source in names.keys() | caps.keys() | keys.keys():
+            if source[0] != self.source_provider or source in stale:
+                continue
+            s = self._index.get(source)
+            if s is None:
+                continue
+            score = pair_score(s, feat, names[source], caps[source], keys[source])
+            if score > 0:
+                self._offer(source, (-score, seq, key))
+
+    def _offer(self, source: TwinKey, entry: _Entry) -> None:
+        top = self._tops.get(source, [])
+        if len(top) >= self.top_k and entry >= top[-1]:
+            return
+        new = list(top)
+        bisect.insort(new, entry)
+        self._set_top(source, new[: self.top_k])
+
+    def _recompute(self, source: TwinKey) -> None:
+        s = self._index.get(source)
+        if s is None:
+            return
+        ranked = self._index.top_k(s, self.top_k, exclude_provider=self.source_provider)
+        self._set_top(source, [(-score, self._index.seq(t.key), t.key) for score, t in ranked])
+
+    def _set_top(self, source: TwinKey, entries: List[_Entry]) -> None:
+        for _, _, target in self._tops.get(source, ()):
+            ranked = self._ranked_by.get(target)
+            if ranked is not None:
+                ranked.discard(source)
+                if not ranked:
+                    del self._ranked_by[target]
+        self._tops[source] = entries
+        for _, _, target in entries:
+            self._ranked_by.setdefault(target, set()).add(source)
+
+    # --- reads -----------------------------------------------------------
+
+    def suggestions_for(self, provider: str, external_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            s = self._index.get((provider, external_id))
+            if s is None or provider != self.source_provider:
+                return None
+            return self._render(s)
+
+    def suggestions(self) -> List[Dict[str, Any]]:
+        """Same shape as ``suggest_mappings``."""
+        with self._lock:
+            return [self._render(f) for f in self._index.features() if f.provider == self.source_provider]
+
+    def _render(self, s: TwinFeatures) -> Dict[str, Any]:
+        out = []
+        for neg_score, _, target in self._tops.get(s.key, ()):
+            t = self._index.get(target)
+            if t is not None:
+                out.append(t.suggestion(-neg_score))
+        return {"source": s.profile(), "suggestions": out}
+
+    # --- wiring ----------------------------------------------------------
+
+    def listen(self) -> None:
+        """Follow DeviceTwin inserts/updates/deletes made through SQLAlchemy in this process.
+
+        Row events fire during flush, before the transaction is decided, so
+        changes are recorded on the session and only applied once it commits;
+        a rollback discards them.
+        """
+        from sqlalchemy import event
+        from sqlalchemy.orm import Session
+
+        event.listen(DeviceTwin, "after_insert", self._on_row_changed)
+        event.listen(DeviceTwin, "after_update", self._on_row_changed)
+        event.listen(DeviceTwin, "after_delete", self._on_row_deleted)
+        event.listen(Session, "after_commit", self._on_commit)
+        event.listen(Session, "after_rollback", self._on_rollback)
+
+    def unlisten(self) -> None:
+        """Undo ``listen``."""
+        from sqlalchemy import event
+        from sqlalchemy.orm import Session
+
+        event.remove(DeviceTwin, "after_insert", self._on_row_changed)
+        event.remove(DeviceTwin, "after_update", self._on_row_changed)
+        event.remove(DeviceTwin, "after_delete", self._on_row_deleted)
+        event.remove(Session, "after_commit", self._on_commit)
+        event.remove(Session, "after_rollback", self._on_rollback)
+
+    def _record(self, target, change: Tuple[str, Any]) -> None:
+        from sqlalchemy.orm import object_session
+
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault(self._pending_key, []).append(change)
+
+    def _on_row_changed(self, mapper, connection, target) -> None:  # noqa: ARG002
+        # snapshot now: committed instances are expired and can't be read in after_commit
+        try:
+            self._record(target, ("changed", TwinFeatures.from_twin(target)))
+        except Exception:
+            pass
+
+    def _on_row_deleted(self, mapper, connection, target) -> None:  # noqa: ARG002
+        try:
+            self._record(target, ("removed", (target.provider, target.external_id)))
+        except Exception:
+            pass
+
+    def _on_commit(self, session) -> None:
+        for kind, value in session.info.pop(self._pending_key, ()):
+            try:
+                if kind == "changed":
+                    self._apply_changed(value)
+                else:
+                    self.on_twin_removed(*value)
+            except Exception:
+                pass
+
+    def _on_rollback(self, session) -> None:
+        session.info.pop(self._pending_key, None)
+
+
+def _same_signal(a: TwinFeatures, b: TwinFeatures) -> bool:
+    return (
+        a.name == b.name
+        and a.name_tokens == b.name_tokens
+        and a.capabilities == b.capabilities
+        and a.key_set == b.key_set
+        and a.state_keys == b.state_keys
+    )
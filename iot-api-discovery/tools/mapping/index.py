@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import heapq
+import json
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+try:
+    import numpy as np  # type: ignore
+    from scipy import sparse  # type: ignore
+except Exception:
+    np = None  # type: ignore
+    sparse = None  # type: ignore
+
+
+TwinKey = Tuple[str, str]  # (provider, external_id)
+
+# Score weights, shared with tools.mapping.dynamic
+NAME_WEIGHT = 0.6
+CAPS_WEIGHT = 0.3
+KEYS_WEIGHT = 0.1
+
+FAMILIES = ("name", "caps", "keys")
+
+_WS_RE = re.compile(r"\s+")
+_STRIP_RE = re.compile(r"[^a-z0-9 _-]")
+
+
+def normalize_name(name: str | None) -> str:
+    if not name:
+        return ""
+    s = name.casefold().strip()
+    s = _WS_RE.sub(" ", s)
+    s = _STRIP_RE.sub("", s)
+    return s
+
+
+def parse_capabilities(raw: Any) -> List[str]:
+    try:
+        return list(json.loads(raw or "[]"))
+    except Exception:
+        return []
+
+
+def parse_state_keys(raw: Any) -> List[str]:
+    try:
+        st = json.loads(raw or "{}")
+        if isinstance(st, dict):
+            return list(st.keys()) + list((st.get("attributes") or {}).keys())
+    except Exception:
+        pass
+    return []
+
+
+@dataclass(frozen=True)
+class TwinFeatures:
+    """Everything mapping needs from a DeviceTwin, parsed exactly once."""
+
+    provider: str
+    external_id: str
+    name: Optional[str]
+    capabilities: List[str]
+    state_keys: List[str]
+    name_tokens: FrozenSet[str]
+    cap_set: FrozenSet[str]
+    key_set: FrozenSet[str]
+
+    @property
+    def key(self) -> TwinKey:
+        return (self.provider, self.external_id)
+
+    @classmethod
+    def from_twin(cls, twin: Any) -> "TwinFeatures":
+        caps = parse_capabilities(twin.capabilities)
+        keys = parse_state_keys(twin.state)
+        norm = normalize_name(twin.name) or normalize_name(twin.external_id)
+        return cls(
+            provider=twin.provider,
+            external_id=twin.external_id,
+            name=twin.name,
+            capabilities=caps,
+            state_keys=keys,
+            name_tokens=frozenset(norm.split()),
+            cap_set=frozenset(caps),
+            key_set=frozenset(keys),
+        )
+
+    def tokens(self, family: str) -> FrozenSet[str]:
+        if family == "name":
+            return self.name_tokens
+        if family == "caps":
+            return self.cap_set
+        return self.key_set
+
+    def profile(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "external_id": self.external_id,
+            "name": self.name,
+            "capabilities": list(self.capabilities),
+            "state_keys": list(self.state_keys),
+        }
+
+    def suggestion(self, score: float) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "external_id": self.external_id,
+            "name": self.name,
+            "capabilities": list(self.capabilities),
+            "score": round(float(score), 3),
+        }
+
+
+def _jaccard(inter: int, a: int, b: int) -> float:
+    if not a and not b:
+        return 0.0
+    return inter / ((a + b - inter) or 1)
+
+
+def pair_score(s: TwinFeatures, t: TwinFeatures, name_inter: int, cap_inter: int, key_inter: int) -> float:
+    # Token Jaccard over normalized names equals the old "1.0 if a == b" rule
+    # for identical names, and 0 when either side is empty.
+    name_sim = _jaccard(name_inter, len(s.name_tokens), len(t.name_tokens)) if s.name_tokens and t.name_tokens else 0.0
+    score = (
+        NAME_WEIGHT * name_sim
+        + CAPS_WEIGHT * _jaccard(cap_inter, len(s.cap_set), len(t.cap_set))
+        + KEYS_WEIGHT * _jaccard(key_inter, len(s.key_set), len(t.key_set))
+    )
+    # penalize wildly different capability sizes
+    if s.capabilities and t.capabilities and abs(len(s.capabilities) - len(t.capabilities)) >= 3:
+        score *= 0.9
+    return score
+
+
+class MappingFeatureIndex:
+    """Inverted indexes (name token, capability, state key) over target twins.
+
+    A source can only score above zero against targets that share at least
+    one name token, capability or state key with it, so candidates are
+    gathered from the postings lists instead of scanning every target, and the
+    per-family intersection sizes fall out of the same pass.
+    """
+
+    def __init__(self) -> None:
+        self._features: Dict[TwinKey, TwinFeatures] = {}
+        self._seq: Dict[TwinKey, int] = {}
+        self._next_seq = 0
+        self._postings: Dict[str, Dict[str, set]] = {f: {} for f in FAMILIES}
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._features
+
+    def get(self, key: TwinKey) -> Optional[TwinFeatures]:
+        return self._features.get(key)
+
+    def seq(self, key: TwinKey) -> int:
+        """Insertion position of ``key``; breaks score ties."""
+        return self._seq[key]
+
+    def features(self) -> List[TwinFeatures]:
+        """All indexed twins in insertion order."""
+        return sorted(self._features.values(), key=lambda f: self._seq[f.key])
+
+    def add(self, feat: TwinFeatures) -> None:
+        key = feat.key
+        if key in self._features:
+            self._unpost(self._features[key])
+        else:
+            self._seq[key] = self._next_seq
+            self._next_seq += 1
+        self._features[key] = feat
+        for family in FAMILIES:
+            postings = self._postings[family]
+            for tok in feat.tokens(family):
+                postings.setdefault(tok, set()).add(key)
+
+    def remove(self, key: TwinKey) -> Optional[TwinFeatures]:
+        feat = self._features.pop(key, None)
+        if feat is not None:
+            self._unpost(feat)
+            self._seq.pop(key, None)
+        return feat
+
+    def _unpost(self, feat: TwinFeatures) -> None:
+        for family in FAMILIES:
+            postings = self._postings[family]
+            for tok in feat.tokens(family):
+                bucket = postings.get(tok)
+                if bucket is not None:
+                    bucket.discard(feat.key)
+                    if not bucket:
+                        del postings[tok]
+
+    def overlaps(self, feat: TwinFeatures) -> Tuple[Counter, Counter, Counter]:
+        """Per-family intersection sizes with every target sharing a token with ``feat``."""
+        out = []
+        for family in FAMILIES:
+            postings = self._postings[family]
+            counts: Counter = Counter()
+            for tok in feat.tokens(family):
+                bucket = postings.get(tok)
+                if bucket:
+                    counts.update(bucket)
+            out.append(counts)
+        return out[0], out[1], out[2]
+
+    def top_k(self, feat: TwinFeatures, k: int, exclude_provider: Optional[str] = None) -> List[Tuple[float, TwinFeatures]]:
+        names, caps, keys = self.overlaps(feat)
+        features, seq = self._features, self._seq
+        scored: List[Tuple[float, int, TwinFeatures]] = []
+        for key in names.keys() | caps.keys() | keys.keys():
+            if exclude_provider is not None and key[0] == exclude_provider:
+                continue
+            t = features[key]
+            score = pair_score(feat, t, names[key], caps[key], keys[key])
+            if score > 0:
+                scored.append((score, seq[key], t))
+        # ties resolve in target insertion order, like the stable sort did
+        best = heapq.nlargest(k, scored, key=lambda x: (x[0], -x[1]))
+        return [(score, t) for score, _, t in best]
+
+
+def _sparse_matrix(feats: List[TwinFeatures], family: str, vocab: Dict[str, int]):
+    rows: List[int] = []
+    cols: List[int] = []
+    for r, f in enumerate(feats):
+        for tok in f.tokens(family):
+            c = vocab.get(tok)
+            if c is not None:
+                rows.append(r)
+                cols.append(c)
+    data = np.ones(len(rows), dtype=np.float32)
+    return sparse.csr_matrix((data, (rows, cols)), shape=(len(feats), len(vocab)))
+
+
+def rank_sparse(
+    sources: List[TwinFeatures], targets: List[TwinFeatures], k: int, max_cells: int = 4_000_000
+) -> List[List[Tuple[float, TwinFeatures]]]:
+    """Vectorized top-k over all pairs.
+
+    Token sets are encoded as sparse one-hot matrices, so every pairwise
+    intersection size is a sparse matrix product; Jaccard, weighting, the
+    capability-size penalty and top-k selection then run on dense blocks of
+    at most ``max_cells`` source x target scores. Same scores and tie order
+    as ``MappingFeatureIndex.top_k``.
+    """
+    if np is None or sparse is None:
+        raise RuntimeError("numpy and scipy are required for rank_sparse")
+    if not targets:
+        return [[] for _ in sources]
+    t_mats = {}
+    t_sizes = {}
+    for family in FAMILIES:
+        vocab: Dict[str, int] = {}
+        for t in targets:
+            for tok in t.tokens(family):
+                vocab.setdefault(tok, len(vocab))
+        t_mats[family] = (vocab, _sparse_matrix(targets, family, vocab).T.tocsc())
+        t_sizes[family] = np.array([len(t.tokens(family)) for t in targets], dtype=np.float64)
+    t_caplen = np.array([len(t.capabilities) for t in targets], dtype=np.float64)
+    weights = {"name": NAME_WEIGHT, "caps": CAPS_WEIGHT, "keys": KEYS_WEIGHT}
+    chunk = max(1, max_cells // len(targets))
+
+    out: List[List[Tuple[float, TwinFeatures]]] = []
+    for start in range(0, len(sources), chunk):
+        block = sources[start : start + chunk]
+        score = np.zeros((len(block), len(targets)), dtype=np.float64)
+        for family in FAMILIES:
+            vocab, t_mat = t_mats[family]
+            inter = (_sparse_matrix(block, family, vocab) @ t_mat).toarray().astype(np.float64)
+            a = np.array([len(s.tokens(family)) for s in block], dtype=np.float64)[:, None]
+            union = a + t_sizes[family][None, :] - inter
+            # empty on both sides -> 0, matching _jaccard
+            score += weights[family] * np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+        s_caplen = np.array([len(s.capabilities) for s in block], dtype=np.float64)[:, None]
+        penal = (s_caplen > 0) & (t_caplen[None, :] > 0) & (np.abs(s_caplen - t_caplen[None, :]) >= 3)
+        score[penal] *= 0.9
+        kk = min(k, len(targets))
+        rows = np.arange(len(block))[:, None]
+        top = np.argpartition(-score, kk - 1, axis=1)[:, :kk]
+        top_scores = score[rows, top]
+        kth = top_scores.min(axis=1)
+        # rows with no extra ties at the k-th score only need their k picks sorted
+        ties = (score >= kth[:, None]).sum(axis=1) > kk
+        order = np.lexsort((top, -top_scores), axis=1)
+        top, top_scores = np.take_along_axis(top, order, 1), np.take_along_axis(top_scores, order, 1)
+        for r in range(len(block)):
+            if ties[r]:
+                row = score[r]
+                # widen to every target tied with the k-th best so ordering is exact
+                cols = np.nonzero((row >= kth[r]) & (row > 0))[0]
+                picked = cols[np.lexsort((cols, -row[cols]))[:k]]
+                out.append([(float(row[c]), targets[int(c)]) for c in picked])
+            else:
+                out.append([(float(v), targets[int(c)]) for c, v in zip(top[r], top_scores[r]) if v > 0])
+    return out
@@ -0,0 +1,69 @@
+import http from 'k6/http';
+import { check } from 'k6';
+
+// Proxy-path latency at a fixed arrival rate. Run once against a gateway built
+// from before the pooled upstream client and once after, then compare p(99):
+//
+//   k6 run -e GATEWAY_BASE=http://localhost:8000 k6/proxy_pool.js
+//
+// With per-request clients every call pays a TCP (+TLS under mTLS) handshake
+// to the upstream; with the pool most calls reuse a connection, which also
+// shows up in GET /admin/upstreams (reuse_ratio) and in
+// gateway_upstream_connections_opened_total vs gateway_upstream_requests_total.
+// Raise RL_RPS on the gateway so rate limiting does not dominate the result.
+
+const GATEWAY = __ENV.GATEWAY_BASE || 'http://localhost:8000';
+const API_KEY = __ENV.API_TOKEN || '';
+const RATE = parseInt(__ENV.RATE || '200');
+const DURATION = __ENV.DURATION || '3m';
+const P99_MS = __ENV.P99_MS || '150';
+
+export let options = {
+  scenarios: {
+    proxy_get: {
+      executor: 'constant-arrival-rate',
+      rate: RATE,
+      timeUnit: '1s',
+      duration: DURATION,
+      preAllocatedVUs: 50,
+      maxVUs: 400,
+      exec: 'proxyGet',
+    },
+    proxy_post: {
+      executor: 'constant-arrival-rate',
+      rate: Math.max(1, Math.floor(RATE / 10)),
+      timeUnit: '1s',
+      duration: DURATION,
+      preAllocatedVUs: 10,
+      maxVUs: 100,
+      exec: 'proxyPost',
+    },
+  },
+  thresholds: {
+    'http_req_duration{scenario:proxy_get}': [`p(99)<${P99_MS}`],
+    'http_req_duration{scenario:proxy_post}': [`p(99)<${P99_MS}`],
+    http_req_failed: ['rate<0.01'],
+  },
+  summaryTrendStats: ['avg', 'med', 'p(90)', 'p(95)', 'p(99)', 'max'],
+};
+
+const headers = { 'x-api-key': API_KEY, 'content-type': 'application/json' };
+
+export function proxyGet() {
+  const r = http.get(`${GATEWAY}/proxy/integrations/capability/smartthings/abc/status`, { headers });
+  check(r, { 'proxy get ok': (res) => res.status < 500 });
+}
+
+export function proxyPost() {
+  const r = http.post(`${GATEWAY}/proxy/automation/rules/evaluate`, '{}', {
+    headers: { ...headers, 'Idempotency-Key': `k6-pool-${__VU}-${__ITER}` },
+  });
+  check(r, { 'proxy post ok': (res) => res.status < 500 });
+}
+
+export function teardown() {
+  const r = http.get(`${GATEWAY}/admin/upstreams`, { headers });
+  if (r.status === 200) {
+    console.log(`upstream reuse: ${r.body}`);
+  }
+}
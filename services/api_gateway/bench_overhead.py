@@ -0,0 +1,110 @@
+"""Gateway overhead per proxied request, with the upstream served in-process.
+
+Drives the app through ASGI with an httpx MockTransport standing in for the
+integrations upstream, so the numbers are the gateway's own cost (middleware,
+body validation, JSON decode/encode). Also times per-call
+``jsonschema.validate`` against the precompiled validators it replaced.
+Usage: python -m services.api_gateway.bench_overhead --requests 2000 [--no-orjson]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import httpx
+import jsonschema
+
+REQUEST_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "command": {"type": "string", "enum": ["on", "off", "toggle", "level"]},
+        "level": {"type": "integer", "minimum": 0, "maximum": 100},
+        "transition_ms": {"type": "integer", "minimum": 0},
+        "tags": {"type": "array", "items": {"type": "string"}, "maxItems": 16},
+    },
+    "required": ["command"],
+    "additionalProperties": False,
+}
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {"ok": {"type": "boolean"}, "devices": {"type": "array"}},
+    "required": ["ok"],
+}
+BODY = {"command": "level", "level": 40, "transition_ms": 250, "tags": ["bench", "living"]}
+UPSTREAM = {
+    "ok": True,
+    "devices": [{"id": f"d{i}", "state": {"on": i % 2 == 0, "level": i, "name": f"Lamp {i}"}} for i in range(50)],
+}
+
+
+def build_app(no_orjson: bool):
+    schema_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+    json.dump([{"path_prefix": "/proxy/integrations/", "request_schema": REQUEST_SCHEMA, "response_schema": RESPONSE_SCHEMA}], schema_file)
+    schema_file.close()
+    os.environ.update({
+        "GATEWAY_SCHEMA_FILE": schema_file.name,
+        "INTEGRATIONS_BASE_URL": "http://upstream",
+        "RL_RPS": "1000000",
+        "OTEL_SDK_DISABLED": "true",
+    })
+    from services.api_gateway import server
+
+    server.trace = None
+    if no_orjson:
+        server.orjson = None
+    app = server.create_app()
+    payload = json.dumps(UPSTREAM).encode()
+    app.state.upstream_clients["integrations"] = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, content=payload, headers={"content-type": "application/json"}))
+    )
+    return app
+
+
+async def drive(app, n: int) -> None:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway") as client:
+        for method in ("GET", "POST"):
+            kwargs = {"json": BODY} if method == "POST" else {}
+            for _ in range(50):
+                await client.request(method, "/proxy/integrations/devices/abc", **kwargs)
+            start = time.perf_counter()
+            for _ in range(n):
+                resp = await client.request(method, "/proxy/integrations/devices/abc", **kwargs)
+            elapsed = time.perf_counter() - start
+            assert resp.status_code == 200, resp.text
+            print(f"{method:4s} proxy: {elapsed / n * 1e6:8.1f} us/request")
+
+
+def validators(n: int) -> None:
+    start = time.perf_counter()
+    for _ in range(n):
+        jsonschema.validate(instance=BODY, schema=REQUEST_SCHEMA)
+        jsonschema.validate(instance=UPSTREAM, schema=RESPONSE_SCHEMA)
+    per_call = (time.perf_counter() - start) / n
+    req = jsonschema.validators.validator_for(REQUEST_SCHEMA)(REQUEST_SCHEMA)
+    resp = jsonschema.validators.validator_for(RESPONSE_SCHEMA)(RESPONSE_SCHEMA)
+    start = time.perf_counter()
+    for _ in range(n):
+        req.validate(BODY)
+        resp.validate(UPSTREAM)
+    compiled = (time.perf_counter() - start) / n
+    print(f"jsonschema.validate per call: {per_call * 1e6:8.1f} us/request")
+    print(f"precompiled validators:       {compiled * 1e6:8.1f} us/request")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--no-orjson", action="store_true")
+    args = parser.parse_args()
+    app = build_app(args.no_orjson)
+    validators(args.requests)
+    asyncio.run(drive(app, args.requests))
+
+
+if __name__ == "__main__":
+    main()
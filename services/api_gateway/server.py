@@ -1,17 +1,20 @@
 from __future__ import annotations
 
 import asyncio
+import math
 import os
+import random
 import time
 import json
 import secrets
 from typing import Any, Dict, Optional, Tuple
 
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import httpx
 import jwt
-from jsonschema import validate as jsonschema_validate, ValidationError
+from jsonschema import ValidationError
+from jsonschema.validators import validator_for
 
 # Optional OpenTelemetry
 try:
@@ -32,12 +35,26 @@ except Exception:
     Histogram = None  # type: ignore
     Counter = None  # type: ignore
 
+try:
+    import orjson  # type: ignore
+except Exception:
+    orjson = None  # type: ignore
+
+try:
+    import h2  # type: ignore  # noqa: F401  (enables httpx HTTP/2)
+except Exception:
+    h2 = None  # type: ignore
+
 from fastapi.middleware.cors import CORSMiddleware
 import hmac
 
 _req_hist = None
 _cache_hits = None
 _cache_misses = None
+_cache_coalesced = None
+_cache_early_refreshes = None
+_upstream_requests = None
+_upstream_connections = None
 if Histogram is not None:
     _req_hist = Histogram(
         "gateway_request_duration_seconds",
@@ -48,6 +65,10 @@ if Histogram is not None:
 if Counter is not None:
     _cache_hits = Counter("gateway_cache_hits_total", "Gateway cache hits", ["path"])  # type: ignore
     _cache_misses = Counter("gateway_cache_misses_total", "Gateway cache misses", ["path"])  # type: ignore
+    _cache_coalesced = Counter("gateway_cache_coalesced_total", "Cache misses served by another request's in-flight upstream fetch", ["path"])  # type: ignore
+    _cache_early_refreshes = Counter("gateway_cache_early_refreshes_total", "Cache entries refreshed in the background before expiry", ["path"])  # type: ignore
+    _upstream_requests = Counter("gateway_upstream_requests_total", "Requests sent to upstreams", ["upstream"])  # type: ignore
+    _upstream_connections = Counter("gateway_upstream_connections_opened_total", "New upstream connections (requests minus these reused a pooled connection)", ["upstream"])  # type: ignore
 
 
 def _current_trace_id() -> Optional[str]:
@@ -80,6 +101,91 @@ def _init_tracing(service_name: str) -> None:
         pass
 
 
+class SchemaRegistry:
+    """
+    Request/response validators compiled once per schema file load.
+
+    Entries are ``{"path_prefix", "request_schema", "response_schema"}``; the
+    first matching prefix wins. Path lookups are memoised, so steady-state
+    resolution is a dict hit.
+    """
+
+    MAX_MEMO = 4096
+
+    def __init__(self, entries: Any = None):
+        self.entries: list[Tuple[str, Any, Any]] = []
+        self._memo: Dict[str, Tuple[Any, Any]] = {}
+        for entry in entries if isinstance(entries, list) else []:
+            prefix = entry.get("path_prefix", "") if isinstance(entry, dict) else ""
+            if not prefix:
+                continue
+            self.entries.append((prefix, self._compile(entry.get("request_schema")), self._compile(entry.get("response_schema"))))
+
+    @staticmethod
+    def _compile(schema: Any) -> Any:
+        if not schema:
+            return None
+        try:
+            cls = validator_for(schema)
+            cls.check_schema(schema)
+            return cls(schema)
+        except Exception:
+            # An invalid schema validates nothing rather than failing every request
+            return None
+
+    def resolve(self, path: str) -> Tuple[Any, Any]:
+        """(request validator, response validator) for a path; None when unvalidated."""
+        hit = self._memo.get(path)
+        if hit is not None:
+            return hit
+        found: Tuple[Any, Any] = (None, None)
+        for prefix, req_validator, resp_validator in self.entries:
+            if path.startswith(prefix):
+                found = (req_validator, resp_validator)
+                break
+        if len(self._memo) >= self.MAX_MEMO:
+            self._memo.clear()
+        self._memo[path] = found
+        return found
+
+
+def json_loads(data: bytes | str) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def json_response(status_code: int, content: Any) -> Response:
+    """JSON response, encoded with orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return Response(content=orjson.dumps(content), status_code=status_code, media_type="application/json")
+        except Exception:
+            pass
+    return JSONResponse(status_code=status_code, content=content)
+
+
+# RFC 7230 section 6.1: connection-specific headers are never forwarded by a proxy
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-connection", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+})
+
+
+def forward_headers(headers: Any) -> Dict[str, str]:
+    """Request headers to send upstream: no hop-by-hop headers, host or content-length.
+
+    Headers named in Connection are dropped as well. TE is only kept as
+    "trailers", the one value that may cross a proxy (and HTTP/2).
+    """
+    dropped = set(HOP_BY_HOP_HEADERS) | {"host", "content-length"}
+    for value in headers.get("connection", "").split(","):
+        if value.strip():
+            dropped.add(value.strip().lower())
+    out = {k: v for k, v in headers.items() if k.lower() not in dropped}
+    if any(part.split(";")[0].strip().lower() == "trailers" for part in headers.get("te", "").split(",")):
+        out["te"] = "trailers"
+    return out
+
+
 def parse_allowlist(env_val: str | None) -> set[str]:
     items = [s.strip().lower() for s in (env_val or "").split(",") if s.strip()]
     return set(items)
@@ -137,7 +243,17 @@ def create_app() -> FastAPI:
     # Caching
     CACHE_PREFIXES = [p.strip() for p in (os.getenv("CACHE_GET_PREFIXES") or "").split(",") if p.strip()]
     CACHE_TTL = int(os.getenv("CACHE_TTL_SECONDS", "60"))
+    # Probabilistic early refresh (XFetch); 0 disables, larger values refresh earlier
+    CACHE_EARLY_REFRESH_BETA = float(os.getenv("CACHE_EARLY_REFRESH_BETA", "0"))
     CACHE_INVALIDATE_PREFIXES = [p.strip() for p in (os.getenv("CACHE_INVALIDATE_PREFIXES") or "").split(",") if p.strip()]
+    # Upstream connection pool (one client per upstream, shared for the app lifetime)
+    UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true").lower() == "true" and h2 is not None
+    UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+    UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+    UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+    UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "20"))
+    UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+    UPSTREAM_POOL_TIMEOUT = float(os.getenv("UPSTREAM_POOL_TIMEOUT", "5"))
     # Idempotency
     IDEMP_TTL = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "3600"))
     # Schema registry
@@ -178,13 +294,13 @@ def create_app() -> FastAPI:
                 _req_hist.labels(*labels).observe(dur)
             return resp
 
-    # Redis / Sentinel
+    # Redis / Sentinel (asyncio client; never block the event loop on a round trip)
     try:
-        import redis  # type: ignore
+        import redis.asyncio as redis  # type: ignore
         sentinel_cfg = os.getenv("REDIS_SENTINEL")
         sentinel_master = os.getenv("REDIS_SENTINEL_MASTER")
         if sentinel_cfg and sentinel_master:
-            from redis.sentinel import Sentinel  # type: ignore
+            from redis.asyncio.sentinel import Sentinel  # type: ignore
             hosts = []
             for item in sentinel_cfg.split(","):
                 host, _, port = item.partition(":")
@@ -197,16 +313,24 @@ def create_app() -> FastAPI:
         app.state.redis = None
 
     app.state.jwks = {"fetched": 0, "keys": {}}
-    app.state.schemas = []
+    app.state.cb = {}
+    app.state.rate_store = {}
+    app.state.quota_store = {}
+    app.state.schemas = SchemaRegistry()
     app.state.rbac = {"policies": []}
 
     # Load schema registry (optional). Format: [{"path_prefix": "/capability/smartthings", "request_schema": {...}, "response_schema": {...}}]
-    if SCHEMA_FILE and os.path.exists(SCHEMA_FILE):
-        try:
-            with open(SCHEMA_FILE, "r") as f:
-                app.state.schemas = json.load(f)
-        except Exception:
-            app.state.schemas = []
+    def _load_schemas() -> None:
+        entries: Any = []
+        if SCHEMA_FILE and os.path.exists(SCHEMA_FILE):
+            try:
+                with open(SCHEMA_FILE, "r") as f:
+                    entries = json.load(f)
+            except Exception:
+                entries = []
+        app.state.schemas = SchemaRegistry(entries)
+
+    _load_schemas()
 
     # Load RBAC policies
     def _load_rbac() -> None:
@@ -229,13 +353,6 @@ def create_app() -> FastAPI:
 
     _load_rbac()
 
-    def _match_schema(path: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
-        for entry in app.state.schemas or []:
-            prefix = entry.get("path_prefix", "")
-            if prefix and path.startswith(prefix):
-                return entry.get("request_schema"), entry.get("response_schema")
-        return None, None
-
     # Versioned OpenAPI
     @app.get("/openapi/v1.json")
     async def openapi_v1() -> Any:
@@ -283,6 +400,14 @@ def create_app() -> FastAPI:
         await _fetch_jwks()
         return {"ok": True, "keys": list(app.state.jwks.get("keys", {}).keys())}
 
+    @app.post("/admin/schemas/reload")
+    async def admin_schemas_reload(request: Request) -> Dict[str, Any]:
+        token = request.headers.get("X-API-Key", "")
+        if not _api_key_valid(token):
+            raise HTTPException(status_code=401, detail="invalid api key")
+        _load_schemas()
+        return {"ok": True, "schemas": [prefix for prefix, _, _ in app.state.schemas.entries]}
+
     def _key_for_kid(kid: str) -> Any | None:
         k = app.state.jwks.get("keys", {}).get(kid)
         if not k:
@@ -333,24 +458,31 @@ def create_app() -> FastAPI:
     def _idempotency_key(path: str, key: str) -> str:
         return f"idem:{path}:{key}"
 
-    async def _get_idempotent_response(path: str, key: str) -> JSONResponse | None:
+    def _stored_response(data: Dict[str, Any]) -> Response:
+        # Stored bodies are the already-encoded JSON of the original response
+        body = data.get("body", "{}")
+        return Response(status_code=data.get("status", 200), content=body if isinstance(body, str) else json.dumps(body), media_type="application/json")
+
+    def _response_payload(response: Any) -> Dict[str, Any]:
+        body = getattr(response, "body", b"")
+        return {"status": response.status_code, "body": body.decode() if isinstance(body, bytes) else body}
+
+    async def _get_idempotent_response(path: str, key: str) -> Response | None:
         if not app.state.redis or not key:
             return None
         try:
-            val = app.state.redis.get(_idempotency_key(path, key))
+            val = await app.state.redis.get(_idempotency_key(path, key))
             if val:
-                data = json.loads(val)
-                return JSONResponse(status_code=data.get("status", 200), content=data.get("body", {}))
+                return _stored_response(json_loads(val))
         except Exception:
             return None
         return None
 
-    def _store_idempotent_response(path: str, key: str, response: JSONResponse) -> None:
+    async def _store_idempotent_response(path: str, key: str, response: JSONResponse) -> None:
         if not app.state.redis or not key:
             return
         try:
-            payload = {"status": response.status_code, "body": getattr(response, "body", b"").decode() if hasattr(response, "body") else response.body}
-            app.state.redis.setex(_idempotency_key(path, key), IDEMP_TTL, json.dumps(payload))
+            await app.state.redis.setex(_idempotency_key(path, key), IDEMP_TTL, json.dumps(_response_payload(response)))
         except Exception:
             pass
 
@@ -363,16 +495,17 @@ def create_app() -> FastAPI:
         day = now // 86400
         return (f"quota:hour:{org}:{hour}", f"quota:day:{org}:{day}")
 
-    def _quota_inc(org: str) -> Optional[int]:
+    async def _quota_inc(org: str) -> Optional[int]:
         try:
             if app.state.redis:
                 hk, dk = _quota_keys(org)
-                hv = app.state.redis.incr(hk)
-                dv = app.state.redis.incr(dk)
-                if hv == 1:
-                    app.state.redis.expire(hk, 3600)
-                if dv == 1:
-                    app.state.redis.expire(dk, 86400)
+                # One round trip; keys are per hour/day bucket, so refreshing the TTL is harmless
+                pipe = app.state.redis.pipeline(transaction=False)
+                pipe.incr(hk)
+                pipe.incr(dk)
+                pipe.expire(hk, 3600)
+                pipe.expire(dk, 86400)
+                hv, dv, _, _ = await pipe.execute()
                 return max(hv, dv)
             # in-memory fallback
             hk, dk = _quota_keys(org)
@@ -385,13 +518,12 @@ def create_app() -> FastAPI:
         except Exception:
             return None
 
-    def _quota_check(org: str) -> None:
+    async def _quota_check(org: str) -> None:
         hv, dv = 0, 0
         try:
             if app.state.redis:
                 hk, dk = _quota_keys(org)
-                hv = int(app.state.redis.get(hk) or 0)
-                dv = int(app.state.redis.get(dk) or 0)
+                hv, dv = (int(v or 0) for v in await app.state.redis.mget(hk, dk))
             else:
                 hk, dk = _quota_keys(org)
                 hv = int(app.state.quota_store.get(hk, 0))
@@ -453,40 +585,107 @@ def create_app() -> FastAPI:
                 return True
         return False
 
-    def _invalidate_cache(prefixes: list[str], org: str | None = None) -> None:
+    # Invalidation bumps generation counters instead of deleting keys: every
+    # cached entry records the generations of its cache prefixes (per org and
+    # across all orgs) and is a miss once any of them has moved on.
+    def _generation_keys(path: str, org: str) -> list[str]:
+        keys = []
+        for p in CACHE_PREFIXES:
+            if path.startswith(p):
+                keys.append(f"cachegen:{org}:{p}")
+                keys.append(f"cachegen:*:{p}")
+        return keys
+
+    async def _invalidate_cache(prefixes: list[str], org: str | None = None) -> None:
         if not app.state.redis:
             return
+        # A cache prefix is affected when it overlaps an invalidated prefix either way
+        affected = [p for p in CACHE_PREFIXES if any(p.startswith(q) or q.startswith(p) for q in prefixes)]
+        if not affected:
+            return
         try:
-            pat = f"cache:{org or '*'}:*"
-            for key in app.state.redis.scan_iter(pat):  # type: ignore[attr-defined]
-                k = key.decode() if isinstance(key, bytes) else str(key)
-                for p in prefixes:
-                    path = k.split(":", 2)[-1]
-                    if path.startswith(p):
-                        app.state.redis.delete(key)
-                        break
+            pipe = app.state.redis.pipeline(transaction=False)
+            for p in affected:
+                pipe.incr(f"cachegen:{org or '*'}:{p}")
+            await pipe.execute()
         except Exception:
             pass
 
-    async def _maybe_cache_get(path: str, org: str, perform_request):
+    app.state.inflight = {}
+    app.state.refresh_tasks = set()
+
+    def _inflight_done(key: str, task: asyncio.Task) -> None:
+        if app.state.inflight.get(key) is task:
+            del app.state.inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here; waiters re-raise it
+
+    async def _single_flight(key: str, path: str, fetch):
+        # Concurrent misses for the same key share one upstream fetch. It runs in
+        # its own task, so a caller that disconnects cancels only its own wait.
+        task = app.state.inflight.get(key)
+        if task is not None:
+            if _cache_coalesced is not None:
+                _cache_coalesced.labels(path).inc()  # type: ignore
+            resp = await asyncio.shield(task)
+            out = Response(content=resp.body, status_code=resp.status_code)
+            out.raw_headers = list(resp.raw_headers)
+            return out
+        task = asyncio.create_task(fetch())
+        app.state.inflight[key] = task
+        task.add_done_callback(lambda done: _inflight_done(key, done))
+        return await asyncio.shield(task)
+
+    def _refresh_due(data: Dict[str, Any]) -> bool:
+        # XFetch: refresh with rising probability as expiry nears, earlier for slow fetches
+        if CACHE_EARLY_REFRESH_BETA <= 0 or "expires" not in data:
+            return False
+        delta = float(data.get("delta", 0.0))
+        return time.time() - delta * CACHE_EARLY_REFRESH_BETA * math.log(1.0 - random.random()) >= data["expires"]
+
+    async def _maybe_cache_get(path: str, org: str, perform_request, request: Request | None = None):
         if not app.state.redis or not _cacheable(path):
             return await perform_request()
         key = _cache_key(path, org)
+        gen_keys = _generation_keys(path, org)
+        generation = None
         try:
-            val = app.state.redis.get(key)
+            # Entry and current generations in one round trip
+            pipe = app.state.redis.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.mget(gen_keys)
+            val, gens = await pipe.execute()
+            generation = ".".join((g.decode() if isinstance(g, bytes) else str(g)) if g is not None else "0" for g in gens)
             if val:
-                if _cache_hits is not None:
-                    _cache_hits.labels(path).inc()  # type: ignore
-                data = json.loads(val)
-                return JSONResponse(status_code=data.get("status", 200), content=data.get("body", {}))
+                data = json_loads(val)
+                if data.get("gen") == generation:
+                    if _cache_hits is not None:
+                        _cache_hits.labels(path).inc()  # type: ignore
+                    if key not in app.state.inflight and _refresh_due(data):
+                        if request is not None:
+                            await request.body()  # read now; the refresh outlives this request
+                        if _cache_early_refreshes is not None:
+                            _cache_early_refreshes.labels(path).inc()  # type: ignore
+                        task = asyncio.create_task(_single_flight(key, path, lambda: _fetch_and_store(key, generation, perform_request)))
+                        app.state.refresh_tasks.add(task)
+                        task.add_done_callback(app.state.refresh_tasks.discard)
+                    return _stored_response(data)
         except Exception:
             pass
         if _cache_misses is not None:
             _cache_misses.labels(path).inc()  # type: ignore
+        if generation is None:
+            return await perform_request()
+        return await _single_flight(key, path, lambda: _fetch_and_store(key, generation, perform_request))
+
+    async def _fetch_and_store(key: str, generation: str, perform_request):
+        started = time.time()
         resp = await perform_request()
         try:
             if getattr(resp, "status_code", 200) < 300:
-                app.state.redis.setex(key, CACHE_TTL, json.dumps({"status": resp.status_code, "body": resp.body.decode() if hasattr(resp, 'body') else resp.body}))
+                now = time.time()
+                payload = {**_response_payload(resp), "gen": generation, "delta": now - started, "expires": now + CACHE_TTL}
+                await app.state.redis.setex(key, CACHE_TTL, json.dumps(payload))
         except Exception:
             pass
         return resp
@@ -499,7 +698,7 @@ def create_app() -> FastAPI:
                 return cached
         resp = await perform_request()
         if key and getattr(resp, "status_code", 200) < 500:
-            _store_idempotent_response(path, key, resp)
+            await _store_idempotent_response(path, key, resp)
         return resp
 
     def _with_trace_headers(headers: Dict[str, str]) -> Dict[str, str]:
@@ -509,10 +708,10 @@ def create_app() -> FastAPI:
         return out
 
     def _validate_response_schema(path: str, data: Any) -> None:
-        _, resp_schema = _match_schema(path)
-        if resp_schema:
+        _, resp_validator = app.state.schemas.resolve(path)
+        if resp_validator is not None:
             try:
-                jsonschema_validate(instance=data, schema=resp_schema)
+                resp_validator.validate(data)
             except ValidationError as ve:
                 if STRICT_RESPONSE_SCHEMA:
                     raise HTTPException(status_code=502, detail=f"response schema validation failed: {ve.message}")
@@ -539,9 +738,10 @@ def create_app() -> FastAPI:
         limit = RL_RPS
         try:
             if app.state.redis:
-                val = app.state.redis.incr(key)
-                if val == 1:
-                    app.state.redis.expire(key, 1)
+                pipe = app.state.redis.pipeline(transaction=False)
+                pipe.incr(key)
+                pipe.expire(key, 1)
+                val, _ = await pipe.execute()
                 if val > limit:
                     return _error("RATE_LIMIT_EXCEEDED", 429, "rate limit exceeded")
             else:
@@ -554,9 +754,9 @@ def create_app() -> FastAPI:
             pass
 
         if _is_mutating(request.method):
-            _quota_inc(org_id)
+            await _quota_inc(org_id)
             try:
-                _quota_check(org_id)
+                await _quota_check(org_id)
             except HTTPException as he:
                 return _error("QUOTA_EXCEEDED", he.status_code, he.detail or "quota exceeded")
 
@@ -582,7 +782,7 @@ def create_app() -> FastAPI:
         org = body.get("org")
         if not isinstance(prefixes, list) or not all(isinstance(p, str) for p in prefixes):
             raise HTTPException(status_code=400, detail="invalid prefixes")
-        _invalidate_cache(prefixes, org)
+        await _invalidate_cache(prefixes, org)
         return {"ok": True}
 
     # Proxy endpoints
@@ -595,22 +795,21 @@ def create_app() -> FastAPI:
             body = await request.body()
             if len(body) > BODY_MAX_BYTES:
                 raise HTTPException(status_code=413, detail="payload too large")
-            if STRICT_JSON and request.headers.get("content-type", "").startswith("application/json"):
+            req_validator, _ = app.state.schemas.resolve(request.url.path)
+            is_json = request.headers.get("content-type", "").startswith("application/json")
+            if is_json and (STRICT_JSON or req_validator is not None):
+                # Parse once for both the object check and schema validation
                 try:
-                    data = json.loads(body or b"{}")
-                    if not isinstance(data, dict):
-                        raise HTTPException(status_code=422, detail="json body must be an object")
-                except HTTPException:
-                    raise
+                    data = json_loads(body or b"{}")
                 except Exception:
                     raise HTTPException(status_code=400, detail="invalid json")
-            # Schema validation
-            req_schema, _ = _match_schema(request.url.path)
-            if req_schema and request.headers.get("content-type", "").startswith("application/json"):
-                try:
-                    jsonschema_validate(instance=json.loads(body or b"{}"), schema=req_schema)
-                except ValidationError as ve:
-                    raise HTTPException(status_code=422, detail=f"schema validation failed: {ve.message}")
+                if STRICT_JSON and not isinstance(data, dict):
+                    raise HTTPException(status_code=422, detail="json body must be an object")
+                if req_validator is not None:
+                    try:
+                        req_validator.validate(data)
+                    except ValidationError as ve:
+                        raise HTTPException(status_code=422, detail=f"schema validation failed: {ve.message}")
             return body
         return await request.body()
 
@@ -640,6 +839,68 @@ def create_app() -> FastAPI:
             args["cert"] = (MTLS_CERT, MTLS_KEY)
         return args
 
+    app.state.upstream_clients = {}
+    app.state.upstream_stats = {}
+
+    def _upstream_client(name: str) -> httpx.AsyncClient:
+        client = app.state.upstream_clients.get(name)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=UPSTREAM_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=UPSTREAM_MAX_CONNECTIONS,
+                    max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+                    keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(UPSTREAM_TIMEOUT, connect=UPSTREAM_CONNECT_TIMEOUT, pool=UPSTREAM_POOL_TIMEOUT),
+                **_mtls_args(),
+            )
+            app.state.upstream_clients[name] = client
+        return client
+
+    def _upstream_trace(name: str):
+        stats = app.state.upstream_stats.setdefault(name, {"requests": 0, "connections_opened": 0})
+        stats["requests"] += 1
+        if _upstream_requests is not None:
+            _upstream_requests.labels(name).inc()  # type: ignore
+
+        async def trace_event(event: str, info: Dict[str, Any]) -> None:
+            # Only fires when the pool has no idle connection to reuse
+            if event == "connection.connect_tcp.complete":
+                stats["connections_opened"] += 1
+                if _upstream_connections is not None:
+                    _upstream_connections.labels(name).inc()  # type: ignore
+
+        return trace_event
+
+    @app.on_event("shutdown")
+    async def _close_upstream_clients() -> None:
+        if app.state.refresh_tasks:
+            await asyncio.gather(*app.state.refresh_tasks, return_exceptions=True)
+        clients = list(app.state.upstream_clients.values())
+        app.state.upstream_clients = {}
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception:
+                pass
+        if app.state.redis is not None:
+            try:
+                await app.state.redis.aclose()
+            except Exception:
+                pass
+
+    @app.get("/admin/upstreams")
+    async def admin_upstreams(request: Request) -> Dict[str, Any]:
+        token = request.headers.get("X-API-Key", "")
+        if not _api_key_valid(token):
+            raise HTTPException(status_code=401, detail="invalid api key")
+        out = {}
+        for name, st in app.state.upstream_stats.items():
+            reused = max(st["requests"] - st["connections_opened"], 0)
+            out[name] = {**st, "reuse_ratio": round(reused / st["requests"], 4) if st["requests"] else 0.0}
+        return {"http2": UPSTREAM_HTTP2, "upstreams": out}
+
     def _with_error_wrap(fn):
         async def inner(*args, **kwargs):
             try:
@@ -658,32 +919,34 @@ def create_app() -> FastAPI:
                 return _error("UPSTREAM_ERROR", 502, "upstream error")
         return inner
 
-    def _cache_invalidate_after_mutation(path: str, org: str) -> None:
+    async def _cache_invalidate_after_mutation(path: str, org: str) -> None:
         if not CACHE_INVALIDATE_PREFIXES:
             return
-        _invalidate_cache(CACHE_INVALIDATE_PREFIXES, org)
+        await _invalidate_cache(CACHE_INVALIDATE_PREFIXES, org)
 
     @_with_error_wrap
     async def _proxy_do(target: str, request: Request, cb_target: str) -> JSONResponse:
-        async with httpx.AsyncClient(timeout=20, **_mtls_args()) as client:
-            body = await _validate_json_body(request)
-            headers = {k: v for k, v in request.headers.items() if k.lower() not in {"host", "content-length"}}
-            headers = _with_trace_headers(headers)
-            try:
-                resp = await client.request(request.method, target, content=body, headers=headers)
-                _record_cb(cb_target, resp.status_code < 500)
-            except Exception:
-                _record_cb(cb_target, False)
-                raise HTTPException(status_code=502, detail="upstream error")
-            try:
-                data = resp.json()
-            except Exception:
-                data = resp.text
-            _validate_response_schema(request.url.path, data if isinstance(data, dict) else {"data": data})
-            out = JSONResponse(status_code=resp.status_code, content=data if isinstance(data, dict) else {"data": data})
-            if _is_mutating(request.method):
-                _cache_invalidate_after_mutation(request.url.path, getattr(request.state, "org_id", "default"))
-            return out
+        client = _upstream_client(cb_target)
+        body = await _validate_json_body(request)
+        headers = _with_trace_headers(forward_headers(request.headers))
+        try:
+            resp = await client.request(
+                request.method, target, content=body, headers=headers,
+                extensions={"trace": _upstream_trace(cb_target)},
+            )
+            _record_cb(cb_target, resp.status_code < 500)
+        except Exception:
+            _record_cb(cb_target, False)
+            raise HTTPException(status_code=502, detail="upstream error")
+        try:
+            data = json_loads(resp.content)
+        except Exception:
+            data = resp.text
+        _validate_response_schema(request.url.path, data if isinstance(data, dict) else {"data": data})
+        out = json_response(resp.status_code, data if isinstance(data, dict) else {"data": data})
+        if _is_mutating(request.method):
+            await _cache_invalidate_after_mutation(request.url.path, getattr(request.state, "org_id", "default"))
+        return out
 
     @app.api_route("/proxy/integrations/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
     async def proxy_integrations(path: str, request: Request) -> Any:
@@ -700,7 +963,7 @@ def create_app() -> FastAPI:
             return await _proxy_do(target, request, "integrations")
 
         if request.method == "GET" and _cacheable(request.url.path):
-            return await _maybe_cache_get(request.url.path, org, _do)
+            return await _maybe_cache_get(request.url.path, org, _do, request)
         if request.method == "POST":
             return await _idempotent_post(request.url.path, request, _do)
         return await _do()
@@ -719,7 +982,7 @@ def create_app() -> FastAPI:
 
         if request.method == "GET" and _cacheable(request.url.path):
             org = getattr(request.state, "org_id", "default")
-            return await _maybe_cache_get(request.url.path, org, _do)
+            return await _maybe_cache_get(request.url.path, org, _do, request)
         if request.method == "POST":
             return await _idempotent_post(request.url.path, request, _do)
         return await _do()
@@ -0,0 +1,139 @@
+"""
+Tests for the gateway's GET cache: single-flight misses, generation-based
+invalidation and XFetch early refresh.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+import fakeredis
+import httpx
+
+from services.api_gateway import server
+
+PATH = "/proxy/integrations/devices"
+
+
+class _Upstream:
+    """Mock integrations upstream; each GET waits for ``release`` once set up."""
+
+    def __init__(self) -> None:
+        self.gets = 0
+        self.posts = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            self.gets += 1
+            self.started.set()
+            await self.release.wait()
+            return httpx.Response(200, json={"n": self.gets})
+        self.posts += 1
+        return httpx.Response(200, json={"ok": True})
+
+
+def _app(monkeypatch, upstream, **env):
+    monkeypatch.setenv("INTEGRATIONS_BASE_URL", "http://upstream")
+    monkeypatch.setenv("CACHE_GET_PREFIXES", "/proxy/integrations/")
+    monkeypatch.setenv("CACHE_INVALIDATE_PREFIXES", "/proxy/integrations/")
+    monkeypatch.setenv("RL_RPS", "1000000")
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setattr(server, "trace", None)
+    app = server.create_app()
+    app.state.redis = fakeredis.aioredis.FakeRedis()
+    app.state.upstream_clients["integrations"] = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+    return app
+
+
+def _client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway")
+
+
+def test_concurrent_misses_share_one_upstream_call(monkeypatch):
+    async def scenario():
+        upstream = _Upstream()
+        app = _app(monkeypatch, upstream)
+        async with _client(app) as client:
+            requests = [asyncio.create_task(client.get(PATH)) for _ in range(10)]
+            await upstream.started.wait()
+            await asyncio.sleep(0.05)  # let every request reach the in-flight fetch
+            upstream.release.set()
+            responses = await asyncio.gather(*requests)
+            cached = await client.get(PATH)
+        return upstream, responses, cached
+
+    upstream, responses, cached = asyncio.run(scenario())
+    assert upstream.gets == 1
+    assert all(r.status_code == 200 and r.json() == {"n": 1} for r in responses)
+    # Waiters get copies of the leader's response, headers included
+    assert len({(r.content, tuple(sorted(r.headers.items()))) for r in responses}) == 1
+    assert cached.json() == {"n": 1}
+
+
+def test_mutation_bumps_generation_and_forces_refetch(monkeypatch):
+    async def scenario():
+        upstream = _Upstream()
+        upstream.release.set()
+        app = _app(monkeypatch, upstream)
+        async with _client(app) as client:
+            first = await client.get(PATH)
+            hit = await client.get(PATH)
+            await client.post(PATH, json={"command": "on"})
+            generation = await app.state.redis.get("cachegen:default:/proxy/integrations/")
+            after = await client.get(PATH)
+        return upstream, first, hit, generation, after
+
+    upstream, first, hit, generation, after = asyncio.run(scenario())
+    assert first.json() == hit.json() == {"n": 1}
+    assert generation == b"1"
+    assert after.json() == {"n": 2}
+    assert upstream.gets == 2 and upstream.posts == 1
+
+
+def test_cancelled_caller_does_not_cancel_shared_fetch(monkeypatch):
+    async def scenario():
+        upstream = _Upstream()
+        app = _app(monkeypatch, upstream)
+        async with _client(app) as client:
+            leader = asyncio.create_task(client.get(PATH))
+            await upstream.started.wait()
+            follower = asyncio.create_task(client.get(PATH))
+            await asyncio.sleep(0.05)
+            leader.cancel()
+            await asyncio.sleep(0)
+            upstream.release.set()
+            response = await follower
+            stored = await app.state.redis.get(f"cache:default:{PATH}")
+        return upstream, leader, response, stored
+
+    upstream, leader, response, stored = asyncio.run(scenario())
+    assert leader.cancelled()
+    assert response.status_code == 200 and response.json() == {"n": 1}
+    assert upstream.gets == 1
+    assert json.loads(stored)["gen"] == "0.0"
+
+
+def test_hit_near_expiry_refreshes_in_background(monkeypatch):
+    async def scenario():
+        upstream = _Upstream()
+        upstream.release.set()
+        # A huge beta makes every hit due for refresh
+        app = _app(monkeypatch, upstream, CACHE_EARLY_REFRESH_BETA="1e9")
+        monkeypatch.setattr(server.random, "random", lambda: 0.5)
+        async with _client(app) as client:
+            await client.get(PATH)
+            hit = await client.get(PATH)
+            await asyncio.gather(*app.state.refresh_tasks)
+            refreshed = await client.get(PATH)
+            await asyncio.gather(*app.state.refresh_tasks)
+        return upstream, hit, refreshed
+
+    upstream, hit, refreshed = asyncio.run(scenario())
+    # The hit is served from cache while the refresh runs behind it
+    assert hit.json() == {"n": 1}
+    assert refreshed.json() == {"n": 2}
+    assert upstream.gets == 3
@@ -5,10 +5,11 @@ Defines device API interfaces and management.
 
 import asyncio
 import logging
-from typing import Dict, List, Any, Optional, Callable
+import time
+from typing import Dict, List, Any, Optional, Callable, Tuple
 from datetime import datetime
 import json
-import requests
+import httpx
 from abc import ABC, abstractmethod
 import uuid
 
@@ -63,13 +64,110 @@ class DeviceAPI(ABC):
         pass
 
 
+class HTTPTransport:
+    """
+    Pooled async HTTP transport shared by device APIs.
+    
+    Keeps one keep-alive connection pool per host (scheme, host, port) and
+    bounds concurrency both per host and per device, so bursts of commands,
+    status polls and heartbeats reuse a few connections instead of opening
+    one each.
+    """
+    
+    def __init__(self, max_connections_per_host: int = 10, max_requests_per_device: int = 4,
+                 keepalive_expiry: float = 30.0, http2: bool = False):
+        self.max_connections_per_host = max_connections_per_host
+        self.max_requests_per_device = max_requests_per_device
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self._clients: Dict[Tuple[str, str, int], httpx.AsyncClient] = {}
+        self._host_limits: Dict[Tuple[str, str, int], asyncio.Semaphore] = {}
+        self._device_limits: Dict[str, asyncio.Semaphore] = {}
+        self._host_stats: Dict[Tuple[str, str, int], Dict[str, int]] = {}
+        
+    @staticmethod
+    def _host_key(url: httpx.URL) -> Tuple[str, str, int]:
+        port = url.port or (443 if url.scheme == "https" else 80)
+        return (url.scheme, url.host, port)
+        
+    def _client(self, host: Tuple[str, str, int]) -> httpx.AsyncClient:
+        client = self._clients.get(host)
+        if client is None:
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections_per_host,
+                    max_keepalive_connections=self.max_connections_per_host,
+                    keepalive_expiry=self.keepalive_expiry
+                )
+            )
+            self._clients[host] = client
+            self._host_limits[host] = asyncio.Semaphore(self.max_connections_per_host)
+            self._host_stats[host] = {'requests': 0, 'connections_opened': 0, 'errors': 0}
+        return client
+        
+    async def request(self, device_id: str, method: str, url: str, timeout: float, **kwargs) -> httpx.Response:
+        """Send a request on the pooled client for the URL's host."""
+        parsed = httpx.URL(url)
+        host = self._host_key(parsed)
+        client = self._client(host)
+        stats = self._host_stats[host]
+        device_limit = self._device_limits.get(device_id)
+        if device_limit is None:
+            device_limit = self._device_limits[device_id] = asyncio.Semaphore(self.max_requests_per_device)
+            
+        async def trace(event_name: str, info: Dict[str, Any]):
+            # Fires only when the pool has to open a new connection
+            if event_name == "connection.connect_tcp.complete":
+                stats['connections_opened'] += 1
+                
+        async with device_limit, self._host_limits[host]:
+            stats['requests'] += 1
+            try:
+                return await client.request(
+                    method, parsed, timeout=timeout, extensions={"trace": trace}, **kwargs
+                )
+            except Exception:
+                stats['errors'] += 1
+                raise
+                
+    def release_device(self, device_id: str):
+        """Forget the per-device limit of a device that is gone."""
+        self._device_limits.pop(device_id, None)
+        
+    def get_statistics(self) -> Dict[str, Any]:
+        """Per-host request and connection counts."""
+        hosts = {}
+        for (scheme, host, port), stats in self._host_stats.items():
+            requests = stats['requests']
+            hosts[f"{scheme}://{host}:{port}"] = {
+                **stats,
+                'reuse_ratio': 1 - stats['connections_opened'] / requests if requests else 0.0
+            }
+        return hosts
+        
+    async def close(self):
+        """Close every pooled connection."""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Error closing HTTP client: {e}")
+        self._host_limits.clear()
+        self._host_stats.clear()
+
+
 class HTTPDeviceAPI(DeviceAPI):
     """HTTP-based device API implementation."""
     
-    def __init__(self, device_id: str, endpoint: str, timeout: int = 30):
+    def __init__(self, device_id: str, endpoint: str, timeout: int = 30,
+                 transport: Optional[HTTPTransport] = None):
         super().__init__(device_id, endpoint)
         self.timeout = timeout
-        self.session = None
+        # Shared transport from APIManager, or a private one closed on disconnect
+        self._owns_transport = transport is None
+        self.transport = transport or HTTPTransport()
         
     async def connect(self) -> bool:
         """Connect to the device API."""
@@ -91,6 +189,10 @@ class HTTPDeviceAPI(DeviceAPI):
     async def disconnect(self):
         """Disconnect from the device API."""
         self.is_connected = False
+        if self._owns_transport:
+            await self.transport.close()
+        else:
+            self.transport.release_device(self.device_id)
         logger.info(f"Disconnected from device API: {self.device_id}")
         
     async def send_command(self, command: Command) -> Optional[Response]:
@@ -200,18 +302,14 @@ class HTTPDeviceAPI(DeviceAPI):
             logger.error(f"Error sending heartbeat to device {self.device_id}: {e}")
             return False
             
-    async def _make_request(self, method: str, path: str, **kwargs) -> Optional[requests.Response]:
+    async def _make_request(self, method: str, path: str, timeout: Optional[float] = None,
+                            **kwargs) -> Optional[httpx.Response]:
         """Make HTTP request to device."""
+        url = f"{self.endpoint}{path}"
         try:
-            url = f"{self.endpoint}{path}"
-            
-            # Use asyncio to run requests in thread pool
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: requests.request(method, url, timeout=kwargs.get('timeout', self.timeout), **kwargs)
+            return await self.transport.request(
+                self.device_id, method, url, timeout=timeout or self.timeout, **kwargs
             )
-            return response
             
         except Exception as e:
             logger.error(f"HTTP request failed for {url}: {e}")
@@ -221,8 +319,15 @@ class HTTPDeviceAPI(DeviceAPI):
 class APIManager:
     """Manages device API connections and interactions."""
     
-    def __init__(self):
+    def __init__(self, max_connections_per_host: int = 10, max_requests_per_device: int = 4,
+                 max_concurrent_heartbeats: int = 100, heartbeat_interval: float = 30.0):
         self._apis: Dict[str, DeviceAPI] = {}
+        self._transport = HTTPTransport(
+            max_connections_per_host=max_connections_per_host,
+            max_requests_per_device=max_requests_per_device
+        )
+        self._max_concurrent_heartbeats = max_concurrent_heartbeats
+        self._heartbeat_interval = heartbeat_interval
         self._callbacks: Dict[str, List[Callable]] = {
             'command_sent': [],
             'response_received': [],
@@ -252,6 +357,7 @@ class APIManager:
         # Disconnect all APIs
         for api in self._apis.values():
             await api.disconnect()
+        await self._transport.close()
             
         logger.info("API manager stopped")
         
@@ -264,10 +370,10 @@ class APIManager:
                 
             # Create appropriate API based on protocol
             if protocol.lower() in ["http", "https"]:
-                api = HTTPDeviceAPI(device_id, endpoint)
+                api = HTTPDeviceAPI(device_id, endpoint, transport=self._transport)
             else:
                 # For now, default to HTTP
-                api = HTTPDeviceAPI(device_id, endpoint)
+                api = HTTPDeviceAPI(device_id, endpoint, transport=self._transport)
                 
             # Connect to the API
             if await api.connect():
@@ -386,7 +492,8 @@ class APIManager:
             'total_apis': total_apis,
             'connected_apis': connected_apis,
             'disconnected_apis': total_apis - connected_apis,
-            'average_response_time': avg_response_time
+            'average_response_time': avg_response_time,
+            'hosts': self._transport.get_statistics()
         }
         
     def add_callback(self, event: str, callback: Callable):
@@ -417,18 +524,29 @@ class APIManager:
                     
     async def _heartbeat_monitor(self):
         """Monitor device heartbeats."""
+        semaphore = asyncio.Semaphore(self._max_concurrent_heartbeats)
+        
+        async def heartbeat(api: DeviceAPI):
+            async with semaphore:
+                try:
+                    if await api.send_heartbeat():
+                        await self._notify_callbacks('heartbeat_received', api)
+                except Exception as e:
+                    logger.error(f"Error sending heartbeat to device {api.device_id}: {e}")
+                    
         while True:
             try:
-                for api in self._apis.values():
-                    if api.is_connected:
-                        success = await api.send_heartbeat()
-                        if success:
-                            await self._notify_callbacks('heartbeat_received', api)
-                            
-                await asyncio.sleep(30)  # Send heartbeat every 30 seconds
+                started = time.monotonic()
+                # Heartbeats run concurrently; the transport keeps connections per host alive between rounds
+                await asyncio.gather(*(
+                    heartbeat(api) for api in list(self._apis.values()) if api.is_connected
+                ))
+                
+                # Send heartbeat every heartbeat_interval seconds
+                await asyncio.sleep(max(0.0, self._heartbeat_interval - (time.monotonic() - started)))
                 
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Error in heartbeat monitor: {e}")
-                await asyncio.sleep(30)
+                await asyncio.sleep(self._heartbeat_interval)
@@ -4,8 +4,11 @@ Handles event publishing, subscription, and notification.
 """
 
 import asyncio
+import itertools
 import logging
-from typing import Dict, List, Any, Optional, Callable
+import time
+from collections import deque
+from typing import Deque, Dict, List, Any, Optional, Callable, Hashable, Tuple
 from datetime import datetime, timedelta
 import json
 import uuid
@@ -19,10 +22,22 @@ logger = logging.getLogger(__name__)
 class EventManager:
     """Manages event publishing, subscription, and notification."""
     
-    def __init__(self):
+    def __init__(self, delivery_timeout: float = 5.0, max_history_size: int = 10000,
+                 persist_batch_size: int = 200, persist_flush_interval: float = 1.0,
+                 max_pending_events: int = 50000, persist_max_attempts: int = 3):
         self._subscriptions: Dict[str, EventSubscription] = {}
-        self._event_queue: List[Event] = []
-        self._event_history: List[Event] = []
+        # Higher priority first, then publish order
+        self._event_queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._event_sequence = itertools.count()
+        # Subscriptions indexed by the most selective part of their filter:
+        # dimension ('device', 'source', 'type' or 'any') -> value -> subscription_id -> subscription
+        self._subscription_index: Dict[str, Dict[Hashable, Dict[str, EventSubscription]]] = {
+            'device': {}, 'source': {}, 'type': {}, 'any': {}
+        }
+        self._subscription_keys: Dict[str, Tuple[str, List[Hashable]]] = {}
+        self._delivery_timeout = delivery_timeout  # Per-subscriber timeout for async callbacks
+        # Oldest first; publish order keeps it sorted by timestamp for eviction
+        self._event_history: Deque[Event] = deque(maxlen=max_history_size)
         self._callbacks: Dict[str, List[Callable]] = {
             'event_published': [],
             'event_delivered': [],
@@ -32,7 +47,30 @@ class EventManager:
         }
         self._event_processor_task: Optional[asyncio.Task] = None
         self._cleanup_task: Optional[asyncio.Task] = None
-        self._max_history_size = 10000  # Maximum number of events to keep in history
+        self._max_history_size = max_history_size  # Maximum number of events to keep in history
+        
+        # Write-behind persistence: events are buffered and inserted in batches
+        self._persist_batch_size = persist_batch_size
+        self._persist_flush_interval = persist_flush_interval  # Seconds before a partial batch is flushed
+        self._max_pending_events = max_pending_events  # Oldest unsaved events are dropped past this
+        self._pending_events: Deque[Event] = deque()
+        # A batch failing this many times is split to find and drop the rows that cannot be saved
+        self._persist_max_attempts = persist_max_attempts
+        self._persist_attempts: Dict[str, int] = {}  # event_id -> failed flushes
+        self._flush_requested = asyncio.Event()
+        self._persistence_task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._persistence_stats = {
+            'batches_flushed': 0,
+            'events_persisted': 0,
+            'failed_flushes': 0,
+            'dropped_events': 0,
+            'rejected_events': 0,
+            'last_batch_size': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0
+        }
         
     async def start(self):
         """Start the event manager."""
@@ -45,6 +83,8 @@ class EventManager:
         # Start background tasks
         self._event_processor_task = asyncio.create_task(self._process_event_queue())
         self._cleanup_task = asyncio.create_task(self._cleanup_old_events())
+        self._stopping = False
+        self._persistence_task = asyncio.create_task(self._persist_events())
         
         logger.info("Event manager started")
         
@@ -58,7 +98,7 @@ class EventManager:
         if self._cleanup_task:
             self._cleanup_task.cancel()
             
-        # Save events and subscriptions to database
+        # Flush events still waiting to be persisted, then save subscriptions
         await self._save_events_to_database()
         await self._save_subscriptions_to_database()
             
@@ -82,17 +122,13 @@ class EventManager:
             )
             
             # Add to queue
-            self._event_queue.append(event)
+            self._event_queue.put_nowait((-event.priority.value, next(self._event_sequence), event))
             
-            # Add to history
+            # Add to history (the deque drops the oldest past max_history_size)
             self._event_history.append(event)
-            
-            # Keep history size manageable
-            if len(self._event_history) > self._max_history_size:
-                self._event_history = self._event_history[-self._max_history_size:]
                 
-            # Save to database
-            await self._save_event_to_database(event)
+            # Hand off to the persistence task
+            self._enqueue_for_persistence(event)
                 
             # Notify callbacks
             await self._notify_callbacks('event_published', event)
@@ -117,7 +153,7 @@ class EventManager:
             )
             
             # Add subscription
-            self._subscriptions[subscription.subscription_id] = subscription
+            self._add_subscription(subscription)
             
             # Save to database
             await self._save_subscription_to_database(subscription)
@@ -142,7 +178,7 @@ class EventManager:
             subscription = self._subscriptions[subscription_id]
             
             # Remove subscription
-            del self._subscriptions[subscription_id]
+            self._remove_subscription(subscription_id)
             
             # Notify callbacks
             await self._notify_callbacks('subscription_removed', subscription)
@@ -181,7 +217,7 @@ class EventManager:
     async def get_event_statistics(self) -> Dict[str, Any]:
         """Get event manager statistics."""
         total_events = len(self._event_history)
-        queued_events = len(self._event_queue)
+        queued_events = self._event_queue.qsize()
         active_subscriptions = len([sub for sub in self._subscriptions.values() if sub.active])
         
         # Event type distribution
@@ -202,13 +238,29 @@ class EventManager:
             source = event.source
             source_counts[source] = source_counts.get(source, 0) + 1
             
+        persistence = self._persistence_stats
+        batches = persistence['batches_flushed']
+        
         return {
             'total_events': total_events,
             'queued_events': queued_events,
             'active_subscriptions': active_subscriptions,
             'event_type_distribution': event_type_counts,
             'priority_distribution': priority_counts,
-            'source_distribution': source_counts
+            'source_distribution': source_counts,
+            'persistence': {
+                'pending_events': len(self._pending_events),
+                'batches_flushed': batches,
+                'events_persisted': persistence['events_persisted'],
+                'failed_flushes': persistence['failed_flushes'],
+                'dropped_events': persistence['dropped_events'],
+                'rejected_events': persistence['rejected_events'],
+                'last_batch_size': persistence['last_batch_size'],
+                'average_batch_size': persistence['events_persisted'] / batches if batches else 0.0,
+                'last_flush_ms': persistence['last_flush_ms'],
+                'average_flush_ms': persistence['total_flush_ms'] / batches if batches else 0.0,
+                'max_flush_ms': persistence['max_flush_ms']
+            }
         }
         
     def add_callback(self, event: str, callback: Callable):
@@ -225,22 +277,85 @@ class EventManager:
             self._callbacks[event].remove(callback)
             logger.debug(f"Removed callback for event: {event}")
             
+    def _add_subscription(self, subscription: EventSubscription):
+        """Store a subscription and index it for delivery."""
+        self._remove_subscription(subscription.subscription_id)
+        dimension, values = self._subscription_key(subscription.filter)
+        self._subscriptions[subscription.subscription_id] = subscription
+        for value in values:
+            self._subscription_index[dimension].setdefault(value, {})[subscription.subscription_id] = subscription
+        self._subscription_keys[subscription.subscription_id] = (dimension, values)
+        
+    def _remove_subscription(self, subscription_id: str):
+        """Drop a subscription and its index entries."""
+        self._subscriptions.pop(subscription_id, None)
+        key = self._subscription_keys.pop(subscription_id, None)
+        if key is None:
+            return
+        dimension, values = key
+        index = self._subscription_index[dimension]
+        for value in values:
+            bucket = index[value]
+            del bucket[subscription_id]
+            if not bucket:
+                del index[value]
+                
+    @staticmethod
+    def _subscription_key(event_filter: EventFilter) -> Tuple[str, List[Hashable]]:
+        """Pick where a filter is indexed: device id, then sources, then event types."""
+        device_id = (event_filter.data_filters or {}).get('device_id')
+        if device_id is not None and isinstance(device_id, Hashable):
+            return 'device', [device_id]
+        if event_filter.sources:
+            return 'source', list(dict.fromkeys(event_filter.sources))
+        if event_filter.event_types:
+            return 'type', list(dict.fromkeys(event_filter.event_types))
+        return 'any', [None]
+        
+    def _candidate_subscriptions(self, event: Event) -> List[EventSubscription]:
+        """Subscriptions indexed under the event's device id, source, type or as catch-all."""
+        index = self._subscription_index
+        candidates: List[EventSubscription] = []
+        device_id = event.data.get('device_id')
+        if device_id is not None and isinstance(device_id, Hashable):
+            candidates.extend(index['device'].get(device_id, {}).values())
+        candidates.extend(index['source'].get(event.source, {}).values())
+        candidates.extend(index['type'].get(event.event_type, {}).values())
+        candidates.extend(index['any'].get(None, {}).values())
+        return candidates
+        
     async def _process_event_queue(self):
         """Process events in the queue."""
         while True:
             try:
-                if self._event_queue:
-                    event = self._event_queue.pop(0)
+                _, _, event = await self._event_queue.get()
+                try:
                     await self._deliver_event(event)
+                finally:
+                    self._event_queue.task_done()
                     
-                await asyncio.sleep(0.1)  # Small delay to prevent busy waiting
-                
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Error processing event queue: {e}")
-                await asyncio.sleep(1)
                 
+    async def _deliver_to_subscription(self, subscription: EventSubscription, event: Event) -> bool:
+        """Deliver an event to one subscriber."""
+        try:
+            if subscription.callback:
+                # Call the callback
+                if asyncio.iscoroutinefunction(subscription.callback):
+                    await asyncio.wait_for(subscription.callback(event), timeout=self._delivery_timeout)
+                else:
+                    subscription.callback(event)
+            return True
+            
+        except asyncio.TimeoutError:
+            logger.warning(f"Timed out delivering event {event.event_id} to subscription {subscription.subscription_id}")
+        except Exception as e:
+            logger.error(f"Error delivering event to subscription {subscription.subscription_id}: {e}")
+        return False
+        
     async def _deliver_event(self, event: Event):
         """Deliver event to matching subscribers."""
         try:
@@ -251,26 +366,17 @@ class EventManager:
                 return
                 
             # Find matching subscriptions
-            matching_subscriptions = []
-            for subscription in self._subscriptions.values():
-                if subscription.active and subscription.filter.matches(event):
-                    matching_subscriptions.append(subscription)
-                    
-            # Deliver to subscribers
-            delivered_count = 0
-            for subscription in matching_subscriptions:
-                try:
-                    if subscription.callback:
-                        # Call the callback
-                        if asyncio.iscoroutinefunction(subscription.callback):
-                            await subscription.callback(event)
-                        else:
-                            subscription.callback(event)
-                            
-                    delivered_count += 1
+            matching_subscriptions = [
+                subscription for subscription in self._candidate_subscriptions(event)
+                if subscription.active and subscription.filter.matches(event)
+            ]
                     
-                except Exception as e:
-                    logger.error(f"Error delivering event to subscription {subscription.subscription_id}: {e}")
+            # Deliver to subscribers concurrently
+            results = await asyncio.gather(*(
+                self._deliver_to_subscription(subscription, event)
+                for subscription in matching_subscriptions
+            ))
+            delivered_count = sum(results)
                     
             # Mark event as delivered if at least one subscriber received it
             if delivered_count > 0:
@@ -288,20 +394,16 @@ class EventManager:
         """Clean up old events from history."""
         while True:
             try:
-                current_time = datetime.utcnow()
-                cleanup_threshold = timedelta(hours=24)  # 24 hours
+                cutoff_time = datetime.utcnow() - timedelta(hours=24)  # 24 hours
                 
-                # Remove old events from history
-                old_events = []
-                for event in self._event_history:
-                    if current_time - event.timestamp > cleanup_threshold:
-                        old_events.append(event)
-                        
-                for event in old_events:
-                    self._event_history.remove(event)
+                # History is oldest first, so expired events are all at the left
+                removed = 0
+                while self._event_history and self._event_history[0].timestamp < cutoff_time:
+                    self._event_history.popleft()
+                    removed += 1
                     
-                if old_events:
-                    logger.info(f"Cleaned up {len(old_events)} old events from history")
+                if removed:
+                    logger.info(f"Cleaned up {removed} old events from history")
                     
                 await asyncio.sleep(3600)  # Check every hour
                 
@@ -423,7 +525,8 @@ class EventManager:
                     DBEvent.timestamp >= cutoff_time
                 ).order_by(DBEvent.timestamp.desc()).limit(1000).all()
                 
-                for db_event in db_events:
+                # Oldest first, matching the order of published events
+                for db_event in reversed(db_events):
                     event = Event(
                         event_id=db_event.event_id,
                         event_type=EventType(db_event.event_type),
@@ -441,34 +544,164 @@ class EventManager:
         except Exception as e:
             logger.error(f"Error loading events from database: {e}")
             
-    async def _save_event_to_database(self, event: Event):
-        """Save event to database."""
-        try:
-            from shared.database.models import Event as DBEvent
-            from shared.database.api_database import get_session_factory, session_scope
-            from shared.config.settings import settings
-            
-            session_factory = get_session_factory(settings.database_url)
-            
-            with session_scope(session_factory) as session:
-                db_event = DBEvent(
-                    event_id=event.event_id,
-                    event_type=event.event_type.value,
-                    source=event.source,
-                    timestamp=event.timestamp,
-                    data=event.data,
-                    event_metadata=event.metadata,
-                    priority=event.priority.value,
-                    ttl=event.ttl,
-                    delivered=event.delivered
-                )
-                session.add(db_event)
-                session.commit()
+    def _enqueue_for_persistence(self, event: Event):
+        """Buffer an event for the next batch insert."""
+        if len(self._pending_events) >= self._max_pending_events:
+            dropped = self._pending_events.popleft()
+            self._persist_attempts.pop(dropped.event_id, None)
+            self._persistence_stats['dropped_events'] += 1
+            if self._persistence_stats['dropped_events'] % 1000 == 1:
+                logger.warning(f"Event persistence backlog full; dropped {self._persistence_stats['dropped_events']} events so far")
+        self._pending_events.append(event)
+        if len(self._pending_events) >= self._persist_batch_size:
+            self._flush_requested.set()
+            
+    async def _persist_events(self):
+        """Flush buffered events when a batch fills up or the flush interval passes."""
+        while not self._stopping:
+            try:
+                try:
+                    await asyncio.wait_for(self._flush_requested.wait(), timeout=self._persist_flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_requested.clear()
                 
-                logger.debug(f"Saved event to database: {event.event_id}")
+                while self._pending_events:
+                    if not await self._flush_pending_events():
+                        break
+                    if len(self._pending_events) < self._persist_batch_size:
+                        break
+                        
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in event persistence task: {e}")
+                await asyncio.sleep(self._persist_flush_interval)
                 
+    async def _flush_pending_events(self) -> bool:
+        """Insert one batch of buffered events; on failure the batch is put back.
+
+        A batch that has failed ``persist_max_attempts`` times is split until
+        the rows that fail on their own are found and dropped, so one bad event
+        cannot block the rest. Splitting only happens while the database answers;
+        during an outage the batch just waits for the next flush.
+        """
+        batch = [self._pending_events.popleft()
+                 for _ in range(min(self._persist_batch_size, len(self._pending_events)))]
+        if not batch:
+            return True
+            
+        # Snapshot the rows here: the loop keeps mutating events while the executor inserts
+        rows = [self._event_row(event) for event in batch]
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._save_event_batch_to_database, rows)
+            failed: List[Event] = []
         except Exception as e:
-            logger.error(f"Error saving event to database: {e}")
+            logger.error(f"Error saving {len(batch)} events to database: {e}")
+            self._persistence_stats['failed_flushes'] += 1
+            failed = batch
+            attempts = 0
+            for event in batch:
+                attempts = max(attempts, self._persist_attempts.get(event.event_id, 0) + 1)
+                self._persist_attempts[event.event_id] = attempts
+            if attempts >= self._persist_max_attempts:
+                if await loop.run_in_executor(None, self._database_reachable):
+                    failed = await self._save_bisecting(list(zip(batch, rows)))
+                    if failed:
+                        self._reject_events(failed)
+                        failed = []
+                else:
+                    # Outage rather than bad rows: start counting again once it is back
+                    for event in failed:
+                        self._persist_attempts.pop(event.event_id, None)
+                        
+        failed_ids = {event.event_id for event in failed}
+        saved = [event for event in batch if event.event_id not in failed_ids]
+        for event in saved:
+            self._persist_attempts.pop(event.event_id, None)
+        if failed:
+            # Retry with the next flush, oldest first, within the backlog limit
+            room = self._max_pending_events - len(self._pending_events)
+            if room < len(failed):
+                self._persistence_stats['dropped_events'] += len(failed) - max(room, 0)
+                for event in failed[:len(failed) - max(room, 0)]:
+                    self._persist_attempts.pop(event.event_id, None)
+                failed = failed[len(failed) - max(room, 0):]
+            self._pending_events.extendleft(reversed(failed))
+            return False
+            
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stats = self._persistence_stats
+        stats['batches_flushed'] += 1
+        stats['events_persisted'] += len(saved)
+        stats['last_batch_size'] = len(saved)
+        stats['last_flush_ms'] = elapsed_ms
+        stats['max_flush_ms'] = max(stats['max_flush_ms'], elapsed_ms)
+        stats['total_flush_ms'] += elapsed_ms
+        logger.debug(f"Saved {len(batch)} events to database in {elapsed_ms:.1f}ms")
+        return True
+        
+    async def _save_bisecting(self, pairs: List[Tuple[Event, Dict[str, Any]]]) -> List[Event]:
+        """Insert rows, halving any chunk that fails; returns the events whose row fails alone."""
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._save_event_batch_to_database, [row for _, row in pairs])
+            return []
+        except Exception:
+            if len(pairs) == 1:
+                return [pairs[0][0]]
+        middle = len(pairs) // 2
+        return await self._save_bisecting(pairs[:middle]) + await self._save_bisecting(pairs[middle:])
+        
+    def _reject_events(self, events: List[Event]):
+        """Give up on events whose rows the database refuses."""
+        for event in events:
+            self._persist_attempts.pop(event.event_id, None)
+        self._persistence_stats['rejected_events'] += len(events)
+        logger.error(
+            f"Dropped {len(events)} events that cannot be saved to database: "
+            f"{', '.join(event.event_id for event in events[:10])}"
+        )
+        
+    @staticmethod
+    def _event_row(event: Event) -> Dict[str, Any]:
+        """Insert mapping for an event, copied so later changes to the event do not leak in."""
+        return {
+            'event_id': event.event_id,
+            'event_type': event.event_type.value,
+            'source': event.source,
+            'timestamp': event.timestamp,
+            'data': dict(event.data) if event.data is not None else None,
+            'event_metadata': dict(event.metadata) if event.metadata is not None else None,
+            'priority': event.priority.value,
+            'ttl': event.ttl,
+            'delivered': event.delivered
+        }
+        
+    def _save_event_batch_to_database(self, rows: List[Dict[str, Any]]):
+        """Bulk insert event rows built by ``_event_row`` (runs in an executor thread)."""
+        from shared.database.models import Event as DBEvent
+        from shared.database.api_database import get_session_factory, session_scope
+        from shared.config.settings import settings
+        
+        session_factory = get_session_factory(settings.database_url)
+        
+        with session_scope(session_factory) as session:
+            session.bulk_insert_mappings(DBEvent, rows)
+            
+    def _database_reachable(self) -> bool:
+        """Whether a trivial query succeeds (runs in an executor thread)."""
+        from sqlalchemy import text
+        from shared.database.api_database import get_session_factory, session_scope
+        
+        try:
+            with session_scope(get_session_factory(settings.database_url)) as session:
+                session.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
             
     async def _load_subscriptions_from_database(self):
         """Load subscriptions from database."""
@@ -494,7 +727,7 @@ class EventManager:
                         callback=None,  # Callbacks need to be re-registered
                         created_at=db_subscription.created_at
                     )
-                    self._subscriptions[db_subscription.subscription_id] = subscription
+                    self._add_subscription(subscription)
                     
             logger.info(f"Loaded {len(db_subscriptions)} subscriptions from database")
             
@@ -542,11 +775,23 @@ class EventManager:
             logger.error(f"Error saving subscription to database: {e}")
             
     async def _save_events_to_database(self):
-        """Save all events to database."""
+        """Stop the persistence task and flush every buffered event."""
         try:
-            for event in self._event_history:
-                await self._save_event_to_database(event)
-            logger.info("Saved all events to database")
+            self._stopping = True
+            self._flush_requested.set()
+            if self._persistence_task:
+                await self._persistence_task
+                self._persistence_task = None
+                
+            pending = len(self._pending_events)
+            while self._pending_events:
+                if not await self._flush_pending_events():
+                    break
+                    
+            if self._pending_events:
+                logger.warning(f"{len(self._pending_events)} events could not be saved to database")
+            else:
+                logger.info(f"Saved {pending} pending events to database")
             
         except Exception as e:
             logger.error(f"Error saving events to database: {e}")
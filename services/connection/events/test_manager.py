@@ -0,0 +1,190 @@
+"""
+Tests for the event manager's dispatch and write-behind persistence.
+"""
+
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime
+
+from .manager import EventManager
+from .models import Event, EventFilter, EventPriority, EventSubscription, EventType
+
+
+def _event():
+    return Event(
+        event_id=str(uuid.uuid4()), event_type=EventType.DEVICE_CONNECTED,
+        source="test", timestamp=datetime.now()
+    )
+
+
+class _Database:
+    """Stands in for the database, rejecting the batches it is told to."""
+
+    def __init__(self, up=True, bad_ids=()):
+        self.up = up
+        self.bad_ids = set(bad_ids)
+        self.inserts = 0
+        self.pings = 0
+        self.rows = []
+
+    def save(self, rows):
+        self.inserts += 1
+        if not self.up or any(row['event_id'] in self.bad_ids for row in rows):
+            raise RuntimeError("insert failed")
+        self.rows.extend(rows)
+
+    def reachable(self):
+        self.pings += 1
+        return self.up
+
+
+def _manager(database, **kwargs):
+    manager = EventManager(persist_batch_size=200, persist_max_attempts=3, **kwargs)
+    manager._save_event_batch_to_database = database.save
+    manager._database_reachable = database.reachable
+    return manager
+
+
+def test_outage_does_not_split_batches():
+    database = _Database(up=False)
+    manager = _manager(database)
+    events = [_event() for _ in range(200)]
+    manager._pending_events.extend(events)
+
+    async def run():
+        return [await manager._flush_pending_events() for _ in range(6)]
+
+    assert asyncio.run(run()) == [False] * 6
+    # One insert per flush and one ping each time the attempt limit is reached
+    assert database.inserts == 6
+    assert database.pings == 2
+    assert list(manager._pending_events) == events
+    assert manager._persistence_stats['rejected_events'] == 0
+
+
+def test_bad_rows_are_dropped_once_database_answers():
+    events = [_event() for _ in range(8)]
+    bad = events[5]
+    database = _Database(bad_ids={bad.event_id})
+    manager = _manager(database)
+    manager._pending_events.extend(events)
+
+    async def run():
+        return [await manager._flush_pending_events() for _ in range(3)]
+
+    assert asyncio.run(run()) == [False, False, True]
+    assert database.pings == 1
+    assert [row['event_id'] for row in database.rows] == [
+        event.event_id for event in events if event is not bad
+    ]
+    assert not manager._pending_events
+    assert manager._persist_attempts == {}
+    assert manager._persistence_stats['rejected_events'] == 1
+
+
+def _subscription(event_filter, callback=None, subscription_id=None):
+    return EventSubscription(
+        subscription_id=subscription_id or str(uuid.uuid4()), subscriber_id="test",
+        filter=event_filter, callback=callback
+    )
+
+
+def test_queue_delivers_higher_priority_first_then_in_publish_order():
+    manager = EventManager()
+    received = []
+    manager._add_subscription(_subscription(EventFilter(), callback=lambda event: received.append(event.data["n"])))
+
+    async def run():
+        for n, priority in enumerate([EventPriority.LOW, EventPriority.NORMAL, EventPriority.CRITICAL,
+                                      EventPriority.HIGH, EventPriority.NORMAL]):
+            await manager.publish_event(EventType.DEVICE_CONNECTED, "test", {"n": n}, priority=priority)
+        processor = asyncio.create_task(manager._process_event_queue())
+        await manager._event_queue.join()
+        processor.cancel()
+
+    asyncio.run(run())
+    assert received == [2, 3, 1, 4, 0]
+
+
+def test_indexed_candidates_match_a_full_scan():
+    rng = random.Random(7)
+    types = list(EventType)[:4]
+    sources = ["hub", "cloud", "local"]
+    devices = ["d1", "d2", "d3"]
+
+    def pick(options):
+        return rng.sample(options, rng.randint(1, 2)) if rng.random() < 0.5 else None
+
+    manager = EventManager()
+    for _ in range(60):
+        data_filters = None
+        if rng.random() < 0.4:
+            data_filters = {"device_id": rng.choice(devices + [None])}
+        manager._add_subscription(_subscription(EventFilter(
+            event_types=pick(types), sources=pick(sources),
+            min_priority=rng.choice([None, EventPriority.HIGH]), data_filters=data_filters
+        )))
+
+    for _ in range(500):
+        data = {"device_id": rng.choice(devices)} if rng.random() < 0.7 else {}
+        event = Event(
+            event_id=str(uuid.uuid4()), event_type=rng.choice(types), source=rng.choice(sources),
+            timestamp=datetime.utcnow(), data=data, priority=rng.choice(list(EventPriority))
+        )
+        candidates = [s.subscription_id for s in manager._candidate_subscriptions(event)]
+        assert len(candidates) == len(set(candidates))
+        indexed = {s.subscription_id for s in manager._candidate_subscriptions(event) if s.filter.matches(event)}
+        scanned = {s.subscription_id for s in manager._subscriptions.values() if s.filter.matches(event)}
+        assert indexed == scanned
+
+
+def test_unsubscribe_and_resubscribe_keep_the_index_clean(monkeypatch):
+    manager = EventManager()
+
+    async def no_save(subscription):
+        pass
+
+    monkeypatch.setattr(manager, "_save_subscription_to_database", no_save)
+
+    async def run():
+        first = await manager.subscribe("s", EventFilter(sources=["hub", "cloud"]))
+        second = await manager.subscribe("s", EventFilter(data_filters={"device_id": "d1"}))
+        assert await manager.unsubscribe(first)
+        assert not await manager.unsubscribe(first)
+        assert manager._subscription_index["source"] == {}
+        # Re-adding under the same id moves it to the new filter's bucket
+        manager._add_subscription(_subscription(EventFilter(event_types=[EventType.DEVICE_CONNECTED]),
+                                                subscription_id=second))
+        assert manager._subscription_index["device"] == {}
+        assert list(manager._subscription_index["type"][EventType.DEVICE_CONNECTED]) == [second]
+        assert await manager.unsubscribe(second)
+
+    asyncio.run(run())
+    assert manager._subscriptions == {} and manager._subscription_keys == {}
+    assert all(index == {} for index in manager._subscription_index.values())
+
+
+def test_slow_async_callback_is_cut_off_at_delivery_timeout():
+    manager = EventManager(delivery_timeout=0.05)
+    fast = []
+
+    async def slow_callback(event):
+        await asyncio.sleep(5)
+
+    async def fast_callback(event):
+        fast.append(event.event_id)
+
+    manager._add_subscription(_subscription(EventFilter(), callback=slow_callback))
+    manager._add_subscription(_subscription(EventFilter(), callback=fast_callback))
+    event = _event()
+
+    async def run():
+        started = time.perf_counter()
+        await manager._deliver_event(event)
+        return time.perf_counter() - started
+
+    assert asyncio.run(run()) < 1.0
+    assert fast == [event.event_id]
+    assert event.delivered
@@ -4,8 +4,9 @@ Manages device registration, discovery, and lifecycle operations.
 """
 
 import asyncio
+import itertools
 import logging
-from typing import Dict, List, Any, Optional, Callable
+from typing import Dict, List, Any, Optional, Callable, Iterable, Set, Tuple
 from datetime import datetime, timedelta
 import json
 import uuid
@@ -23,6 +24,18 @@ class DeviceRegistry:
     
     def __init__(self):
         self._devices: Dict[str, DeviceRecord] = {}
+        self._sequence = itertools.count()
+        self._device_order: Dict[str, int] = {}  # Registration order, for stable results
+        
+        # Secondary indexes: field -> value -> device ids. Kept in sync by every
+        # registry method that changes a record; _index_keys remembers what each
+        # device was indexed under so it can be unindexed after a change.
+        self._indexes: Dict[str, Dict[Any, Set[str]]] = {
+            'status': {}, 'protocol': {}, 'manufacturer': {}, 'capability': {}
+        }
+        self._search_index: Dict[str, Set[str]] = {}  # trigram of name/model/manufacturer -> device ids
+        self._index_keys: Dict[str, Dict[str, Any]] = {}
+        
         self._session_factory = get_session_factory(settings.database_url)
         self._callbacks: Dict[str, List[Callable]] = {
             'device_registered': [],
@@ -85,7 +98,7 @@ class DeviceRegistry:
             )
             
             # Add to registry
-            self._devices[device_info.device_id] = device_record
+            self._add_device(device_record)
             
             # Save to database
             await self._save_device_to_database(device_record)
@@ -109,9 +122,13 @@ class DeviceRegistry:
                 return None
                 
             # Apply updates
-            for key, value in updates.items():
-                if hasattr(device_record, key):
-                    setattr(device_record, key, value)
+            self._unindex_device(device_id)
+            try:
+                for key, value in updates.items():
+                    if hasattr(device_record, key):
+                        setattr(device_record, key, value)
+            finally:
+                self._index_device(device_record)
                     
             # Update timestamp
             device_record.last_seen = datetime.utcnow()
@@ -138,7 +155,7 @@ class DeviceRegistry:
                 return False
                 
             # Remove from registry
-            del self._devices[device_id]
+            self._discard_device(device_id)
             
             # Remove from database
             await self._remove_device_from_database(device_id)
@@ -163,19 +180,25 @@ class DeviceRegistry:
                          manufacturer: Optional[str] = None,
                          capability: Optional[str] = None) -> List[DeviceRecord]:
         """Get devices with optional filtering."""
-        devices = list(self._devices.values())
-        
-        # Apply filters
+        if not (status or protocol or manufacturer or capability):
+            return list(self._devices.values())
+            
+        # Intersect the index entries, smallest first
+        candidate_sets = []
         if status:
-            devices = [d for d in devices if d.status == status]
+            candidate_sets.append(self._indexes['status'].get(status, set()))
         if protocol:
-            devices = [d for d in devices if d.protocol == protocol]
+            candidate_sets.append(self._indexes['protocol'].get(protocol, set()))
         if manufacturer:
-            devices = [d for d in devices if d.manufacturer.lower() == manufacturer.lower()]
+            candidate_sets.append(self._indexes['manufacturer'].get(manufacturer.lower(), set()))
         if capability:
-            devices = [d for d in devices if capability in d.capabilities]
+            candidate_sets.append(self._indexes['capability'].get(capability, set()))
+        candidate_sets.sort(key=len)
+        device_ids = set(candidate_sets[0])
+        for candidates in candidate_sets[1:]:
+            device_ids &= candidates
             
-        return devices
+        return self._ordered_devices(device_ids)
         
     async def update_device_status(self, device_id: str, status: DeviceStatus) -> bool:
         """Update device status."""
@@ -187,6 +210,7 @@ class DeviceRegistry:
                 
             old_status = device_record.status
             device_record.update_status(status)
+            self._reindex_field(device_id, 'status', [status])
             
             # Save to database
             await self._save_device_to_database(device_record)
@@ -210,11 +234,10 @@ class DeviceRegistry:
                 logger.warning(f"Device {device_id} not found in registry")
                 return False
                 
+            # Memory only: the devices table has no heartbeat column, and the
+            # offline monitor reads last_heartbeat from the record
             device_record.update_heartbeat()
             
-            # Save to database
-            await self._save_device_to_database(device_record)
-            
             # Notify callbacks
             await self._notify_callbacks('device_heartbeat', device_record)
             
@@ -227,9 +250,25 @@ class DeviceRegistry:
     async def search_devices(self, query: str) -> List[DeviceRecord]:
         """Search devices by name, model, or manufacturer."""
         query_lower = query.lower()
-        results = []
         
-        for device in self._devices.values():
+        if len(query_lower) < 3:
+            device_ids = list(self._devices)
+        else:
+            # A match contains every trigram of the query; start from the rarest
+            postings = sorted(
+                (self._search_index.get(gram, set()) for gram in self._trigrams(query_lower)),
+                key=len
+            )
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                if not candidates:
+                    break
+                candidates &= posting
+            device_ids = self._ordered_ids(candidates)
+                
+        results = []
+        for device_id in device_ids:
+            device = self._devices[device_id]
             if (query_lower in device.name.lower() or
                 query_lower in device.model.lower() or
                 query_lower in device.manufacturer.lower()):
@@ -269,6 +308,73 @@ class DeviceRegistry:
             'average_trust_level': sum(d.trust_level for d in self._devices.values()) / total_devices if total_devices > 0 else 0.0
         }
         
+    @staticmethod
+    def _trigrams(text: str) -> Set[str]:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+        
+    def _add_device(self, device_record: DeviceRecord):
+        """Add a record to the registry and its indexes."""
+        self._discard_device(device_record.device_id)
+        self._devices[device_record.device_id] = device_record
+        self._device_order[device_record.device_id] = next(self._sequence)
+        self._index_device(device_record)
+        
+    def _discard_device(self, device_id: str):
+        """Remove a record from the registry and its indexes."""
+        if device_id in self._devices:
+            self._unindex_device(device_id)
+            del self._devices[device_id]
+            del self._device_order[device_id]
+        
+    def _index_device(self, device_record: DeviceRecord):
+        device_id = device_record.device_id
+        keys = {
+            'status': [device_record.status],
+            'protocol': [device_record.protocol],
+            'manufacturer': [device_record.manufacturer.lower()],
+            'capability': list(set(device_record.capabilities)),
+            'search': set().union(*(
+                self._trigrams(text.lower())
+                for text in (device_record.name, device_record.model, device_record.manufacturer)
+            ))
+        }
+        for field, values in keys.items():
+            index = self._search_index if field == 'search' else self._indexes[field]
+            for value in values:
+                index.setdefault(value, set()).add(device_id)
+        self._index_keys[device_id] = keys
+        
+    def _unindex_device(self, device_id: str):
+        keys = self._index_keys.pop(device_id, None)
+        if keys is None:
+            return
+        for field, values in keys.items():
+            index = self._search_index if field == 'search' else self._indexes[field]
+            self._discard_from_index(index, values, device_id)
+                
+    def _reindex_field(self, device_id: str, field: str, values: List[Any]):
+        """Move a device to new values of one secondary index."""
+        keys = self._index_keys[device_id]
+        self._discard_from_index(self._indexes[field], keys[field], device_id)
+        for value in values:
+            self._indexes[field].setdefault(value, set()).add(device_id)
+        keys[field] = values
+        
+    @staticmethod
+    def _discard_from_index(index: Dict[Any, Set[str]], values: Iterable[Any], device_id: str):
+        for value in values:
+            device_ids = index.get(value)
+            if device_ids is not None:
+                device_ids.discard(device_id)
+                if not device_ids:
+                    del index[value]
+                    
+    def _ordered_ids(self, device_ids: Set[str]) -> List[str]:
+        return sorted(device_ids, key=self._device_order.__getitem__)
+        
+    def _ordered_devices(self, device_ids: Set[str]) -> List[DeviceRecord]:
+        return [self._devices[device_id] for device_id in self._ordered_ids(device_ids)]
+        
     def add_callback(self, event: str, callback: Callable):
         """Add a callback for registry events."""
         if event in self._callbacks:
@@ -320,7 +426,7 @@ class DeviceRegistry:
                         registered_at=device.created_at
                     )
                     
-                    self._devices[device_record.device_id] = device_record
+                    self._add_device(device_record)
                     
             logger.info(f"Loaded {len(devices)} devices from database")
             
@@ -331,40 +437,61 @@ class DeviceRegistry:
         """Save device to database."""
         try:
             with session_scope(self._session_factory) as session:
-                # Check if device exists
-                existing_device = session.query(Device).filter_by(
-                    model=device_record.model,
-                    manufacturer=device_record.manufacturer
-                ).first()
-                
-                if existing_device:
-                    # Update existing device
-                    existing_device.firmware_version = device_record.firmware_version
-                    session.commit()
-                else:
-                    # Create new device
-                    device = Device(
-                        model=device_record.model,
-                        manufacturer=device_record.manufacturer,
-                        firmware_version=device_record.firmware_version
-                    )
-                    session.add(device)
-                    session.commit()
-                    
-                    # Add endpoints
-                    for endpoint_url in device_record.endpoints:
-                        api_endpoint = ApiEndpoint(
-                            device_id=device.id,
-                            endpoint_url=endpoint_url,
-                            method="GET",
-                            authentication_type="unknown"
-                        )
-                        session.add(api_endpoint)
-                    session.commit()
+                self._write_devices(session, [device_record])
                     
         except Exception as e:
             logger.error(f"Error saving device to database: {e}")
             
+    def _save_device_batch_to_database(self, device_records: List[DeviceRecord]):
+        """Save several devices in one transaction."""
+        with session_scope(self._session_factory) as session:
+            self._write_devices(session, device_records)
+            
+    @staticmethod
+    def _write_devices(session, device_records: List[DeviceRecord]):
+        """Upsert database devices (keyed by model and manufacturer) for the given records."""
+        # Records sharing a model and manufacturer map to one row; the last one wins
+        by_key: Dict[Tuple[str, str], DeviceRecord] = {}
+        for device_record in device_records:
+            by_key[(device_record.model, device_record.manufacturer)] = device_record
+            
+        existing: Dict[Tuple[str, str], Device] = {}
+        models = sorted({model for model, _ in by_key})
+        for start in range(0, len(models), 500):
+            rows = session.query(Device).filter(
+                Device.model.in_(models[start:start + 500])
+            ).order_by(Device.id).all()
+            for row in rows:
+                existing.setdefault((row.model, row.manufacturer), row)
+                
+        created = []
+        for key, device_record in by_key.items():
+            existing_device = existing.get(key)
+            if existing_device:
+                # Update existing device
+                existing_device.firmware_version = device_record.firmware_version
+            else:
+                # Create new device
+                device = Device(
+                    model=device_record.model,
+                    manufacturer=device_record.manufacturer,
+                    firmware_version=device_record.firmware_version
+                )
+                session.add(device)
+                created.append((device, device_record))
+                
+        if created:
+            session.flush()
+            # Add endpoints
+            for device, device_record in created:
+                for endpoint_url in device_record.endpoints:
+                    session.add(ApiEndpoint(
+                        device_id=device.id,
+                        url=endpoint_url,
+                        method="GET"
+                    ))
+        session.commit()
+            
     async def _remove_device_from_database(self, device_id: str):
         """Remove device from database."""
         try:
@@ -378,8 +505,7 @@ class DeviceRegistry:
     async def _save_devices_to_database(self):
         """Save all devices to database."""
         try:
-            for device_record in self._devices.values():
-                await self._save_device_to_database(device_record)
+            self._save_device_batch_to_database(list(self._devices.values()))
             logger.info("Saved all devices to database")
             
         except Exception as e:
@@ -392,10 +518,14 @@ class DeviceRegistry:
                 current_time = datetime.utcnow()
                 offline_threshold = timedelta(minutes=5)  # 5 minutes without heartbeat
                 
-                for device_record in self._devices.values():
+                # Only devices in an online status can go offline
+                online_ids = set().union(*(
+                    self._indexes['status'].get(status, set())
+                    for status in (DeviceStatus.ONLINE, DeviceStatus.CONNECTED, DeviceStatus.AUTHENTICATED, DeviceStatus.TRUSTED)
+                ))
+                for device_record in self._ordered_devices(online_ids):
                     if (device_record.last_heartbeat and 
-                        current_time - device_record.last_heartbeat > offline_threshold and
-                        device_record.status in [DeviceStatus.ONLINE, DeviceStatus.CONNECTED, DeviceStatus.AUTHENTICATED, DeviceStatus.TRUSTED]):
+                        current_time - device_record.last_heartbeat > offline_threshold):
                         
                         await self.update_device_status(device_record.device_id, DeviceStatus.OFFLINE)
                         
@@ -415,9 +545,8 @@ class DeviceRegistry:
                 cleanup_threshold = timedelta(days=30)  # 30 days offline
                 
                 devices_to_remove = []
-                for device_record in self._devices.values():
-                    if (device_record.status == DeviceStatus.OFFLINE and
-                        device_record.last_seen and
+                for device_record in self._ordered_devices(self._indexes['status'].get(DeviceStatus.OFFLINE, set())):
+                    if (device_record.last_seen and
                         current_time - device_record.last_seen > cleanup_threshold):
                         
                         devices_to_remove.append(device_record.device_id)
@@ -158,6 +158,28 @@ class BaseIoTHub(ABC):
         """Subscribe to device events."""
         pass
         
+    async def set_device_states_bulk(self, states: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        """
+        Set the state of several devices on this hub.
+        
+        The default fans out to ``set_device_state`` with at most
+        ``max_concurrent_commands`` (custom_config, default 8) requests in
+        flight; hubs with a native group or batch call override this.
+        """
+        semaphore = asyncio.Semaphore(int(self.config.custom_config.get('max_concurrent_commands', 8)))
+        
+        async def _set(device_id: str, state: Dict[str, Any]) -> bool:
+            async with semaphore:
+                try:
+                    return bool(await self.set_device_state(device_id, state))
+                except Exception as e:
+                    logger.error(f"Error setting state for device {device_id}: {e}")
+                    return False
+                    
+        device_ids = list(states)
+        results = await asyncio.gather(*(_set(device_id, states[device_id]) for device_id in device_ids))
+        return dict(zip(device_ids, results))
+        
     async def start(self):
         """Start the IoT hub connection."""
         self._running = True
@@ -200,6 +200,50 @@ class HomeAssistantHub(BaseIoTHub):
             logger.error(f"Error setting device state: {e}")
             return False
             
+    async def set_device_states_bulk(self, states: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        """Set several devices, one service call per distinct target state."""
+        results = {device_id: False for device_id in states}
+        if not self.session:
+            return results
+            
+        # Home Assistant services take a list of entity_ids, so devices
+        # receiving the same state share one call
+        groups: Dict[str, List[str]] = {}
+        for device_id, state in states.items():
+            groups.setdefault(json.dumps(state, sort_keys=True, default=str), []).append(device_id)
+            
+        base_url = f"http://{self.config.host}:{self.config.port}"
+        headers = {
+            'Content-Type': 'application/json'
+        }
+        if self.config.api_key:
+            headers['Authorization'] = f'Bearer {self.config.api_key}'
+        elif self.config.token:
+            headers['Authorization'] = f'Bearer {self.config.token}'
+            
+        async def _call(device_ids: List[str]) -> None:
+            service_data = {
+                'entity_id': device_ids,
+                **states[device_ids[0]]
+            }
+            try:
+                async with self.session.post(
+                    f"{base_url}/api/services/homeassistant/turn_on",
+                    headers=headers,
+                    json=service_data
+                ) as response:
+                    if response.status == 200:
+                        for device_id in device_ids:
+                            results[device_id] = True
+                    else:
+                        logger.error(f"Failed to set state for {len(device_ids)} devices: {response.status}")
+            except Exception as e:
+                logger.error(f"Error setting state for {len(device_ids)} devices: {e}")
+                
+        await asyncio.gather(*(_call(device_ids) for device_ids in groups.values()))
+        logger.info(f"Set state for {sum(results.values())}/{len(states)} devices in {len(groups)} service calls")
+        return results
+        
     async def subscribe_to_events(self) -> bool:
         """Subscribe to Home Assistant events via WebSocket."""
         try:
@@ -5,6 +5,7 @@ Manages multiple IoT hub connections and provides a unified interface for device
 
 import asyncio
 import logging
+import time
 from typing import Dict, List, Any, Optional, Callable
 from datetime import datetime
 import json
@@ -20,10 +21,35 @@ from .hubs import (
 logger = logging.getLogger(__name__)
 
 
+def diff_state(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Per-key state changes as ``{key: {'old': ..., 'new': ...}}``; dropped keys have new=None."""
+    changes = {}
+    for key in old.keys() | new.keys():
+        before = old.get(key)
+        after = new.get(key)
+        if before != after or (key in old) != (key in new):
+            changes[key] = {'old': before, 'new': after}
+    return changes
+
+
 class IoTHubManager:
-    """Manages multiple IoT hub connections."""
+    """
+    Manages multiple IoT hub connections.
     
-    def __init__(self):
+    Hubs are discovered concurrently, each with its own timeout and an
+    adaptive interval: it shrinks towards ``min_discovery_interval`` while a
+    hub keeps reporting changes, grows towards ``max_discovery_interval`` while
+    it is quiet, and backs off on errors. Each hub cycle is reconciled against
+    the known devices and reported as one ``devices_changed`` event.
+    """
+    
+    def __init__(
+        self,
+        discovery_interval: float = 300.0,
+        min_discovery_interval: float = 60.0,
+        max_discovery_interval: float = 900.0,
+        discovery_timeout: float = 60.0
+    ):
         self.hubs: Dict[str, BaseIoTHub] = {}
         self.devices: Dict[str, IoTDevice] = {}
         self._callbacks: List[Callable] = []
@@ -31,6 +57,13 @@ class IoTHubManager:
         self._discovery_task: Optional[asyncio.Task] = None
         self._event_task: Optional[asyncio.Task] = None
         
+        # Per-hub discovery scheduling
+        self.discovery_interval = discovery_interval
+        self.min_discovery_interval = min_discovery_interval
+        self.max_discovery_interval = max_discovery_interval
+        self.discovery_timeout = discovery_timeout
+        self._discovery_schedule: Dict[str, Dict[str, Any]] = {}
+        
     async def add_hub(self, config: HubConfig) -> str:
         """Add a new IoT hub."""
         try:
@@ -95,6 +128,7 @@ class IoTHubManager:
                 
             # Remove hub
             del self.hubs[hub_id]
+            self._discovery_schedule.pop(hub_id, None)
             
             logger.info(f"Removed IoT hub: {hub_id}")
             return True
@@ -173,29 +207,96 @@ class IoTHubManager:
         """Background task for device discovery."""
         while self._running:
             try:
-                # Discover devices from all hubs
-                for hub_id, hub in self.hubs.items():
-                    if hub.is_connected():
-                        try:
-                            devices = await hub.discover_devices()
-                            for device in devices:
-                                if device.device_id not in self.devices:
-                                    self.devices[device.device_id] = device
-                                    await self._notify_callbacks('device_discovered', device)
-                                else:
-                                    # Update existing device
-                                    old_device = self.devices[device.device_id]
-                                    self.devices[device.device_id] = device
-                                    if old_device.state != device.state:
-                                        await self._notify_callbacks('device_state_changed', device)
-                        except Exception as e:
-                            logger.error(f"Error discovering devices from hub {hub_id}: {e}")
-                            
+                now = time.monotonic()
+                due = [
+                    hub_id for hub_id, hub in self.hubs.items()
+                    if hub.is_connected() and self._hub_schedule(hub_id)['next_run'] <= now
+                ]
+                if due:
+                    # Hubs are independent; a slow one must not hold up the rest
+                    await asyncio.gather(*(self._discover_hub(hub_id) for hub_id in due))
             except Exception as e:
                 logger.error(f"Error in device discovery loop: {e}")
-                
-            await asyncio.sleep(300)  # Discover every 5 minutes
             
+            # Sleep until the next hub is due
+            next_runs = [self._hub_schedule(hub_id)['next_run'] for hub_id in self.hubs]
+            delay = min(next_runs) - time.monotonic() if next_runs else self.discovery_interval
+            await asyncio.sleep(min(max(delay, 1.0), self.discovery_interval))
+    
+    def _hub_schedule(self, hub_id: str) -> Dict[str, Any]:
+        schedule = self._discovery_schedule.get(hub_id)
+        if schedule is None:
+            schedule = {
+                'interval': self.discovery_interval,
+                'next_run': 0.0,
+                'last_duration': None,
+                'consecutive_failures': 0
+            }
+            self._discovery_schedule[hub_id] = schedule
+        return schedule
+    
+    async def _discover_hub(self, hub_id: str) -> Optional[Dict[str, Any]]:
+        """Run one discovery cycle for a hub and reschedule it."""
+        hub = self.hubs.get(hub_id)
+        if hub is None:
+            return None
+        schedule = self._hub_schedule(hub_id)
+        started = time.monotonic()
+        changes = None
+        try:
+            devices = await asyncio.wait_for(hub.discover_devices(), timeout=self.discovery_timeout)
+            changes = self._reconcile_hub_devices(hub_id, devices)
+            schedule['consecutive_failures'] = 0
+            if changes['added'] or changes['updated'] or changes['removed']:
+                schedule['interval'] = max(self.min_discovery_interval, schedule['interval'] / 2)
+                await self._notify_callbacks('devices_changed', changes)
+            else:
+                schedule['interval'] = min(self.max_discovery_interval, schedule['interval'] * 1.5)
+        except asyncio.TimeoutError:
+            schedule['consecutive_failures'] += 1
+            schedule['interval'] = min(self.max_discovery_interval, schedule['interval'] * 2)
+            logger.warning(f"Device discovery timed out for hub {hub_id} after {self.discovery_timeout}s")
+        except Exception as e:
+            schedule['consecutive_failures'] += 1
+            schedule['interval'] = min(self.max_discovery_interval, schedule['interval'] * 2)
+            logger.error(f"Error discovering devices from hub {hub_id}: {e}")
+        finally:
+            schedule['last_duration'] = time.monotonic() - started
+            schedule['next_run'] = time.monotonic() + schedule['interval']
+        return changes
+    
+    def _reconcile_hub_devices(self, hub_id: str, devices: List[IoTDevice]) -> Dict[str, Any]:
+        """Apply a hub's discovery result and return what changed."""
+        added: List[IoTDevice] = []
+        updated: List[Dict[str, Any]] = []
+        seen = set()
+        
+        for device in devices:
+            seen.add(device.device_id)
+            old_device = self.devices.get(device.device_id)
+            self.devices[device.device_id] = device
+            if old_device is None:
+                added.append(device)
+                continue
+            state_changes = diff_state(old_device.state or {}, device.state or {})
+            if state_changes:
+                updated.append({'device': device, 'changes': state_changes})
+        
+        # Hubs report failures as an empty list, so only a non-empty result can retire devices
+        removed: List[IoTDevice] = []
+        if devices:
+            for device_id, device in list(self.devices.items()):
+                if device.hub_id == hub_id and device_id not in seen:
+                    removed.append(self.devices.pop(device_id))
+        
+        return {
+            'hub_id': hub_id,
+            'added': added,
+            'updated': updated,
+            'removed': removed,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+    
     async def _event_processing_loop(self):
         """Background task for event processing."""
         while self._running:
@@ -259,6 +360,63 @@ class IoTHubManager:
             logger.error(f"Error setting device state: {e}")
             return False
             
+    async def set_device_states_bulk(self, states: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Set the state of many devices at once.
+        
+        Commands are grouped by hub and each hub handles its group through
+        ``set_device_states_bulk`` (a native group call where the hub has one,
+        bounded fan-out otherwise); hubs run concurrently. Local state is
+        updated in one pass and reported as a single ``devices_changed``
+        event. Returns ``{device_id: {"success": bool, "error"?: str}}``.
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        by_hub: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for device_id, state in states.items():
+            device = self.devices.get(device_id)
+            if not device:
+                results[device_id] = {"success": False, "error": "Device not found"}
+            elif device.hub_id not in self.hubs:
+                results[device_id] = {"success": False, "error": "Hub not found"}
+            else:
+                by_hub.setdefault(device.hub_id, {})[device_id] = state
+                
+        async def _run(hub_id: str, hub_states: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+            try:
+                return await self.hubs[hub_id].set_device_states_bulk(hub_states)
+            except Exception as e:
+                logger.error(f"Error setting device states on hub {hub_id}: {e}")
+                return {device_id: False for device_id in hub_states}
+                
+        hub_ids = list(by_hub)
+        hub_results = await asyncio.gather(*(_run(hub_id, by_hub[hub_id]) for hub_id in hub_ids))
+        
+        updated = []
+        now = datetime.utcnow()
+        for hub_id, outcome in zip(hub_ids, hub_results):
+            for device_id, state in by_hub[hub_id].items():
+                if not outcome.get(device_id):
+                    results[device_id] = {"success": False, "error": "Hub rejected command"}
+                    continue
+                results[device_id] = {"success": True}
+                device = self.devices[device_id]
+                old_state = dict(device.state)
+                device.state.update(state)
+                device.updated_at = now
+                changes = diff_state(old_state, device.state)
+                if changes:
+                    updated.append({'device': device, 'changes': changes})
+                    
+        if updated:
+            await self._notify_callbacks('devices_changed', {
+                'hub_id': None,
+                'added': [],
+                'updated': updated,
+                'removed': [],
+                'timestamp': now.isoformat()
+            })
+        return results
+            
     async def get_hub_status(self) -> Dict[str, Any]:
         """Get status of all hubs."""
         status = {}
@@ -286,6 +444,14 @@ class IoTHubManager:
             'total_devices': total_devices,
             'device_types': device_types,
             'hub_devices': hub_devices,
+            'discovery': {
+                hub_id: {
+                    'interval': schedule['interval'],
+                    'last_duration': schedule['last_duration'],
+                    'consecutive_failures': schedule['consecutive_failures']
+                }
+                for hub_id, schedule in self._discovery_schedule.items()
+            },
             'running': self._running
         }
         
@@ -377,12 +543,9 @@ class IoTHubManager:
         return await self.get_manager_statistics()
     
     async def start_discovery(self):
-        """Start device discovery across all hubs."""
-        for hub in self.hubs.values():
-            try:
-                await hub.discover_devices()
-            except Exception as e:
-                logger.error(f"Error starting discovery for hub: {e}")
+        """Run device discovery across all connected hubs now."""
+        connected = [hub_id for hub_id, hub in self.hubs.items() if hub.is_connected()]
+        await asyncio.gather(*(self._discover_hub(hub_id) for hub_id in connected))
     
     async def get_recent_events(self) -> List[Dict[str, Any]]:
         """Get recent events from all hubs."""
@@ -0,0 +1,174 @@
+"""
+Tests for hub discovery reconciliation in the IoT hub manager.
+"""
+
+import asyncio
+
+from .hubs.base import DeviceType, IoTDevice
+from .manager import IoTHubManager, diff_state
+
+
+def _device(device_id, hub_id="hub1", **state):
+    return IoTDevice(
+        device_id=device_id, name=device_id, device_type=DeviceType.LIGHT, hub_id=hub_id,
+        hub_name=hub_id, capabilities=[], attributes={}, state=state
+    )
+
+
+def test_diff_state_reports_changed_added_and_dropped_keys():
+    assert diff_state({"on": True}, {"on": True}) == {}
+    assert diff_state({"on": True, "level": 5, "color": None}, {"on": False, "mode": "eco"}) == {
+        "on": {"old": True, "new": False},
+        "level": {"old": 5, "new": None},
+        "color": {"old": None, "new": None},
+        "mode": {"old": None, "new": "eco"},
+    }
+
+
+def test_reconcile_reports_added_updated_and_removed_devices():
+    manager = IoTHubManager()
+    manager.devices = {
+        "kept": _device("kept", on=True),
+        "changed": _device("changed", on=False),
+        "gone": _device("gone"),
+        "other": _device("other", hub_id="hub2"),
+    }
+    changes = manager._reconcile_hub_devices(
+        "hub1", [_device("kept", on=True), _device("changed", on=True), _device("new")]
+    )
+    assert [d.device_id for d in changes["added"]] == ["new"]
+    assert [(u["device"].device_id, u["changes"]) for u in changes["updated"]] == [
+        ("changed", {"on": {"old": False, "new": True}})
+    ]
+    assert [d.device_id for d in changes["removed"]] == ["gone"]
+    assert sorted(manager.devices) == ["changed", "kept", "new", "other"]
+
+
+def test_reconcile_keeps_devices_when_hub_returns_nothing():
+    manager = IoTHubManager()
+    manager.devices = {"a": _device("a"), "b": _device("b")}
+    changes = manager._reconcile_hub_devices("hub1", [])
+    assert changes["added"] == [] and changes["updated"] == [] and changes["removed"] == []
+    assert sorted(manager.devices) == ["a", "b"]
+
+
+class _Hub:
+    def __init__(self, connected):
+        self.connected = connected
+        self.discovered = 0
+
+    def is_connected(self):
+        return self.connected
+
+    async def discover_devices(self):
+        self.discovered += 1
+        return []
+
+
+def test_start_discovery_skips_disconnected_hubs():
+    manager = IoTHubManager()
+    manager.hubs = {"up": _Hub(True), "down": _Hub(False)}
+    asyncio.run(manager.start_discovery())
+    assert manager.hubs["up"].discovered == 1
+    assert manager.hubs["down"].discovered == 0
+
+
+class _BulkHub:
+    def __init__(self, accept=None, error=None):
+        self.accept = accept
+        self.error = error
+        self.calls = []
+
+    async def set_device_states_bulk(self, states):
+        self.calls.append(states)
+        if self.error:
+            raise self.error
+        return {device_id: self.accept is None or device_id in self.accept for device_id in states}
+
+
+def test_bulk_set_reports_per_device_errors():
+    manager = IoTHubManager()
+    manager.hubs = {"hub1": _BulkHub(accept={"a"}), "hub2": _BulkHub(error=RuntimeError("offline"))}
+    manager.devices = {
+        "a": _device("a"),
+        "b": _device("b"),
+        "c": _device("c", hub_id="hub2"),
+        "orphan": _device("orphan", hub_id="gone"),
+    }
+    results = asyncio.run(manager.set_device_states_bulk({
+        "a": {"on": True}, "b": {"on": True}, "c": {"on": True}, "orphan": {"on": True}, "missing": {"on": True},
+    }))
+    assert results == {
+        "a": {"success": True},
+        "b": {"success": False, "error": "Hub rejected command"},
+        "c": {"success": False, "error": "Hub rejected command"},
+        "orphan": {"success": False, "error": "Hub not found"},
+        "missing": {"success": False, "error": "Device not found"},
+    }
+    assert manager.hubs["hub1"].calls == [{"a": {"on": True}, "b": {"on": True}}]
+    assert manager.devices["a"].state == {"on": True}
+    assert manager.devices["b"].state == {}
+
+
+def test_bulk_set_emits_one_event_with_changed_devices_only():
+    manager = IoTHubManager()
+    manager.hubs = {"hub1": _BulkHub(), "hub2": _BulkHub()}
+    manager.devices = {
+        "same": _device("same", on=True),
+        "flip": _device("flip", on=False),
+        "other": _device("other", hub_id="hub2", level=1),
+    }
+    events = []
+
+    async def record(event_type, data):
+        events.append((event_type, data))
+
+    manager.add_callback(record)
+    asyncio.run(manager.set_device_states_bulk({
+        "same": {"on": True}, "flip": {"on": True}, "other": {"level": 3},
+    }))
+    assert [event_type for event_type, _ in events] == ["devices_changed"]
+    updated = events[0][1]["updated"]
+    assert sorted((u["device"].device_id, tuple(u["changes"])) for u in updated) == [
+        ("flip", ("on",)), ("other", ("level",))
+    ]
+
+
+class _Response:
+    def __init__(self, status):
+        self.status = status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _Session:
+    def __init__(self, failing_state):
+        self.failing_state = failing_state
+        self.posts = []
+
+    def post(self, url, headers=None, json=None):
+        self.posts.append(json)
+        state = {k: v for k, v in json.items() if k != "entity_id"}
+        return _Response(500 if state == self.failing_state else 200)
+
+
+def test_home_assistant_bulk_set_makes_one_call_per_distinct_state():
+    from .hubs.base import HubConfig
+    from .hubs.homeassistant import HomeAssistantHub
+
+    hub = HomeAssistantHub(HubConfig(hub_id="ha", hub_type="homeassistant", name="HA", host="ha.local", port=8123))
+    hub.session = _Session(failing_state={"brightness": 10})
+    results = asyncio.run(hub.set_device_states_bulk({
+        "light.a": {"brightness": 200},
+        "light.b": {"brightness": 10},
+        "light.c": {"brightness": 200},
+        "light.d": {"brightness": 10},
+    }))
+    assert sorted((tuple(p["entity_id"]), p["brightness"]) for p in hub.session.posts) == [
+        (("light.a", "light.c"), 200), (("light.b", "light.d"), 10)
+    ]
+    assert results == {"light.a": True, "light.b": False, "light.c": True, "light.d": False}
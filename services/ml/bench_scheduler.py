@@ -0,0 +1,83 @@
+"""Inference scheduler throughput and latency at several concurrency levels.
+
+Runs closed-loop clients against an MLOrchestrator with one loaded model (the
+simulated classical inference takes ~100ms per call, batched or not) and
+reports requests/sec with p50/p99 end-to-end latency, once with micro-batching
+and once with batches of one for comparison.
+Usage: python -m services.ml.bench_scheduler --concurrency 1,8,32,128 --requests 256
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from services.ml.orchestrator import InferencePriority, MLOrchestrator, ModelInfo, ModelType
+
+PRIORITIES = [InferencePriority.NORMAL] * 6 + [InferencePriority.HIGH] * 3 + [InferencePriority.LOW]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def build(max_batch_size: int, max_wait_ms: float) -> MLOrchestrator:
+    orchestrator = MLOrchestrator(max_batch_size=max_batch_size, max_batch_wait_ms=max_wait_ms)
+    orchestrator._quantum_enabled = False
+    await orchestrator.start()
+    now = datetime.utcnow()
+    await orchestrator.register_model(ModelInfo(
+        model_id="bench", name="bench", model_type=ModelType.CLASSIFICATION, version="1",
+        description="", input_schema={}, output_schema={}, performance_metrics={},
+        quantum_capabilities=[], quantum_resistant=False, quantum_qubits_required=None,
+        created_at=now, updated_at=now,
+    ))
+    await orchestrator.load_model("bench")
+    return orchestrator
+
+
+async def run_level(orchestrator: MLOrchestrator, concurrency: int, requests: int):
+    latencies = []
+    remaining = [requests]
+
+    async def client(index: int):
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            priority = PRIORITIES[(index + remaining[0]) % len(PRIORITIES)]
+            started = time.perf_counter()
+            request_id = await orchestrator.run_inference("bench", {"x": 1.0}, priority=priority)
+            await orchestrator.wait_for_inference_result(request_id, timeout=60)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99)
+
+
+async def main(levels, requests, max_batch_size, max_wait_ms):
+    for label, size, wait in (("batched", max_batch_size, max_wait_ms), ("unbatched", 1, 0.0)):
+        orchestrator = await build(size, wait)
+        try:
+            for concurrency in levels:
+                rps, p50, p99 = await run_level(orchestrator, concurrency, requests)
+                print(f"{label:9s} concurrency={concurrency:4d}  {rps:8.1f} req/s  p50={p50:7.1f}ms  p99={p99:7.1f}ms")
+            stats = await orchestrator.get_orchestrator_statistics()
+            print(f"{label:9s} batch sizes: {stats['batch_size_distribution']}")
+        finally:
+            await orchestrator.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="1,8,32,128")
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main([int(c) for c in args.concurrency.split(",")], args.requests, args.max_batch_size, args.max_wait_ms))
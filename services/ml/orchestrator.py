@@ -5,13 +5,16 @@ Includes quantum computing capabilities and quantum-resistant algorithms.
 """
 
 import asyncio
+import heapq
+import itertools
 import logging
-from typing import Dict, List, Any, Optional, Callable
+import time
+from typing import Dict, List, Any, Optional, Callable, Sequence, Tuple
 from datetime import datetime, timedelta
 import json
 import uuid
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import numpy as np
 
 from shared.config.settings import settings
@@ -55,6 +58,18 @@ class InferencePriority(Enum):
     QUANTUM_CRITICAL = "quantum_critical"
 
 
+# Scheduling order, most urgent first
+PRIORITY_RANK = {
+    InferencePriority.QUANTUM_CRITICAL: 0,
+    InferencePriority.CRITICAL: 1,
+    InferencePriority.HIGH: 2,
+    InferencePriority.NORMAL: 3,
+    InferencePriority.LOW: 4
+}
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
 class QuantumCapability(Enum):
     """Quantum computing capabilities."""
     QUANTUM_RESISTANT = "quantum_resistant"
@@ -118,15 +133,88 @@ class InferenceResult:
             self.created_at = datetime.utcnow()
 
 
+@dataclass(order=True)
+class _QueueEntry:
+    """Queued inference request, ordered by priority then arrival."""
+    rank: int
+    sequence: int
+    request: InferenceRequest = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    taken: bool = field(default=False, compare=False)
+
+
+class LatencyHistogram:
+    """Bucketed latency histogram in milliseconds."""
+    
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is overflow
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        
+    def observe(self, value_ms: float):
+        for i, bound in enumerate(self.buckets):
+            if value_ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total += value_ms
+        self.max = max(self.max, value_ms)
+        
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+        
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'p50_ms': self.quantile(0.5),
+            'p99_ms': self.quantile(0.99),
+            'max_ms': self.max,
+            'buckets': {
+                **{str(bound): count for bound, count in zip(self.buckets, self.counts)},
+                '+Inf': self.counts[-1]
+            }
+        }
+
+
 class MLOrchestrator:
     """Manages ML models and distributed inference with quantum capabilities."""
     
-    def __init__(self):
+    def __init__(self, max_batch_size: int = 16, max_batch_wait_ms: float = 5.0):
         self._running = False
         self._session_factory = get_session_factory(settings.database_url)
         self._models: Dict[str, ModelInfo] = {}
         self._model_instances: Dict[str, Any] = {}
-        self._inference_queue: List[InferenceRequest] = []
+        # Scheduler: a global heap picks the most urgent request; per-batch-key heaps
+        # let a worker pull more requests for the same model into one micro-batch.
+        # Entries sit in both heaps and are skipped lazily once taken.
+        self._inference_queue: List[_QueueEntry] = []
+        self._batch_queues: Dict[Tuple[str, bool, Optional[str]], List[_QueueEntry]] = {}
+        self._queue_sequence = itertools.count()
+        self._queue_condition = asyncio.Condition()
+        self._queue_depth: Dict[InferencePriority, int] = {priority: 0 for priority in InferencePriority}
+        self._max_batch_size = max_batch_size
+        self._max_batch_wait = max_batch_wait_ms / 1000
+        self._batch_limits: Dict[str, Tuple[int, float]] = {}  # model_id -> (max size, max wait seconds)
+        self._result_waiters: Dict[str, asyncio.Future] = {}
+        
+        # Scheduler metrics
+        self._queue_wait_histograms = {priority: LatencyHistogram() for priority in InferencePriority}
+        self._latency_histograms = {priority: LatencyHistogram() for priority in InferencePriority}
+        self._batch_size_counts: Dict[int, int] = {}
         self._inference_results: Dict[str, InferenceResult] = {}
         self._callbacks: Dict[str, List[Callable]] = {
             'model_loaded': [],
@@ -329,6 +417,30 @@ class MLOrchestrator:
         """Get inference result by request ID."""
         return self._inference_results.get(request_id)
         
+    async def wait_for_inference_result(self, request_id: str,
+                                        timeout: Optional[float] = None) -> Optional[InferenceResult]:
+        """Wait until a submitted request completes; None if it failed."""
+        if request_id in self._inference_results:
+            return self._inference_results[request_id]
+        waiter = self._result_waiters.get(request_id)
+        if waiter is None:
+            waiter = self._result_waiters[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        finally:
+            if waiter.done():
+                self._result_waiters.pop(request_id, None)
+                
+    def configure_batching(self, model_id: str, max_batch_size: Optional[int] = None,
+                           max_batch_wait_ms: Optional[float] = None):
+        """Override micro-batching limits for one model."""
+        size, wait = self._batch_limits.get(model_id, (self._max_batch_size, self._max_batch_wait))
+        if max_batch_size is not None:
+            size = max_batch_size
+        if max_batch_wait_ms is not None:
+            wait = max_batch_wait_ms / 1000
+        self._batch_limits[model_id] = (size, wait)
+        
     async def list_models(self) -> List[ModelInfo]:
         """List all registered models."""
         return list(self._models.values())
@@ -375,7 +487,7 @@ class MLOrchestrator:
         """Get orchestrator statistics."""
         total_models = len(self._models)
         loaded_models = len(self._model_instances)
-        queued_requests = len(self._inference_queue)
+        queued_requests = sum(self._queue_depth.values())
         completed_requests = len(self._inference_results)
         
         # Model type distribution
@@ -407,7 +519,17 @@ class MLOrchestrator:
             'status_distribution': status_counts,
             'quantum_capabilities_distribution': quantum_counts,
             'quantum_enabled': self._quantum_enabled,
-            'available_quantum_backends': len(self._quantum_backends)
+            'available_quantum_backends': len(self._quantum_backends),
+            'queue_depth_by_priority': {priority.value: depth for priority, depth in self._queue_depth.items()},
+            'queue_wait_ms': {
+                priority.value: histogram.to_dict()
+                for priority, histogram in self._queue_wait_histograms.items() if histogram.count
+            },
+            'inference_latency_ms': {
+                priority.value: histogram.to_dict()
+                for priority, histogram in self._latency_histograms.items() if histogram.count
+            },
+            'batch_size_distribution': dict(sorted(self._batch_size_counts.items()))
         }
         
     def add_callback(self, event: str, callback: Callable):
@@ -451,48 +573,88 @@ class MLOrchestrator:
             logger.error(f"Error loading model instance: {e}")
             return None
             
+    @staticmethod
+    def _batch_key(request: InferenceRequest) -> Tuple[str, bool, Optional[str]]:
+        """Requests batch together only for the same model and execution mode."""
+        return (request.model_id, request.use_quantum, request.quantum_backend if request.use_quantum else None)
+        
     async def _add_to_inference_queue(self, request: InferenceRequest):
         """Add request to inference queue with priority."""
-        # Priority-based insertion (higher priority first)
-        priority_order = {
-            InferencePriority.QUANTUM_CRITICAL: 0,
-            InferencePriority.CRITICAL: 1,
-            InferencePriority.HIGH: 2,
-            InferencePriority.NORMAL: 3,
-            InferencePriority.LOW: 4
-        }
+        entry = _QueueEntry(
+            rank=PRIORITY_RANK[request.priority],
+            sequence=next(self._queue_sequence),
+            request=request,
+            enqueued_at=time.perf_counter()
+        )
+        async with self._queue_condition:
+            heapq.heappush(self._inference_queue, entry)
+            heapq.heappush(self._batch_queues.setdefault(self._batch_key(request), []), entry)
+            self._queue_depth[request.priority] += 1
+            self._queue_condition.notify_all()
+            
+    def _take(self, entry: _QueueEntry, batch: List[_QueueEntry]):
+        entry.taken = True
+        self._queue_depth[entry.request.priority] -= 1
+        batch.append(entry)
         
-        insert_index = 0
-        for i, queued_request in enumerate(self._inference_queue):
-            if priority_order[request.priority] < priority_order[queued_request.priority]:
-                insert_index = i
-                break
-            insert_index = i + 1
+    @staticmethod
+    def _drop_taken(queue: List[_QueueEntry]):
+        """Pop entries already taken through the other heap off the top of this one."""
+        while queue and queue[0].taken:
+            heapq.heappop(queue)
+            
+    def _take_batch_key(self, key: Tuple[str, bool, Optional[str]], batch: List[_QueueEntry], limit: int):
+        """Move the most urgent queued requests for a batch key into the batch."""
+        queue = self._batch_queues.get(key)
+        if queue is None:
+            return
+        self._drop_taken(queue)
+        while queue and len(batch) < limit:
+            self._take(heapq.heappop(queue), batch)
+            self._drop_taken(queue)
+        if not queue:
+            del self._batch_queues[key]
+            
+    async def _next_batch(self) -> List[_QueueEntry]:
+        """Wait for work and collect a micro-batch led by the most urgent request."""
+        async with self._queue_condition:
+            await self._queue_condition.wait_for(lambda: sum(self._queue_depth.values()) > 0)
+            
+            self._drop_taken(self._inference_queue)
+            head = heapq.heappop(self._inference_queue)
+            batch: List[_QueueEntry] = []
+            self._take(head, batch)
+            
+            key = self._batch_key(head.request)
+            max_size, max_wait = self._batch_limits.get(
+                head.request.model_id, (self._max_batch_size, self._max_batch_wait)
+            )
+            self._take_batch_key(key, batch, max_size)
+            
+            # Hold a partial batch open briefly, except for critical work
+            deadline = head.enqueued_at + max_wait
+            if head.rank > PRIORITY_RANK[InferencePriority.CRITICAL]:
+                while len(batch) < max_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        await asyncio.wait_for(self._queue_condition.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    self._take_batch_key(key, batch, max_size)
+                    
+            self._drop_taken(self._inference_queue)
+            return batch
             
-        self._inference_queue.insert(insert_index, request)
-        
     async def _inference_worker(self, worker_id: str):
         """Worker process for handling inference requests."""
         logger.info(f"Inference worker {worker_id} started")
         
         while self._running:
             try:
-                if self._inference_queue:
-                    # Get next request
-                    request = self._inference_queue.pop(0)
-                    
-                    # Process inference
-                    result = await self._process_inference(request)
-                    
-                    if result:
-                        self._inference_results[request.request_id] = result
-                        await self._notify_callbacks('inference_completed', result)
-                    else:
-                        await self._notify_callbacks('inference_failed', request, error="Processing failed")
-                        
-                else:
-                    # No requests, wait a bit
-                    await asyncio.sleep(0.1)
+                batch = await self._next_batch()
+                await self._run_batch(batch, worker_id)
                     
             except asyncio.CancelledError:
                 break
@@ -502,20 +664,55 @@ class MLOrchestrator:
                 
         logger.info(f"Inference worker {worker_id} stopped")
         
-    async def _process_inference(self, request: InferenceRequest) -> Optional[InferenceResult]:
-        """Process an inference request."""
+    async def _run_batch(self, batch: List[_QueueEntry], worker_id: str):
+        """Run one micro-batch and publish each request's outcome."""
+        started = time.perf_counter()
+        live: List[_QueueEntry] = []
+        for entry in batch:
+            request = entry.request
+            waited = started - entry.enqueued_at
+            self._queue_wait_histograms[request.priority].observe(waited * 1000)
+            if request.timeout and waited > request.timeout:
+                await self._finish_request(request, None, error="Request timed out in queue")
+            else:
+                live.append(entry)
+        if not live:
+            return
+            
+        self._batch_size_counts[len(live)] = self._batch_size_counts.get(len(live), 0) + 1
+        results = await self._process_inference([entry.request for entry in live], worker_id)
+        
+        finished = time.perf_counter()
+        for entry, result in zip(live, results):
+            self._latency_histograms[entry.request.priority].observe((finished - entry.enqueued_at) * 1000)
+            await self._finish_request(entry.request, result, error="Processing failed")
+            
+    async def _finish_request(self, request: InferenceRequest, result: Optional[InferenceResult], error: str):
+        if result:
+            self._inference_results[request.request_id] = result
+            await self._notify_callbacks('inference_completed', result)
+        else:
+            await self._notify_callbacks('inference_failed', request, error=error)
+        waiter = self._result_waiters.pop(request.request_id, None)
+        if waiter and not waiter.done():
+            waiter.set_result(result)
+            
+    async def _process_inference(self, requests: List[InferenceRequest],
+                                 worker_id: str) -> List[Optional[InferenceResult]]:
+        """Process a micro-batch of inference requests for one model in a single call."""
         try:
             start_time = datetime.utcnow()
+            model_id = requests[0].model_id
             
             # Get model instance
-            model_instance = self._model_instances.get(request.model_id)
+            model_instance = self._model_instances.get(model_id)
             if not model_instance:
-                logger.error(f"Model instance not found for {request.model_id}")
-                return None
+                logger.error(f"Model instance not found for {model_id}")
+                return [None] * len(requests)
                 
-            # Determine if quantum processing should be used
-            use_quantum = request.use_quantum and self._quantum_enabled
-            quantum_backend = request.quantum_backend if use_quantum else None
+            # Determine if quantum processing should be used (uniform within a batch)
+            use_quantum = requests[0].use_quantum and self._quantum_enabled
+            quantum_backend = requests[0].quantum_backend if use_quantum else None
             quantum_qubits_used = None
             
             if use_quantum:
@@ -527,36 +724,39 @@ class MLOrchestrator:
                 # Simulate classical processing
                 await asyncio.sleep(0.1)
                 
-            # Generate result
+            # Generate results
             processing_time = (datetime.utcnow() - start_time).total_seconds()
             
-            result = InferenceResult(
-                request_id=request.request_id,
-                model_id=request.model_id,
-                output_data={
-                    'prediction': 'mock_result',
-                    'confidence': 0.95,
-                    'features_used': list(request.input_data.keys()),
-                    'quantum_enhanced': use_quantum
-                },
-                confidence=0.95,
-                processing_time=processing_time,
-                quantum_used=use_quantum,
-                quantum_backend=quantum_backend,
-                quantum_qubits_used=quantum_qubits_used,
-                metadata={
-                    'worker_id': worker_id,
-                    'model_version': self._models[request.model_id].version,
-                    'quantum_capabilities': model_instance.get('quantum_capabilities', [])
-                }
-            )
-            
-            logger.debug(f"Processed inference request: {request.request_id}")
-            return result
+            results = []
+            for request in requests:
+                results.append(InferenceResult(
+                    request_id=request.request_id,
+                    model_id=model_id,
+                    output_data={
+                        'prediction': 'mock_result',
+                        'confidence': 0.95,
+                        'features_used': list(request.input_data.keys()),
+                        'quantum_enhanced': use_quantum
+                    },
+                    confidence=0.95,
+                    processing_time=processing_time,
+                    quantum_used=use_quantum,
+                    quantum_backend=quantum_backend,
+                    quantum_qubits_used=quantum_qubits_used,
+                    metadata={
+                        'worker_id': worker_id,
+                        'batch_size': len(requests),
+                        'model_version': self._models[model_id].version,
+                        'quantum_capabilities': model_instance.get('quantum_capabilities', [])
+                    }
+                ))
+                
+            logger.debug(f"Processed {len(requests)} inference requests for model {model_id}")
+            return results
             
         except Exception as e:
-            logger.error(f"Error processing inference request {request.request_id}: {e}")
-            return None
+            logger.error(f"Error processing inference batch for model {requests[0].model_id}: {e}")
+            return [None] * len(requests)
             
     async def _initialize_quantum_capabilities(self):
         """Initialize quantum computing capabilities."""
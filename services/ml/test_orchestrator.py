@@ -0,0 +1,73 @@
+"""
+Tests for the ML orchestrator's inference scheduler.
+"""
+
+import asyncio
+import time
+import uuid
+
+from .orchestrator import InferencePriority, InferenceRequest, MLOrchestrator
+
+
+def _request(model_id="m1", priority=InferencePriority.NORMAL):
+    return InferenceRequest(
+        request_id=str(uuid.uuid4()), model_id=model_id, input_data={"x": 1.0}, priority=priority
+    )
+
+
+async def _enqueue(orchestrator, *requests):
+    for request in requests:
+        await orchestrator._add_to_inference_queue(request)
+
+
+def test_next_batch_leads_with_priority_and_keeps_arrival_order():
+    orchestrator = MLOrchestrator(max_batch_size=8, max_batch_wait_ms=0)
+    low = _request("m1", InferencePriority.LOW)
+    first = _request("m1")
+    other = _request("m2", InferencePriority.HIGH)
+    second = _request("m1")
+
+    async def run():
+        await _enqueue(orchestrator, low, first, other, second)
+        return [await orchestrator._next_batch() for _ in range(2)]
+
+    batches = asyncio.run(run())
+    assert [[e.request for e in batch] for batch in batches] == [[other], [first, second, low]]
+    assert sum(orchestrator._queue_depth.values()) == 0
+
+
+def test_partial_batch_waits_for_more_work_unless_critical():
+    orchestrator = MLOrchestrator(max_batch_size=4, max_batch_wait_ms=50)
+    early, late = _request(), _request()
+    critical = _request(priority=InferencePriority.CRITICAL)
+
+    async def run():
+        await _enqueue(orchestrator, early)
+        batch = asyncio.create_task(orchestrator._next_batch())
+        await asyncio.sleep(0.01)
+        await _enqueue(orchestrator, late)
+        waited = await batch
+
+        await _enqueue(orchestrator, critical)
+        started = time.perf_counter()
+        immediate = await orchestrator._next_batch()
+        elapsed = time.perf_counter() - started
+        return waited, immediate, elapsed
+
+    waited, immediate, elapsed = asyncio.run(run())
+    assert [e.request for e in waited] == [early, late]
+    assert [e.request for e in immediate] == [critical]
+    assert elapsed < 0.04
+
+
+def test_taken_entries_do_not_pile_up_in_the_heaps():
+    orchestrator = MLOrchestrator(max_batch_size=1, max_batch_wait_ms=0)
+
+    async def run():
+        await _enqueue(orchestrator, *(_request(f"m{i % 3}") for i in range(1000)))
+        return [await orchestrator._next_batch() for _ in range(1000)]
+
+    batches = asyncio.run(run())
+    assert all(len(batch) == 1 for batch in batches)
+    assert orchestrator._batch_queues == {}
+    assert orchestrator._inference_queue == []
@@ -6,11 +6,13 @@ FastAPI endpoints for the Tethral Suggestion Engine.
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from .engine import SuggestionEngine
@@ -69,6 +71,50 @@ async def get_user_id(request: Request) -> str:
     return user_id
 
 
+def _build_request(request_data: SuggestionRequestModel, user_id: str) -> SuggestionRequest:
+    """Create the engine request from the API payload."""
+    return SuggestionRequest(
+        user_id=user_id,
+        session_id=request_data.session_id,
+        context_hints=request_data.context_hints,
+        preferences=request_data.preferences,
+        discovery_width=request_data.discovery_width,
+        max_recommendations=request_data.max_recommendations,
+        include_what_if=request_data.include_what_if,
+        enable_llm_fallback=request_data.enable_llm_fallback
+    )
+
+
+def _response_to_dict(response: SuggestionResponse) -> Dict[str, Any]:
+    """Convert an engine response to the API response format."""
+    return {
+        "request_id": response.request_id,
+        "status": getattr(response.status, "value", response.status),
+        "recommendations": [
+            {
+                "recommendation_id": rec.recommendation_id,
+                "title": rec.title,
+                "description": rec.description,
+                "rationale": rec.rationale,
+                "category": rec.category,
+                "confidence": rec.confidence,
+                "privacy_badge": rec.privacy_badge.value,
+                "safety_badge": rec.safety_badge.value,
+                "effort_rating": rec.effort_rating.value,
+                "tunable_controls": rec.tunable_controls,
+                "storyboard_preview": rec.storyboard_preview
+            }
+            for rec in response.recommendations
+        ],
+        "what_if_items": response.what_if_items,
+        "processing_time_ms": response.processing_time_ms,
+        "errors": response.errors,
+        "warnings": response.warnings,
+        "llm_generated": response.llm_generated,
+        "cached": response.cached
+    }
+
+
 @router.post("/generate", response_model=Dict[str, Any])
 async def generate_suggestions(
     request_data: SuggestionRequestModel,
@@ -86,55 +132,77 @@ async def generate_suggestions(
     5. Handle LLM fallback if needed
     """
     try:
-        # Create suggestion request
-        request = SuggestionRequest(
-            user_id=user_id,
-            session_id=request_data.session_id,
-            context_hints=request_data.context_hints,
-            preferences=request_data.preferences,
-            discovery_width=request_data.discovery_width,
-            max_recommendations=request_data.max_recommendations,
-            include_what_if=request_data.include_what_if,
-            enable_llm_fallback=request_data.enable_llm_fallback
-        )
-        
         # Generate suggestions
-        response = await engine.generate_suggestions(request)
+        response = await engine.generate_suggestions(_build_request(request_data, user_id))
         
         # Convert to API response format
-        api_response = {
-            "request_id": response.request_id,
-            "status": response.status,
-            "recommendations": [
-                {
-                    "recommendation_id": rec.recommendation_id,
-                    "title": rec.title,
-                    "description": rec.description,
-                    "rationale": rec.rationale,
-                    "category": rec.category,
-                    "confidence": rec.confidence,
-                    "privacy_badge": rec.privacy_badge.value,
-                    "safety_badge": rec.safety_badge.value,
-                    "effort_rating": rec.effort_rating.value,
-                    "tunable_controls": rec.tunable_controls,
-                    "storyboard_preview": rec.storyboard_preview
-                }
-                for rec in response.recommendations
-            ],
-            "what_if_items": response.what_if_items,
-            "processing_time_ms": response.processing_time_ms,
-            "errors": response.errors,
-            "warnings": response.warnings,
-            "llm_generated": response.llm_generated
-        }
-        
-        return api_response
+        return _response_to_dict(response)
         
     except Exception as e:
         logger.error(f"Error generating suggestions: {e}")
         raise HTTPException(status_code=500, detail=f"Error generating suggestions: {str(e)}")
 
 
+@router.post("/stream")
+async def stream_suggestions(
+    request_data: SuggestionRequestModel,
+    engine: SuggestionEngine = Depends(get_suggestion_engine),
+    user_id: str = Depends(get_user_id)
+):
+    """
+    Stream suggestions as server-sent events.
+    
+    The first ``partial`` event carries cards ranked from one- and two-item
+    combinations; later ``partial`` events refine the ranking as larger
+    combinations are evaluated, and the stream ends with a ``completed``
+    (or ``failed``) event matching the /generate response.
+    """
+    request = _build_request(request_data, user_id)
+    
+    async def events():
+        try:
+            async for response in engine.stream_suggestions(request):
+                payload = _response_to_dict(response)
+                yield f"event: {payload['status']}\ndata: {json.dumps(payload, default=str)}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming suggestions: {e}")
+            payload = {"status": "failed", "errors": [f"Error streaming suggestions: {str(e)}"]}
+            yield f"event: failed\ndata: {json.dumps(payload)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def suggestions_websocket(websocket: WebSocket):
+    """
+    Stream suggestions over a WebSocket.
+    
+    Each message received is a suggestion request (same body as /generate);
+    every partial and final response is sent back as a JSON message.
+    """
+    engine = suggestion_engine
+    user_id = websocket.headers.get("X-User-ID") or websocket.query_params.get("user_id")
+    if engine is None or not user_id:
+        await websocket.close(code=1008)
+        return
+    
+    await websocket.accept()
+    try:
+        while True:
+            request_data = SuggestionRequestModel(**await websocket.receive_json())
+            async for response in engine.stream_suggestions(_build_request(request_data, user_id)):
+                await websocket.send_text(json.dumps(_response_to_dict(response), default=str))
+    except WebSocketDisconnect:
+        logger.info(f"Suggestion WebSocket disconnected for user {user_id}")
+    except Exception as e:
+        logger.error(f"Suggestion WebSocket error: {e}")
+        await websocket.close(code=1011)
+
+
 @router.post("/feedback")
 async def record_feedback(
     feedback_data: FeedbackRequestModel,
@@ -244,7 +312,8 @@ async def get_engine_stats(
             },
             "llm_bridge": llm_stats,
             "user_overlays": len(engine._user_overlays),
-            "active_requests": len(engine._active_requests)
+            "active_requests": len(engine._active_requests),
+            "result_cache": engine.result_cache.get_statistics() if engine.result_cache else None
         }
         
     except Exception as e:
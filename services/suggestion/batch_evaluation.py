@@ -0,0 +1,299 @@
+"""
+Batch Evaluation
+Scores a whole candidate set at once with NumPy feature matrices.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; CombinationEvaluator falls back to per-candidate scoring
+    np = None
+
+from .models import (
+    CombinationCandidate, ContextSnapshot, UserOverlay, CapabilityType,
+    PrivacyLevel, SafetyLevel, EffortLevel
+)
+from .scoring import (
+    CAPABILITY_UTILITIES, DEFAULT_UTILITY, PRIVACY_WEIGHTS, SAFETY_WEIGHTS,
+    SAFETY_PENALTY, CONTEXT_PENALTY, UNREACHABLE_PENALTY, UNAVAILABLE_PENALTY, ROOM_CONFLICT_PENALTY,
+    CONTEXT_FIT_WEIGHT, UTILITY_WEIGHT, PREFERENCE_WEIGHT, NOVELTY_WEIGHT,
+    DEVICE_AFFINITY_SCALE, ROOM_AFFINITY_SCALE, PREFERRED_CAPABILITY_BONUS,
+    QUIET_HOURS_QUIET_BONUS, QUIET_HOURS_AUDIO_PENALTY, WEEKEND_LIGHTING_BONUS, WEEKEND_AUDIO_BONUS,
+    BAD_WEATHER_CONDITIONS, BAD_WEATHER_LIGHTING_BONUS, MEETING_QUIET_BONUS,
+    SAFETY_UTILITY_BONUS, ENERGY_UTILITY_BONUS,
+    NOVELTY_PER_CAPABILITY_TYPE, DEVICE_SERVICE_NOVELTY_BONUS, CROSS_ROOM_NOVELTY_BONUS,
+    VIDEO_RISK, SENSING_RISK, ACCESS_CONTROL_RISK, FRAGILE_ITEM_COUNT, FRAGILE_RISK, MAX_RISK_DEDUCTION,
+    SAFETY_RULE_CAPABILITIES, CONTEXT_RULE_CAPABILITIES
+)
+
+CAPABILITIES: List[CapabilityType] = list(CapabilityType)
+CAPABILITY_INDEX: Dict[CapabilityType, int] = {cap: i for i, cap in enumerate(CAPABILITIES)}
+# Padding positions point at this extra column
+PAD = len(CAPABILITIES)
+
+EFFORT_LEVELS = [EffortLevel.NONE, EffortLevel.LOW, EffortLevel.MEDIUM, EffortLevel.HIGH]
+PRIVACY_LEVELS = [PrivacyLevel.PUBLIC, PrivacyLevel.PERSONAL, PrivacyLevel.PRIVATE, PrivacyLevel.SENSITIVE]
+SAFETY_LEVELS = [SafetyLevel.SAFE, SafetyLevel.CAUTION, SafetyLevel.RESTRICTED]
+
+
+@dataclass
+class BatchScores:
+    """Per-candidate evaluation outputs, one array entry per input combination."""
+    feasible: Any
+    feasibility_score: Any
+    total_value: Any
+    context_fit: Any
+    novelty_score: Any
+    effort_level: Any  # index into EFFORT_LEVELS
+    privacy_level: Any  # index into PRIVACY_LEVELS
+    safety_level: Any  # index into SAFETY_LEVELS
+    missing: Dict[int, List[str]]  # row -> unreachable device ids, then unavailable service ids
+
+
+def _column_values(table: Dict[CapabilityType, Any], default: Any, pad: Any, dtype) -> Any:
+    return np.array([table.get(cap, default) for cap in CAPABILITIES] + [pad], dtype=dtype)
+
+
+def score_batch(
+    combinations: Sequence[CombinationCandidate],
+    context_snapshot: ContextSnapshot,
+    user_overlay: Optional[UserOverlay],
+    preferred_capabilities: Optional[Any],
+    safety_rule_types: Set[str],
+    context_rule_types: Set[str],
+) -> BatchScores:
+    """
+    Evaluate ``combinations`` in bulk.
+
+    Each candidate becomes a padded row of device and service indices into
+    small per-item tables; capability presence, room conflicts and all score
+    components are then whole-array operations. Sums are accumulated column
+    by column in device/service order, so every score is bit-for-bit what
+    ``CombinationEvaluator`` computes one candidate at a time.
+    """
+    if np is None:
+        raise RuntimeError("numpy is required for batch evaluation")
+
+    n = len(combinations)
+    rows = np.arange(n)
+
+    # --- encode ---------------------------------------------------------
+    device_slots: Dict[int, int] = {}
+    device_table: List[Any] = []
+    service_slots: Dict[int, int] = {}
+    service_table: List[Any] = []
+    rooms: Dict[str, int] = {}
+    dev_rows: List[int] = []
+    dev_cols: List[int] = []
+    dev_keys: List[int] = []
+    svc_rows: List[int] = []
+    svc_cols: List[int] = []
+    svc_keys: List[int] = []
+    for r, combination in enumerate(combinations):
+        for j, device in enumerate(combination.devices):
+            key = device_slots.get(id(device))
+            if key is None:
+                key = device_slots[id(device)] = len(device_table)
+                device_table.append(device)
+            dev_rows.append(r)
+            dev_cols.append(j)
+            dev_keys.append(key)
+        for j, service in enumerate(combination.services):
+            key = service_slots.get(id(service))
+            if key is None:
+                key = service_slots[id(service)] = len(service_table)
+                service_table.append(service)
+            svc_rows.append(r)
+            svc_cols.append(j)
+            svc_keys.append(key)
+    n_devices = np.bincount(np.asarray(dev_rows, dtype=np.int64), minlength=n)
+    n_services = np.bincount(np.asarray(svc_rows, dtype=np.int64), minlength=n)
+    max_devices = int(n_devices.max()) if n else 0
+    max_services = int(n_services.max()) if n else 0
+
+    # Per-item tables; the trailing entry is the padding sentinel (index -1)
+    dev_cap = np.array([CAPABILITY_INDEX[d.capability_type] for d in device_table] + [PAD], dtype=np.int64)
+    dev_room = np.array(
+        [rooms.setdefault(d.room, len(rooms)) if d.room else -1 for d in device_table] + [-1], dtype=np.int64
+    )
+    dev_reachable = np.array([bool(d.reachable) for d in device_table] + [True], dtype=bool)
+    svc_cap = np.array([CAPABILITY_INDEX[s.capability_type] for s in service_table] + [PAD], dtype=np.int64)
+    svc_available = np.array([bool(s.available) for s in service_table] + [True], dtype=bool)
+
+    dev_idx = np.full((n, max_devices), -1, dtype=np.int64)
+    dev_idx[dev_rows, dev_cols] = dev_keys
+    svc_idx = np.full((n, max_services), -1, dtype=np.int64)
+    svc_idx[svc_rows, svc_cols] = svc_keys
+
+    caps_d = dev_cap[dev_idx]  # (n, max_devices), PAD where empty
+    caps_s = svc_cap[svc_idx]
+    room_d = dev_room[dev_idx]
+
+    # Capability one-hots (any device / any item with the type)
+    has_device = np.zeros((n, PAD + 1), dtype=bool)
+    for j in range(max_devices):
+        has_device[rows, caps_d[:, j]] = True
+    has_any = has_device.copy()
+    for j in range(max_services):
+        has_any[rows, caps_s[:, j]] = True
+    has_device = has_device[:, :PAD]
+    has_any = has_any[:, :PAD]
+
+    def device_has(cap: CapabilityType):
+        return has_device[:, CAPABILITY_INDEX[cap]]
+
+    audio = device_has(CapabilityType.AUDIO)
+    lighting = device_has(CapabilityType.LIGHTING)
+    security = device_has(CapabilityType.SECURITY)
+    access = device_has(CapabilityType.ACCESS_CONTROL)
+    video = device_has(CapabilityType.VIDEO)
+    sensing = device_has(CapabilityType.SENSING)
+    energy = device_has(CapabilityType.ENERGY)
+
+    # Pairwise room checks over device positions
+    room_conflict = np.zeros(n, dtype=bool)
+    multi_room = np.zeros(n, dtype=bool)
+    for j in range(max_devices):
+        for k in range(j + 1, max_devices):
+            both = (room_d[:, j] >= 0) & (room_d[:, k] >= 0)
+            same_room = both & (room_d[:, j] == room_d[:, k])
+            room_conflict |= same_room & (caps_d[:, j] == caps_d[:, k])
+            multi_room |= both & (room_d[:, j] != room_d[:, k])
+
+    unreachable = ~dev_reachable[dev_idx].all(axis=1) if max_devices else np.zeros(n, dtype=bool)
+    unavailable = ~svc_available[svc_idx].all(axis=1) if max_services else np.zeros(n, dtype=bool)
+
+    # --- feasibility ----------------------------------------------------
+    unsafe = np.zeros(n, dtype=bool)
+    for rule_type in safety_rule_types:
+        capability = SAFETY_RULE_CAPABILITIES.get(rule_type)
+        if capability is not None:
+            unsafe |= device_has(capability)
+    context_violation = np.zeros(n, dtype=bool)
+    for rule_type in context_rule_types:
+        mapping = CONTEXT_RULE_CAPABILITIES.get(rule_type)
+        if mapping is not None and mapping[0](context_snapshot):
+            context_violation |= device_has(mapping[1])
+
+    feasibility = np.ones(n)
+    feasibility = np.where(unsafe, feasibility * SAFETY_PENALTY, feasibility)
+    feasibility = np.where(context_violation, feasibility * CONTEXT_PENALTY, feasibility)
+    feasibility = np.where(unreachable, feasibility * UNREACHABLE_PENALTY, feasibility)
+    feasibility = np.where(unavailable, feasibility * UNAVAILABLE_PENALTY, feasibility)
+    feasibility = np.where(room_conflict, feasibility * ROOM_CONFLICT_PENALTY, feasibility)
+
+    missing: Dict[int, List[str]] = {}
+    for r in np.nonzero(unreachable | unavailable)[0].tolist():
+        combination = combinations[r]
+        missing[r] = [d.device_id for d in combination.devices if not d.reachable] + [
+            s.service_id for s in combination.services if not s.available
+        ]
+
+    # --- value ----------------------------------------------------------
+    fit = np.zeros(n)
+    if context_snapshot.is_quiet_hours:
+        fit = np.where(audio, fit - QUIET_HOURS_AUDIO_PENALTY, fit + QUIET_HOURS_QUIET_BONUS)
+    if context_snapshot.is_weekend:
+        fit = np.where(lighting, fit + WEEKEND_LIGHTING_BONUS, fit)
+        fit = np.where(audio, fit + WEEKEND_AUDIO_BONUS, fit)
+    if context_snapshot.weather_conditions:
+        weather = context_snapshot.weather_conditions.get("condition", "")
+        if weather in BAD_WEATHER_CONDITIONS:
+            fit = np.where(lighting, fit + BAD_WEATHER_LIGHTING_BONUS, fit)
+    if context_snapshot.calendar_state == "meeting":
+        fit = np.where(audio, fit, fit + MEETING_QUIET_BONUS)
+    context_fit = np.minimum(1.0, np.maximum(0.0, fit))
+
+    utilities = _column_values(CAPABILITY_UTILITIES, DEFAULT_UTILITY, 0.0, np.float64)
+    utility = np.zeros(n)
+    for j in range(max_devices):
+        utility += utilities[caps_d[:, j]]
+    for j in range(max_services):
+        utility += utilities[caps_s[:, j]]
+    utility = np.where(security | access, utility + SAFETY_UTILITY_BONUS, utility)
+    utility = np.where(energy, utility + ENERGY_UTILITY_BONUS, utility)
+    utility = np.minimum(1.0, utility)
+
+    # Affinity terms per device; padding contributes an exact 0.0
+    device_terms = np.zeros(len(device_table) + 1)
+    room_terms = np.zeros(len(device_table) + 1)
+    if user_overlay:
+        device_terms[:-1] = [
+            (user_overlay.device_affinities.get(d.device_id, 0.5) - 0.5) * DEVICE_AFFINITY_SCALE for d in device_table
+        ]
+        room_terms[:-1] = [
+            (user_overlay.room_affinities.get(d.room, 0.5) - 0.5) * ROOM_AFFINITY_SCALE if d.room else 0.0 for d in device_table
+        ]
+        preference = np.full(n, 0.5)
+        for j in range(max_devices):
+            preference += device_terms[dev_idx[:, j]]
+        for j in range(max_devices):
+            preference += room_terms[dev_idx[:, j]]
+        if preferred_capabilities is not None:
+            preferred = np.array(
+                [cap.value in preferred_capabilities for cap in CAPABILITIES] + [False], dtype=bool
+            )
+            for j in range(max_devices):
+                preference = np.where(preferred[caps_d[:, j]], preference + PREFERRED_CAPABILITY_BONUS, preference)
+        preference = np.minimum(1.0, np.maximum(0.0, preference))
+    else:
+        preference = np.full(n, 0.5)
+
+    novelty = has_any.sum(axis=1) * NOVELTY_PER_CAPABILITY_TYPE
+    novelty = np.where((n_devices > 0) & (n_services > 0), novelty + DEVICE_SERVICE_NOVELTY_BONUS, novelty)
+    novelty = np.where(multi_room, novelty + CROSS_ROOM_NOVELTY_BONUS, novelty)
+    novelty = np.minimum(1.0, novelty)
+
+    effort = n_devices * 1 + n_services * 1
+    effort = effort + np.where(n_devices > 3, 2, 0) + security + video
+    effort_level = np.select([effort <= 2, effort <= 4, effort <= 6], [0, 1, 2], default=3)
+
+    risk = np.zeros(n)
+    risk = np.where(video, risk + VIDEO_RISK, risk)
+    risk = np.where(sensing, risk + SENSING_RISK, risk)
+    risk = np.where(access, risk + ACCESS_CONTROL_RISK, risk)
+    risk = np.where(n_devices + n_services > FRAGILE_ITEM_COUNT, risk + FRAGILE_RISK, risk)
+    risk = np.minimum(MAX_RISK_DEDUCTION, risk)
+
+    privacy_weights = _column_values(PRIVACY_WEIGHTS, 0, 0, np.int64)
+    privacy = np.zeros(n, dtype=np.int64)
+    safety_weights = _column_values(SAFETY_WEIGHTS, 0, 0, np.int64)
+    safety = np.zeros(n, dtype=np.int64)
+    for j in range(max_devices):
+        privacy += privacy_weights[caps_d[:, j]]
+        safety += safety_weights[caps_d[:, j]]
+    privacy_level = np.select([privacy >= 3, privacy >= 2, privacy >= 1], [3, 2, 1], default=0)
+    safety_level = np.select([safety >= 3, safety >= 2], [2, 1], default=0)
+
+    total = np.zeros(n)
+    total += context_fit * CONTEXT_FIT_WEIGHT
+    total += utility * UTILITY_WEIGHT
+    total += preference * PREFERENCE_WEIGHT
+    total += novelty * NOVELTY_WEIGHT
+    total -= risk
+    total = np.maximum(0.0, total)
+
+    # User overlay adjustment, applied on top of the value like _apply_user_overlay
+    if user_overlay:
+        adjustment = np.zeros(n)
+        for j in range(max_devices):
+            adjustment += device_terms[dev_idx[:, j]]
+        for j in range(max_devices):
+            adjustment += room_terms[dev_idx[:, j]]
+        total = np.maximum(0.0, total + adjustment)
+
+    return BatchScores(
+        feasible=feasibility > 0.0,
+        feasibility_score=feasibility,
+        total_value=total,
+        context_fit=context_fit,
+        novelty_score=novelty,
+        effort_level=effort_level,
+        privacy_level=privacy_level,
+        safety_level=safety_level,
+        missing=missing,
+    )
@@ -0,0 +1,251 @@
+"""
+Suggestion Cache
+Per-household cache of suggestion responses keyed by capability-graph fingerprint.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, time as dt_time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from .models import ContextSnapshot, SuggestionRequest, SuggestionResponse, UserOverlay
+
+logger = logging.getLogger(__name__)
+
+# (time-of-day profile, quiet hours, weekend, user present, calendar state, weather condition);
+# the first three come from the clock alone
+ContextBucket = Tuple[str, bool, bool, bool, Optional[str], Optional[str]]
+ClockBucket = Tuple[str, bool, bool]
+
+# (user id, overlay version, request variant)
+HouseholdKey = Tuple[str, str, str]
+
+
+def graph_fingerprint(capability_graph: Dict[str, Any]) -> str:
+    """Stable hash of a capability graph; dict ordering does not matter."""
+    canonical = json.dumps(capability_graph, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def time_profile(hour: int, is_quiet_hours: bool) -> str:
+    """Time-of-day bucket used for user time profiles."""
+    if is_quiet_hours:
+        return "quiet_hours"
+    elif 6 <= hour < 12:
+        return "morning"
+    elif 12 <= hour < 17:
+        return "afternoon"
+    elif 17 <= hour < 22:
+        return "evening"
+    else:
+        return "night"
+
+
+def context_bucket(context_snapshot: ContextSnapshot) -> ContextBucket:
+    """Coarse view of the context scoring reads; suggestions only change across buckets."""
+    weather = context_snapshot.weather_conditions or {}
+    return (
+        time_profile(context_snapshot.time_of_day.hour, context_snapshot.is_quiet_hours),
+        bool(context_snapshot.is_quiet_hours),
+        bool(context_snapshot.is_weekend),
+        bool(context_snapshot.user_present),
+        context_snapshot.calendar_state,
+        weather.get("condition"),
+    )
+
+
+def is_quiet_hours(t: dt_time, quiet_hours_start: str, quiet_hours_end: str) -> bool:
+    """Whether ``t`` falls in the quiet hours window; the window may wrap past midnight."""
+    start = dt_time.fromisoformat(quiet_hours_start)
+    end = dt_time.fromisoformat(quiet_hours_end)
+    return (t >= start or t <= end) if start > end else (start <= t <= end)
+
+
+def clock_bucket(now: datetime, quiet_hours_start: str, quiet_hours_end: str) -> ClockBucket:
+    """The clock-derived part of ``context_bucket``, without running ingestion."""
+    quiet = is_quiet_hours(now.time(), quiet_hours_start, quiet_hours_end)
+    return time_profile(now.hour, quiet), quiet, now.weekday() >= 5
+
+
+def overlay_version(user_overlay: Optional[UserOverlay]) -> str:
+    if user_overlay is None:
+        return "none"
+    return user_overlay.updated_at.isoformat()
+
+
+def request_variant(request: SuggestionRequest) -> str:
+    """Hash of the request fields the pipeline reads besides the user id."""
+    return graph_fingerprint({
+        "session_id": request.session_id,
+        "context_hints": request.context_hints,
+        "preferences": request.preferences,
+    })
+
+
+@dataclass
+class CachedSuggestions:
+    """A cached response and the inputs it was computed from."""
+    response: SuggestionResponse
+    fingerprint: str
+    bucket: ContextBucket
+    overlay_version: str
+    stored_at: float
+    invalidated: bool = False
+
+
+class SuggestionCache:
+    """
+    Caches the latest suggestion response per household (user + overlay
+    version + request variant, see ``request_variant``).
+
+    Entries are fresh for ``ttl_seconds``; after that, or once a device change
+    invalidates them, they are still served for up to ``stale_ttl_seconds``
+    while the engine revalidates in the background. Revalidation re-ingests and
+    compares the graph fingerprint and context bucket, so the expensive stages
+    only rerun when something actually changed.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, stale_ttl_seconds: float = 3600.0, max_households: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.stale_ttl_seconds = stale_ttl_seconds
+        self.max_households = max_households
+        self._entries: "OrderedDict[HouseholdKey, CachedSuggestions]" = OrderedDict()
+        self._refreshing: Set[HouseholdKey] = set()
+        self._lock = threading.Lock()
+        self._listening = False
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "revalidations": 0,
+            "unchanged_revalidations": 0,
+            "invalidations": 0,
+        }
+
+    def lookup(
+        self,
+        household: HouseholdKey,
+        clock: ClockBucket
+    ) -> Tuple[Optional[CachedSuggestions], Optional[str]]:
+        """
+        Return ``(entry, state)`` where state is "fresh", "stale" or None (miss).
+
+        An entry whose time-of-day bucket no longer matches the clock is stale
+        even within its TTL.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(household)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None, None
+            age = now - entry.stored_at
+            if age > self.ttl_seconds + self.stale_ttl_seconds:
+                del self._entries[household]
+                self.stats["misses"] += 1
+                return None, None
+            self._entries.move_to_end(household)
+            if entry.invalidated or age > self.ttl_seconds or entry.bucket[:len(clock)] != clock:
+                self.stats["stale_hits"] += 1
+                return entry, "stale"
+            self.stats["hits"] += 1
+            return entry, "fresh"
+
+    def match(
+        self,
+        household: HouseholdKey,
+        fingerprint: str,
+        bucket: ContextBucket
+    ) -> Optional[CachedSuggestions]:
+        """Renew and return the entry if it was computed from exactly these inputs."""
+        with self._lock:
+            entry = self._entries.get(household)
+            if entry is None or entry.fingerprint != fingerprint or entry.bucket != bucket:
+                return None
+            entry.stored_at = time.time()
+            entry.invalidated = False
+            self.stats["unchanged_revalidations"] += 1
+            return entry
+
+    def store(
+        self,
+        household: HouseholdKey,
+        response: SuggestionResponse,
+        fingerprint: str,
+        bucket: ContextBucket
+    ) -> CachedSuggestions:
+        entry = CachedSuggestions(
+            response=response,
+            fingerprint=fingerprint,
+            bucket=bucket,
+            overlay_version=household[1],
+            stored_at=time.time()
+        )
+        with self._lock:
+            self._entries[household] = entry
+            self._entries.move_to_end(household)
+            while len(self._entries) > self.max_households:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, user_id: Optional[str] = None) -> int:
+        """Mark a household's entries (or all entries) stale; they keep serving until revalidated."""
+        count = 0
+        with self._lock:
+            for household, entry in self._entries.items():
+                if user_id is None or household[0] == user_id:
+                    entry.invalidated = True
+                    count += 1
+            self.stats["invalidations"] += count
+        return count
+
+    def begin_refresh(self, household: HouseholdKey) -> bool:
+        """Claim the background revalidation for a household; False if one is running."""
+        with self._lock:
+            if household in self._refreshing:
+                return False
+            self._refreshing.add(household)
+            self.stats["revalidations"] += 1
+            return True
+
+    def end_refresh(self, household: HouseholdKey) -> None:
+        with self._lock:
+            self._refreshing.discard(household)
+
+    def expires_at(self, entry: CachedSuggestions) -> datetime:
+        return datetime.utcfromtimestamp(entry.stored_at + self.ttl_seconds)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "households": len(self._entries), "refreshing": len(self._refreshing)}
+
+    def listen_for_device_changes(self) -> None:
+        """Invalidate a household whenever one of its devices is written through SQLAlchemy.
+
+        Safe to call more than once; the listeners are registered on the first call.
+        """
+        from sqlalchemy import event
+        from shared.database.models import Device
+
+        with self._lock:
+            if self._listening:
+                return
+            self._listening = True
+
+        def _on_device_changed(mapper, connection, target) -> None:  # noqa: ARG001
+            # Devices without an owner column invalidate every household
+            user_id = getattr(target, "user_id", None)
+            try:
+                self.invalidate(str(user_id) if user_id is not None else None)
+            except Exception as e:
+                logger.warning(f"Failed to invalidate suggestion cache: {e}")
+
+        for name in ("after_insert", "after_update", "after_delete"):
+            event.listen(Device, name, _on_device_changed)
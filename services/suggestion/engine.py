@@ -7,11 +7,11 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import time
 import uuid
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import Enum
 
 from shared.config.settings import settings
@@ -24,6 +24,10 @@ from .recommendation import RecommendationPackager
 from .orchestration import OrchestrationAdapter
 from .feedback import FeedbackService
 from .llm_bridge import LLMBridge
+from .cache import (
+    SuggestionCache, CachedSuggestions, HouseholdKey, graph_fingerprint, context_bucket, clock_bucket,
+    overlay_version, request_variant
+)
 from .models import (
     SuggestionRequest, SuggestionResponse, DeviceCapability, ServiceCapability,
     ContextSnapshot, CombinationCandidate, OutcomeTemplate, RecommendationCard,
@@ -64,7 +68,7 @@ class SuggestionEngine:
         self._session_factory = get_session_factory(settings.database_url)
         
         # Core pipeline components
-        self.ingestion_service = DeviceIngestionService()
+        self.ingestion_service = DeviceIngestionService(self.config)
         self.powerset_generator = PowersetGenerator(self.config)
         self.evaluator = CombinationEvaluator()
         self.recommendation_packager = RecommendationPackager()
@@ -81,6 +85,15 @@ class SuggestionEngine:
         self._request_history: List[Dict[str, Any]] = []
         self._performance_metrics: Dict[str, float] = {}
         
+        # Result cache keyed by household, graph fingerprint and context bucket
+        self.result_cache: Optional[SuggestionCache] = None
+        if self.config.enable_result_cache:
+            self.result_cache = SuggestionCache(
+                ttl_seconds=self.config.result_cache_ttl_seconds,
+                stale_ttl_seconds=self.config.result_cache_stale_seconds
+            )
+        self._revalidations: set = set()
+        
     async def start(self):
         """Start the suggestion engine."""
         self._running = True
@@ -92,12 +105,23 @@ class SuggestionEngine:
         # Load user overlays from storage
         await self._load_user_overlays()
         
+        # Device writes mark cached suggestions stale
+        if self.result_cache:
+            try:
+                self.result_cache.listen_for_device_changes()
+            except Exception as e:
+                logger.warning(f"Suggestion cache invalidation on device changes unavailable: {e}")
+        
         logger.info("Suggestion engine started")
         
     async def stop(self):
         """Stop the suggestion engine."""
         self._running = False
         
+        # Let background revalidations finish
+        if self._revalidations:
+            await asyncio.gather(*self._revalidations, return_exceptions=True)
+        
         # Stop components
         await self.ingestion_service.stop()
         await self.feedback_service.stop()
@@ -120,7 +144,72 @@ class SuggestionEngine:
         3. Evaluate and rank
         4. Package recommendations
         5. Handle LLM fallback if needed
+        
+        With the result cache enabled, a household's last response is returned
+        immediately while fresh; once stale (TTL, time-of-day bucket change or
+        device change) it is still returned, and the pipeline reruns in the
+        background.
         """
+        if not self.result_cache:
+            return await self._run_pipeline(request)
+        
+        start_time = time.time()
+        household = self._household_key(request)
+        clock = clock_bucket(
+            datetime.now(), self.config.quiet_hours_start, self.config.quiet_hours_end
+        )
+        entry, state = self.result_cache.lookup(household, clock)
+        if entry is None:
+            return await self._run_pipeline(request, household)
+        
+        if state == "stale":
+            self._schedule_revalidation(request, household)
+        return self._cached_response(entry, start_time)
+    
+    def _household_key(self, request: SuggestionRequest) -> HouseholdKey:
+        return (
+            request.user_id,
+            overlay_version(self._user_overlays.get(request.user_id)),
+            request_variant(request)
+        )
+    
+    def _cached_response(self, entry: CachedSuggestions, start_time: float) -> SuggestionResponse:
+        return replace(
+            entry.response,
+            request_id=str(uuid.uuid4()),
+            processing_time_ms=int((time.time() - start_time) * 1000),
+            expires_at=self.result_cache.expires_at(entry),
+            cached=True
+        )
+    
+    def _schedule_revalidation(self, request: SuggestionRequest, household: HouseholdKey):
+        if not self.result_cache.begin_refresh(household):
+            return
+        
+        async def _revalidate():
+            try:
+                await self._run_pipeline(request, household)
+            except Exception as e:
+                logger.error(f"Background revalidation failed for {household[0]}: {e}")
+            finally:
+                self.result_cache.end_refresh(household)
+        
+        task = asyncio.create_task(_revalidate())
+        self._revalidations.add(task)
+        task.add_done_callback(self._revalidations.discard)
+    
+    def invalidate_suggestions(self, user_id: Optional[str] = None) -> int:
+        """Mark cached suggestions stale, e.g. after devices or services change."""
+        if not self.result_cache:
+            return 0
+        return self.result_cache.invalidate(user_id)
+    
+    async def _run_pipeline(
+        self,
+        request: SuggestionRequest,
+        household: Optional[HouseholdKey] = None
+    ) -> SuggestionResponse:
+        """Run the full pipeline; with a household key, reuse or refresh its cache entry."""
         request_id = str(uuid.uuid4())
         start_time = time.time()
         
@@ -131,13 +220,18 @@ class SuggestionEngine:
             self._active_requests[request_id] = request
             
             # Step 1: Ingest current devices and services
-            ingestion_result = await self._ingest_devices_and_services(request)
-            if not ingestion_result.success:
-                return SuggestionResponse(
-                    request_id=request_id,
-                    status=SuggestionStatus.FAILED,
-                    errors=[f"Ingestion failed: {ingestion_result.error}"]
-                )
+            ingestion_result, failure = await self._ingest_for_request(request, request_id)
+            if failure:
+                return failure
+            
+            # Nothing changed since the cached response was computed: skip the remaining stages
+            fingerprint = bucket = None
+            if household is not None:
+                fingerprint = graph_fingerprint(ingestion_result.capability_graph)
+                bucket = context_bucket(ingestion_result.context_snapshot)
+                entry = self.result_cache.match(household, fingerprint, bucket)
+                if entry is not None:
+                    return self._cached_response(entry, start_time)
             
             # Step 2: Generate powerset of combinations
             combinations = await self._generate_combinations(
@@ -146,63 +240,202 @@ class SuggestionEngine:
             )
             
             if not combinations:
-                # Try LLM fallback for broader discovery
-                if self.config.enable_llm_fallback:
-                    llm_result = await self._llm_fallback(request, ingestion_result)
-                    if llm_result:
-                        return llm_result
-                
-                return SuggestionResponse(
-                    request_id=request_id,
-                    status=SuggestionStatus.PARTIAL,
-                    recommendations=[],
-                    warnings=["No combinations found. Consider adding more devices or services."]
-                )
+                return await self._no_combinations_response(request, request_id, ingestion_result)
             
-            # Step 3: Evaluate combinations
-            evaluation_result = await self._evaluate_combinations(
-                combinations,
-                ingestion_result.context_snapshot,
-                request.user_id
+            # Steps 3-5: evaluate, package and add what-if analysis
+            return await self._complete_response(
+                request, request_id, start_time, ingestion_result, combinations,
+                household, fingerprint, bucket
             )
             
-            # Step 4: Package recommendations
-            recommendations = await self._package_recommendations(
-                evaluation_result,
-                request.user_id,
-                request.session_id
+        except Exception as e:
+            logger.error(f"Error generating suggestions for request {request_id}: {e}")
+            return self._error_response(request_id, e)
+        finally:
+            # Clean up active request
+            self._active_requests.pop(request_id, None)
+
+    async def stream_suggestions(
+        self,
+        request: SuggestionRequest,
+        first_size: int = 2
+    ) -> AsyncIterator[SuggestionResponse]:
+        """
+        Generate suggestions progressively.
+
+        Yields a PARTIAL response with ranked cards as soon as combinations of
+        up to ``first_size`` items are evaluated, then a refined one after each
+        larger size, and finally the COMPLETED response (with what-if items)
+        that ``generate_suggestions`` would return. Every yield shares the same
+        request_id. Cached responses are yielded as a single final event.
+        """
+        household = None
+        if self.result_cache:
+            start_time = time.time()
+            household = self._household_key(request)
+            clock = clock_bucket(
+                datetime.now(), self.config.quiet_hours_start, self.config.quiet_hours_end
             )
-            
-            # Step 5: Generate what-if analysis
-            what_if_items = await self._generate_what_if_analysis(
+            entry, state = self.result_cache.lookup(household, clock)
+            if entry is not None:
+                if state == "stale":
+                    self._schedule_revalidation(request, household)
+                yield self._cached_response(entry, start_time)
+                return
+
+        request_id = str(uuid.uuid4())
+        start_time = time.time()
+        self._active_requests[request_id] = request
+
+        try:
+            ingestion_result, failure = await self._ingest_for_request(request, request_id)
+            if failure:
+                yield failure
+                return
+
+            fingerprint = bucket = None
+            if household is not None:
+                fingerprint = graph_fingerprint(ingestion_result.capability_graph)
+                bucket = context_bucket(ingestion_result.context_snapshot)
+
+            # Only newly enumerated candidates are scored for partial results;
+            # feasible ones are kept as long as they stay in the top list
+            feasible_ids = set()
+            scored_ids = set()
+            async for combinations, final in self.powerset_generator.iter_combinations(
                 ingestion_result.capability_graph,
-                evaluation_result.missing_capabilities
-            )
-            
-            # Calculate performance metrics
-            processing_time = time.time() - start_time
-            self._performance_metrics[request_id] = processing_time
-            
-            return SuggestionResponse(
-                request_id=request_id,
-                status=SuggestionStatus.COMPLETED,
-                recommendations=recommendations,
-                what_if_items=what_if_items,
-                context_snapshot=ingestion_result.context_snapshot,
-                processing_time_ms=int(processing_time * 1000)
+                ingestion_result.context_snapshot,
+                time_budget_ms=self.config.time_budget_ms,
+                first_size=first_size
+            ):
+                if final:
+                    break
+                new = [c for c in combinations if c.combination_id not in scored_ids]
+                evaluation_result = await self._evaluate_combinations(
+                    new, ingestion_result.context_snapshot, request.user_id
+                )
+                scored_ids.update(c.combination_id for c in new)
+                feasible_ids.update(c.combination_id for c in evaluation_result.combinations)
+
+                ranked = [c for c in combinations if c.combination_id in feasible_ids]
+                ranked.sort(key=lambda c: c.estimated_value, reverse=True)
+                evaluation_result.combinations = ranked
+
+                yield SuggestionResponse(
+                    request_id=request_id,
+                    status=SuggestionStatus.PARTIAL,
+                    recommendations=await self._package_recommendations(
+                        evaluation_result, request.user_id, request.session_id
+                    ),
+                    context_snapshot=ingestion_result.context_snapshot,
+                    processing_time_ms=int((time.time() - start_time) * 1000)
+                )
+
+            if not combinations:
+                yield await self._no_combinations_response(request, request_id, ingestion_result)
+                return
+
+            # The final list is scored as a whole so it matches generate_suggestions exactly
+            yield await self._complete_response(
+                request, request_id, start_time, ingestion_result, combinations,
+                household, fingerprint, bucket
             )
-            
+
         except Exception as e:
-            logger.error(f"Error generating suggestions for request {request_id}: {e}")
-            return SuggestionResponse(
+            logger.error(f"Error streaming suggestions for request {request_id}: {e}")
+            yield self._error_response(request_id, e)
+        finally:
+            self._active_requests.pop(request_id, None)
+
+    async def _ingest_for_request(self, request: SuggestionRequest, request_id: str):
+        """Step 1 for both pipelines: the ingestion result, or the FAILED response to return instead."""
+        ingestion_result = await self._ingest_devices_and_services(request)
+        if not ingestion_result.success:
+            return ingestion_result, SuggestionResponse(
                 request_id=request_id,
                 status=SuggestionStatus.FAILED,
-                errors=[f"Internal error: {str(e)}"]
+                errors=[f"Ingestion failed: {ingestion_result.error}"]
             )
-        finally:
-            # Clean up active request
-            self._active_requests.pop(request_id, None)
-    
+        return ingestion_result, None
+
+    async def _no_combinations_response(
+        self,
+        request: SuggestionRequest,
+        request_id: str,
+        ingestion_result
+    ) -> SuggestionResponse:
+        """Try the LLM fallback for broader discovery, else report that nothing was found."""
+        if self.config.enable_llm_fallback:
+            llm_result = await self._llm_fallback(request, ingestion_result)
+            if llm_result:
+                return llm_result
+        
+        return SuggestionResponse(
+            request_id=request_id,
+            status=SuggestionStatus.PARTIAL,
+            recommendations=[],
+            warnings=["No combinations found. Consider adding more devices or services."]
+        )
+
+    async def _complete_response(
+        self,
+        request: SuggestionRequest,
+        request_id: str,
+        start_time: float,
+        ingestion_result,
+        combinations: List[CombinationCandidate],
+        household: Optional[HouseholdKey],
+        fingerprint: Optional[str],
+        bucket
+    ) -> SuggestionResponse:
+        """Evaluate, package and analyse the final combination list, caching the result."""
+        # Step 3: Evaluate combinations
+        evaluation_result = await self._evaluate_combinations(
+            combinations,
+            ingestion_result.context_snapshot,
+            request.user_id
+        )
+        
+        # Step 4: Package recommendations
+        recommendations = await self._package_recommendations(
+            evaluation_result,
+            request.user_id,
+            request.session_id
+        )
+        
+        # Step 5: Generate what-if analysis
+        what_if_items = await self._generate_what_if_analysis(
+            ingestion_result.capability_graph,
+            evaluation_result.missing_capabilities
+        )
+        
+        # Calculate performance metrics
+        processing_time = time.time() - start_time
+        self._performance_metrics[request_id] = processing_time
+        
+        response = SuggestionResponse(
+            request_id=request_id,
+            status=SuggestionStatus.COMPLETED,
+            recommendations=recommendations,
+            what_if_items=what_if_items,
+            context_snapshot=ingestion_result.context_snapshot,
+            processing_time_ms=int(processing_time * 1000)
+        )
+        
+        if household is not None:
+            entry = self.result_cache.store(household, response, fingerprint, bucket)
+            response.expires_at = self.result_cache.expires_at(entry)
+        
+        return response
+
+    @staticmethod
+    def _error_response(request_id: str, error: Exception) -> SuggestionResponse:
+        return SuggestionResponse(
+            request_id=request_id,
+            status=SuggestionStatus.FAILED,
+            errors=[f"Internal error: {str(error)}"]
+        )
+
     async def execute_suggestion(
         self, 
         request_id: str, 
@@ -250,6 +483,8 @@ class SuggestionEngine:
             feedback_type=feedback_type,
             feedback_data=feedback_data or {}
         )
+        # Feedback shifts the user's preferences; recompute on the next request
+        self.invalidate_suggestions(user_id)
     
     async def _ingest_devices_and_services(self, request: SuggestionRequest):
         """Step 1: Ingest and normalize devices and services."""
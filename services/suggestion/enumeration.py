@@ -0,0 +1,393 @@
+"""
+Bitmask Enumeration
+Walks device/service combinations as integer bitmasks so infeasible prefixes are
+never extended and candidates are only built for combinations that survive.
+"""
+
+from __future__ import annotations
+
+import bisect
+import heapq
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from .models import CapabilityType, ContextSnapshot, DeviceCapability, ServiceCapability
+
+CAPABILITY_BITS: Dict[CapabilityType, int] = {cap: 1 << i for i, cap in enumerate(CapabilityType)}
+
+AUDIO_BIT = CAPABILITY_BITS[CapabilityType.AUDIO]
+LIGHTING_BIT = CAPABILITY_BITS[CapabilityType.LIGHTING]
+# Devices that make audio acceptable during quiet hours
+SAFETY_BITS = (
+    CAPABILITY_BITS[CapabilityType.SECURITY]
+    | CAPABILITY_BITS[CapabilityType.ACCESS_CONTROL]
+    | CAPABILITY_BITS[CapabilityType.SENSING]
+)
+# Devices that are pruned while the user is away
+AWAY_BLOCKED_BITS = CAPABILITY_BITS[CapabilityType.SECURITY] | CAPABILITY_BITS[CapabilityType.ACCESS_CONTROL]
+
+# (combination value, sorted indices into devices + services)
+Leaf = Tuple[float, Tuple[int, ...]]
+
+
+@dataclass(frozen=True)
+class EncodedItem:
+    """A device or service reduced to the bits the pruning rules look at."""
+    index: int  # position in devices + services
+    is_device: bool
+    capability_bit: int
+    slot_bit: int  # one bit per (room, capability type); 0 for devices without a room and services
+    token: int  # signature token id
+    capability_value: float
+
+
+class BitmaskEnumerator:
+    """
+    Enumerates combinations of a given size in ``itertools.combinations`` order.
+
+    Applies the same rules as ``PowersetGenerator._should_keep_combination``:
+    unreachable devices, unavailable services and (while the user is away)
+    security/access-control devices are dropped before enumeration; two
+    devices with the same capability type in the same room share a slot bit,
+    so a prefix holding one never tries the other; and quiet-hours audio
+    prefixes are cut as soon as no safety device is left to add. Signatures
+    are carried as sorted token tuples and values are computed from the path,
+    so nothing is allocated for pruned combinations.
+    """
+
+    def __init__(
+        self,
+        devices: Sequence[DeviceCapability],
+        services: Sequence[ServiceCapability],
+        context_snapshot: ContextSnapshot,
+        capability_value: Callable[[CapabilityType, ContextSnapshot], float],
+        prune: bool = True,
+    ):
+        self.context_snapshot = context_snapshot
+        self.prune = prune
+        self.tokens: Dict[Tuple[bool, str], int] = {}
+        self.items = self._encode(devices, services, capability_value)
+        self.nodes_visited = 0
+
+        # Device capability bits still reachable from each position, for bounding
+        self._suffix_device_caps = [0] * (len(self.items) + 1)
+        for pos in range(len(self.items) - 1, -1, -1):
+            item = self.items[pos]
+            own = item.capability_bit if item.is_device else 0
+            self._suffix_device_caps[pos] = self._suffix_device_caps[pos + 1] | own
+
+        ctx = context_snapshot
+        weather = ctx.weather_conditions.get("condition", "") if ctx.weather_conditions else ""
+        self._quiet = bool(ctx.is_quiet_hours)
+        self._lighting_bonus = bool(ctx.is_weekend), weather in ["rain", "snow"]
+
+    def _encode(
+        self,
+        devices: Sequence[DeviceCapability],
+        services: Sequence[ServiceCapability],
+        capability_value: Callable[[CapabilityType, ContextSnapshot], float],
+    ) -> List[EncodedItem]:
+        slots: Dict[Tuple[str, CapabilityType], int] = {}
+        items: List[EncodedItem] = []
+        all_items: List[Union[DeviceCapability, ServiceCapability]] = [*devices, *services]
+        for index, item in enumerate(all_items):
+            is_device = isinstance(item, DeviceCapability)
+            bit = CAPABILITY_BITS[item.capability_type]
+            if self.prune:
+                if is_device and not item.reachable:
+                    continue
+                if not is_device and not item.available:
+                    continue
+                if is_device and not self.context_snapshot.user_present and bit & AWAY_BLOCKED_BITS:
+                    continue
+            slot_bit = 0
+            if is_device and item.room and self.prune:
+                slot_bit = slots.setdefault((item.room, item.capability_type), 1 << len(slots))
+            if is_device:
+                label = f"{item.capability_type.value}:{item.room or 'unknown'}"
+            else:
+                label = item.capability_type.value
+            token = self.tokens.setdefault((is_device, label), len(self.tokens))
+            items.append(EncodedItem(
+                index=index,
+                is_device=is_device,
+                capability_bit=bit,
+                slot_bit=slot_bit,
+                token=token,
+                capability_value=capability_value(item.capability_type, self.context_snapshot),
+            ))
+        return items
+
+    def enumerate_size(
+        self,
+        size: int,
+        deadline: float,
+        emit: Callable[[Tuple[int, ...], Tuple[int, ...], float, int], None],
+    ) -> bool:
+        """
+        Call ``emit(path, signature_key, value, 1)`` for every surviving combination
+        of ``size`` items, in lexicographic order of their original indices.
+
+        ``signature_key`` is the sorted tuple of signature tokens; two combinations
+        with equal keys have equal capability signatures and values. Returns
+        False if ``deadline`` (a ``time.time()`` value) passed mid-walk.
+        """
+        items = self.items
+        n = len(items)
+        if size <= 0 or size > n:
+            return True
+        suffix = self._suffix_device_caps
+        quiet = self._quiet and self.prune
+        state = {"expired": False}
+
+        def extend(start: int, depth: int, path: Tuple[int, ...], slots: int, device_caps: int,
+                   all_caps: int, device_count: int, signature: Tuple[int, ...]) -> None:
+            for pos in range(start, n - (size - depth) + 1):
+                self.nodes_visited += 1
+                if not self.nodes_visited & 0x3FF and time.time() > deadline:
+                    state["expired"] = True
+                if state["expired"]:
+                    return
+                item = items[pos]
+                if item.slot_bit & slots:
+                    continue
+                next_device_caps = device_caps | (item.capability_bit if item.is_device else 0)
+                if (quiet and next_device_caps & AUDIO_BIT and not next_device_caps & SAFETY_BITS
+                        and (depth + 1 == size or not suffix[pos + 1] & SAFETY_BITS)):
+                    # audio needs a safety device, and none can be added any more
+                    continue
+                sig = list(signature)
+                bisect.insort(sig, item.token)
+                next_path = path + (pos,)
+                next_count = device_count + item.is_device
+                next_all = all_caps | item.capability_bit
+                if depth + 1 == size:
+                    value = self.value([items[p].capability_value for p in next_path], next_count,
+                                       next_device_caps, next_all)
+                    emit(tuple(items[p].index for p in next_path), tuple(sig), value, 1)
+                else:
+                    extend(pos + 1, depth + 1, next_path, slots | item.slot_bit, next_device_caps,
+                           next_all, next_count, tuple(sig))
+
+        extend(0, 0, (), 0, 0, 0, 0, ())
+        return not state["expired"]
+
+    def value(self, capability_values: Sequence[float], device_count: int, device_caps: int, all_caps: int) -> float:
+        """Combination value from per-item capability values given in index order."""
+        # Same arithmetic, in the same order, as PowersetGenerator._estimate_combination_value
+        service_count = len(capability_values) - device_count
+        value = 0.0
+        value += device_count * 0.1
+        value += service_count * 0.05
+        for capability_value in capability_values:
+            value += capability_value
+
+        fit = 0.0
+        if self._quiet and not device_caps & AUDIO_BIT:
+            fit += 0.2
+        weekend, wet = self._lighting_bonus
+        if weekend and device_caps & LIGHTING_BIT:
+            fit += 0.1
+        if wet and device_caps & LIGHTING_BIT:
+            fit += 0.1
+        value += fit
+
+        novelty = bin(all_caps).count("1") * 0.05
+        if device_count and service_count:
+            novelty += 0.1
+        value += novelty
+        return max(0.0, value)
+
+
+@dataclass
+class EquivalenceClass:
+    """Items that are interchangeable for pruning, signature and value."""
+    token: int
+    is_device: bool
+    capability_bit: int
+    capability_value: float
+    max_count: int  # 1 for devices that occupy a (room, capability) slot
+    members: List[int] = field(default_factory=list)  # original indices, ascending
+
+
+class ClassEnumerator:
+    """
+    Enumerates multisets of signature-equivalence classes instead of items.
+
+    Devices sharing ``capability_type:room`` (and services sharing a
+    capability type) always yield the same signature and value, so each
+    multiset of class counts stands for every concrete combination built from
+    it. A class's earliest members form the first such combination in
+    ``itertools.combinations`` order, which is the one signature
+    deduplication would have kept; that representative is the only one ever
+    expanded. Only meaningful with signature reduction on.
+    """
+
+    def __init__(self, base: BitmaskEnumerator):
+        self.base = base
+        self.nodes_visited = 0
+        by_key: Dict[Tuple[int, int], EquivalenceClass] = {}
+        for item in base.items:
+            key = (item.token, item.slot_bit)
+            cls = by_key.get(key)
+            if cls is None:
+                cls = by_key[key] = EquivalenceClass(
+                    token=item.token,
+                    is_device=item.is_device,
+                    capability_bit=item.capability_bit,
+                    capability_value=item.capability_value,
+                    max_count=1 if item.slot_bit else 0,
+                )
+            cls.members.append(item.index)
+        self.classes = list(by_key.values())
+        for cls in self.classes:
+            cls.max_count = cls.max_count or len(cls.members)
+
+        n = len(self.classes)
+        self._suffix_capacity = [0] * (n + 1)
+        self._suffix_device_caps = [0] * (n + 1)
+        for ci in range(n - 1, -1, -1):
+            cls = self.classes[ci]
+            self._suffix_capacity[ci] = self._suffix_capacity[ci + 1] + cls.max_count
+            own = cls.capability_bit if cls.is_device else 0
+            self._suffix_device_caps[ci] = self._suffix_device_caps[ci + 1] | own
+
+    def enumerate_size(
+        self,
+        size: int,
+        deadline: float,
+        emit: Callable[[Tuple[int, ...], Tuple[int, ...], float, int], None],
+    ) -> bool:
+        """
+        Call ``emit(representative, signature_key, value, multiplicity)`` once per
+        surviving class multiset of ``size`` items; ``multiplicity`` is how many
+        concrete combinations the multiset stands for.
+        """
+        classes = self.classes
+        if size <= 0 or size > self._suffix_capacity[0]:
+            return True
+        capacity = self._suffix_capacity
+        suffix = self._suffix_device_caps
+        quiet = self.base._quiet and self.base.prune
+        state = {"expired": False}
+        chosen: List[Tuple[EquivalenceClass, int]] = []
+
+        def leaf(device_count: int, device_caps: int, all_caps: int) -> None:
+            picked: List[Tuple[int, float]] = []
+            signature: List[int] = []
+            multiplicity = 1
+            for cls, count in chosen:
+                picked.extend((index, cls.capability_value) for index in cls.members[:count])
+                signature.extend([cls.token] * count)
+                multiplicity *= math.comb(len(cls.members), count)
+            picked.sort()
+            value = self.base.value([v for _, v in picked], device_count, device_caps, all_caps)
+            emit(tuple(index for index, _ in picked), tuple(sorted(signature)), value, multiplicity)
+
+        def extend(ci: int, remaining: int, device_count: int, device_caps: int, all_caps: int) -> None:
+            self.nodes_visited += 1
+            if not self.nodes_visited & 0x3FF and time.time() > deadline:
+                state["expired"] = True
+            if state["expired"]:
+                return
+            if (quiet and device_caps & AUDIO_BIT and not device_caps & SAFETY_BITS
+                    and (remaining == 0 or not suffix[ci] & SAFETY_BITS)):
+                # audio needs a safety device, and none can be added any more
+                return
+            if remaining == 0:
+                leaf(device_count, device_caps, all_caps)
+                return
+            if capacity[ci] < remaining:
+                return
+            cls = classes[ci]
+            for count in range(min(cls.max_count, remaining), 0, -1):
+                chosen.append((cls, count))
+                extend(
+                    ci + 1,
+                    remaining - count,
+                    device_count + (count if cls.is_device else 0),
+                    device_caps | (cls.capability_bit if cls.is_device else 0),
+                    all_caps | cls.capability_bit,
+                )
+                chosen.pop()
+            extend(ci + 1, remaining, device_count, device_caps, all_caps)
+
+        extend(0, size, 0, 0, 0)
+        return not state["expired"]
+
+
+class TopSelector:
+    """
+    Incremental form of ``select_top``: feed sizes one at a time and read the
+    current best leaves in between, e.g. to stream partial results.
+    """
+
+    def __init__(
+        self,
+        enumerator: Union[BitmaskEnumerator, ClassEnumerator],
+        limit: int,
+        deadline: float,
+        dedupe: bool = True,
+    ):
+        self.enumerator = enumerator
+        self.limit = limit
+        self.deadline = deadline
+        self.dedupe = dedupe
+        self.raw = 0
+        self.cut_at: Optional[int] = None
+        self._seen = set()
+        # (value, negated (size, *path)); the root is the worst leaf kept
+        self._heap: List[Tuple[float, Tuple[int, ...], Tuple[int, ...]]] = []
+
+    @property
+    def done(self) -> bool:
+        """True once the legacy stop rule (or the deadline) ends the walk."""
+        return self.cut_at is not None or self.raw >= self.limit
+
+    def _emit(self, path: Tuple[int, ...], signature: Tuple[int, ...], value: float, multiplicity: int) -> None:
+        self.raw += multiplicity
+        if self.dedupe:
+            if signature in self._seen:
+                return
+            self._seen.add(signature)
+        entry = (value, tuple(-i for i in (len(path), *path)), path)
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def add_size(self, size: int) -> bool:
+        """Enumerate one size; False if the deadline cut it short."""
+        if time.time() > self.deadline or not self.enumerator.enumerate_size(size, self.deadline, self._emit):
+            self.cut_at = size
+            return False
+        return True
+
+    def leaves(self) -> List[Leaf]:
+        """Leaves kept so far, best first."""
+        return [(value, path) for value, _, path in sorted(self._heap, reverse=True)]
+
+
+def select_top(
+    enumerator: Union[BitmaskEnumerator, ClassEnumerator],
+    sizes: Sequence[int],
+    limit: int,
+    deadline: float,
+    dedupe: bool = True,
+) -> Tuple[List[Leaf], int, Optional[int]]:
+    """
+    Enumerate ``sizes`` in order and keep the best ``limit`` leaves.
+
+    Mirrors the legacy loop: stop after the first size that brings the raw
+    survivor count to ``limit``, drop leaves whose signature was already
+    seen, and rank by value with ties in ``itertools.combinations`` order
+    (shorter first, then lexicographic by index). Returns the leaves, the raw
+    survivor count and the size the deadline cut short, if any.
+    """
+    selector = TopSelector(enumerator, limit, deadline, dedupe)
+    for size in sizes:
+        if not selector.add_size(size) or selector.done:
+            break
+    return selector.leaves(), selector.raw, selector.cut_at
@@ -17,8 +17,28 @@ from .models import (
     PrivacyLevel, SafetyLevel, EffortLevel, OutcomeTemplate
 )
 
+from .cache import time_profile
+from .batch_evaluation import (
+    np, score_batch, EFFORT_LEVELS, PRIVACY_LEVELS, SAFETY_LEVELS
+)
+from .scoring import (
+    CAPABILITY_UTILITIES, DEFAULT_UTILITY, PRIVACY_WEIGHTS, SAFETY_WEIGHTS,
+    SAFETY_PENALTY, CONTEXT_PENALTY, UNREACHABLE_PENALTY, UNAVAILABLE_PENALTY, ROOM_CONFLICT_PENALTY,
+    CONTEXT_FIT_WEIGHT, UTILITY_WEIGHT, PREFERENCE_WEIGHT, NOVELTY_WEIGHT,
+    DEVICE_AFFINITY_SCALE, ROOM_AFFINITY_SCALE, PREFERRED_CAPABILITY_BONUS,
+    QUIET_HOURS_QUIET_BONUS, QUIET_HOURS_AUDIO_PENALTY, WEEKEND_LIGHTING_BONUS, WEEKEND_AUDIO_BONUS,
+    BAD_WEATHER_CONDITIONS, BAD_WEATHER_LIGHTING_BONUS, MEETING_QUIET_BONUS,
+    SAFETY_UTILITY_BONUS, ENERGY_UTILITY_BONUS,
+    NOVELTY_PER_CAPABILITY_TYPE, DEVICE_SERVICE_NOVELTY_BONUS, CROSS_ROOM_NOVELTY_BONUS,
+    VIDEO_RISK, SENSING_RISK, ACCESS_CONTROL_RISK, FRAGILE_ITEM_COUNT, FRAGILE_RISK, MAX_RISK_DEDUCTION,
+    SAFETY_RULE_CAPABILITIES, CONTEXT_RULE_CAPABILITIES
+)
+
 logger = logging.getLogger(__name__)
 
+# Below this many candidates the per-candidate path is cheaper than building matrices
+BATCH_MIN_CANDIDATES = 64
+
 
 @dataclass
 class EvaluationResult:
@@ -65,11 +85,96 @@ class CombinationEvaluator:
             EvaluationResult with scored and ranked combinations
         """
         start_time = time.time()
-        evaluated_combinations = []
-        missing_capabilities = set()
         
         logger.info(f"Evaluating {len(combinations)} combinations")
         
+        if np is not None and len(combinations) >= BATCH_MIN_CANDIDATES:
+            try:
+                evaluated_combinations, missing_capabilities = self._evaluate_batch(
+                    combinations, context_snapshot, user_overlay
+                )
+            except Exception as e:
+                logger.error(f"Batch evaluation failed, scoring candidates one by one: {e}")
+                evaluated_combinations, missing_capabilities = await self._evaluate_each(
+                    combinations, context_snapshot, user_overlay
+                )
+        else:
+            evaluated_combinations, missing_capabilities = await self._evaluate_each(
+                combinations, context_snapshot, user_overlay
+            )
+        
+        evaluation_time = int((time.time() - start_time) * 1000)
+        
+        return EvaluationResult(
+            combinations=evaluated_combinations,
+            missing_capabilities=list(missing_capabilities),
+            evaluation_time_ms=evaluation_time,
+            total_evaluated=len(combinations),
+            feasible_count=len(evaluated_combinations)
+        )
+    
+    def _evaluate_batch(
+        self,
+        combinations: List[CombinationCandidate],
+        context_snapshot: ContextSnapshot,
+        user_overlay: Optional[UserOverlay]
+    ) -> Tuple[List[CombinationCandidate], set]:
+        """Score all combinations with NumPy and write results back onto the feasible ones."""
+        preferred_capabilities = None
+        if user_overlay:
+            time_profile = user_overlay.time_profiles.get(self._get_time_profile_key(context_snapshot), {})
+            preferred_capabilities = time_profile.get("preferred_capabilities")
+        
+        scores = score_batch(
+            combinations,
+            context_snapshot,
+            user_overlay,
+            preferred_capabilities,
+            {rule["type"] for rule in self._safety_rules},
+            {rule["type"] for rule in self._context_rules}
+        )
+        
+        missing_capabilities = set()
+        for row, ids in scores.missing.items():
+            if not scores.feasible[row]:
+                missing_capabilities.update(ids)
+        
+        # Stable descending sort, same tie order as list.sort(reverse=True)
+        feasible_rows = np.nonzero(scores.feasible)[0]
+        order = feasible_rows[np.argsort(-scores.total_value[feasible_rows], kind="stable")]
+        
+        evaluated_combinations = []
+        feasibility = scores.feasibility_score.tolist()
+        total_value = scores.total_value.tolist()
+        context_fit = scores.context_fit.tolist()
+        novelty = scores.novelty_score.tolist()
+        effort = scores.effort_level.tolist()
+        privacy = scores.privacy_level.tolist()
+        safety = scores.safety_level.tolist()
+        for row in order.tolist():
+            combination = combinations[row]
+            combination.feasibility_score = feasibility[row]
+            combination.estimated_value = total_value[row]
+            combination.context_fit = context_fit[row]
+            combination.novelty_score = novelty[row]
+            combination.effort_required = EFFORT_LEVELS[effort[row]]
+            combination.privacy_level = PRIVACY_LEVELS[privacy[row]]
+            combination.safety_level = SAFETY_LEVELS[safety[row]]
+            combination.missing_prerequisites = scores.missing.get(row, [])
+            evaluated_combinations.append(combination)
+        
+        return evaluated_combinations, missing_capabilities
+    
+    async def _evaluate_each(
+        self,
+        combinations: List[CombinationCandidate],
+        context_snapshot: ContextSnapshot,
+        user_overlay: Optional[UserOverlay]
+    ) -> Tuple[List[CombinationCandidate], set]:
+        """Evaluate combinations one at a time."""
+        evaluated_combinations = []
+        missing_capabilities = set()
+        
         for combination in combinations:
             try:
                 # Step 1: Feasibility evaluation
@@ -113,15 +218,7 @@ class CombinationEvaluator:
         # Sort by final value score
         evaluated_combinations.sort(key=lambda c: c.estimated_value, reverse=True)
         
-        evaluation_time = int((time.time() - start_time) * 1000)
-        
-        return EvaluationResult(
-            combinations=evaluated_combinations,
-            missing_capabilities=list(missing_capabilities),
-            evaluation_time_ms=evaluation_time,
-            total_evaluated=len(combinations),
-            feasible_count=len(evaluated_combinations)
-        )
+        return evaluated_combinations, missing_capabilities
     
     async def _evaluate_feasibility(
         self,
@@ -136,33 +233,33 @@ class CombinationEvaluator:
         # Check safety constraints
         safety_result = self._check_safety_constraints(combination)
         if not safety_result["safe"]:
-            feasibility_score *= 0.0
+            feasibility_score *= SAFETY_PENALTY
             issues.append(f"Safety violation: {safety_result['reason']}")
         
         # Check contextual constraints
         context_result = self._check_contextual_constraints(combination, context_snapshot)
         if not context_result["valid"]:
-            feasibility_score *= 0.5
+            feasibility_score *= CONTEXT_PENALTY
             issues.append(f"Context violation: {context_result['reason']}")
         
         # Check device reachability
         reachability_result = self._check_device_reachability(combination)
         if not reachability_result["all_reachable"]:
-            feasibility_score *= 0.8
+            feasibility_score *= UNREACHABLE_PENALTY
             missing_capabilities.extend(reachability_result["unreachable_devices"])
             issues.append("Some devices are unreachable")
         
         # Check service availability
         service_result = self._check_service_availability(combination)
         if not service_result["all_available"]:
-            feasibility_score *= 0.9
+            feasibility_score *= UNAVAILABLE_PENALTY
             missing_capabilities.extend(service_result["unavailable_services"])
             issues.append("Some services are unavailable")
         
         # Check room consistency
         room_result = self._check_room_consistency(combination)
         if not room_result["consistent"]:
-            feasibility_score *= 0.7
+            feasibility_score *= ROOM_CONFLICT_PENALTY
             issues.append("Room configuration issues")
         
         return {
@@ -183,19 +280,19 @@ class CombinationEvaluator:
         
         # Context fit scoring
         context_fit = self._calculate_context_fit(combination, context_snapshot)
-        total_value += context_fit * 0.3
+        total_value += context_fit * CONTEXT_FIT_WEIGHT
         
         # Utility scoring
         utility_score = self._calculate_utility_score(combination)
-        total_value += utility_score * 0.25
+        total_value += utility_score * UTILITY_WEIGHT
         
         # Preference fit scoring
         preference_fit = self._calculate_preference_fit(combination, user_overlay, context_snapshot)
-        total_value += preference_fit * 0.2
+        total_value += preference_fit * PREFERENCE_WEIGHT
         
         # Novelty scoring
         novelty_score = self._calculate_novelty_score(combination)
-        total_value += novelty_score * 0.15
+        total_value += novelty_score * NOVELTY_WEIGHT
         
         # Effort assessment
         effort_required = self._assess_effort_required(combination)
@@ -301,31 +398,31 @@ class CombinationEvaluator:
         if context_snapshot.is_quiet_hours:
             # Prefer quiet combinations during quiet hours
             if not any(d.capability_type == CapabilityType.AUDIO for d in combination.devices):
-                fit_score += 0.3
+                fit_score += QUIET_HOURS_QUIET_BONUS
             else:
-                fit_score -= 0.2
+                fit_score -= QUIET_HOURS_AUDIO_PENALTY
         
         # Weekend vs weekday fit
         if context_snapshot.is_weekend:
             # Prefer comfort and entertainment on weekends
             if any(d.capability_type == CapabilityType.LIGHTING for d in combination.devices):
-                fit_score += 0.2
+                fit_score += WEEKEND_LIGHTING_BONUS
             if any(d.capability_type == CapabilityType.AUDIO for d in combination.devices):
-                fit_score += 0.1
+                fit_score += WEEKEND_AUDIO_BONUS
         
         # Weather fit
         if context_snapshot.weather_conditions:
             weather = context_snapshot.weather_conditions.get("condition", "")
-            if weather in ["rain", "snow", "cloudy"]:
+            if weather in BAD_WEATHER_CONDITIONS:
                 # Prefer lighting during bad weather
                 if any(d.capability_type == CapabilityType.LIGHTING for d in combination.devices):
-                    fit_score += 0.2
+                    fit_score += BAD_WEATHER_LIGHTING_BONUS
         
         # Calendar state fit
         if context_snapshot.calendar_state == "meeting":
             # Prefer quiet, non-disruptive combinations during meetings
             if not any(d.capability_type == CapabilityType.AUDIO for d in combination.devices):
-                fit_score += 0.2
+                fit_score += MEETING_QUIET_BONUS
         
         return min(1.0, max(0.0, fit_score))
     
@@ -334,35 +431,20 @@ class CombinationEvaluator:
         utility_score = 0.0
         
         # Base utility from capability types
-        capability_utilities = {
-            CapabilityType.LIGHTING: 0.3,
-            CapabilityType.SENSING: 0.4,
-            CapabilityType.ACTUATION: 0.2,
-            CapabilityType.AUDIO: 0.2,
-            CapabilityType.VIDEO: 0.5,
-            CapabilityType.SECURITY: 0.6,
-            CapabilityType.CLIMATE: 0.4,
-            CapabilityType.ENERGY: 0.3,
-            CapabilityType.ACCESS_CONTROL: 0.5,
-            CapabilityType.WEATHER: 0.2,
-            CapabilityType.CALENDAR: 0.3,
-            CapabilityType.PRESENCE: 0.4
-        }
-        
         for device in combination.devices:
-            utility_score += capability_utilities.get(device.capability_type, 0.1)
+            utility_score += CAPABILITY_UTILITIES.get(device.capability_type, DEFAULT_UTILITY)
         
         for service in combination.services:
-            utility_score += capability_utilities.get(service.capability_type, 0.1)
+            utility_score += CAPABILITY_UTILITIES.get(service.capability_type, DEFAULT_UTILITY)
         
         # Bonus for safety-related combinations
         if any(d.capability_type in [CapabilityType.SECURITY, CapabilityType.ACCESS_CONTROL] 
                for d in combination.devices):
-            utility_score += 0.2
+            utility_score += SAFETY_UTILITY_BONUS
         
         # Bonus for energy-saving combinations
         if any(d.capability_type == CapabilityType.ENERGY for d in combination.devices):
-            utility_score += 0.1
+            utility_score += ENERGY_UTILITY_BONUS
         
         return min(1.0, utility_score)
     
@@ -381,13 +463,13 @@ class CombinationEvaluator:
         # Device affinities
         for device in combination.devices:
             device_affinity = user_overlay.device_affinities.get(device.device_id, 0.5)
-            preference_score += (device_affinity - 0.5) * 0.1
+            preference_score += (device_affinity - 0.5) * DEVICE_AFFINITY_SCALE
         
         # Room affinities
         for device in combination.devices:
             if device.room:
                 room_affinity = user_overlay.room_affinities.get(device.room, 0.5)
-                preference_score += (room_affinity - 0.5) * 0.05
+                preference_score += (room_affinity - 0.5) * ROOM_AFFINITY_SCALE
         
         # Time profile preferences
         time_key = self._get_time_profile_key(context_snapshot)
@@ -397,7 +479,7 @@ class CombinationEvaluator:
             if "preferred_capabilities" in time_profile:
                 for device in combination.devices:
                     if device.capability_type.value in time_profile["preferred_capabilities"]:
-                        preference_score += 0.1
+                        preference_score += PREFERRED_CAPABILITY_BONUS
         
         return min(1.0, max(0.0, preference_score))
     
@@ -413,11 +495,11 @@ class CombinationEvaluator:
             capability_types.add(service.capability_type)
         
         # More diverse combinations get higher novelty
-        novelty_score += len(capability_types) * 0.1
+        novelty_score += len(capability_types) * NOVELTY_PER_CAPABILITY_TYPE
         
         # Device-service combination bonus
         if combination.devices and combination.services:
-            novelty_score += 0.2
+            novelty_score += DEVICE_SERVICE_NOVELTY_BONUS
         
         # Cross-room combination bonus
         rooms = set()
@@ -425,7 +507,7 @@ class CombinationEvaluator:
             if device.room:
                 rooms.add(device.room)
         if len(rooms) > 1:
-            novelty_score += 0.1
+            novelty_score += CROSS_ROOM_NOVELTY_BONUS
         
         return min(1.0, novelty_score)
     
@@ -463,34 +545,27 @@ class CombinationEvaluator:
         
         # Privacy concerns
         if any(d.capability_type == CapabilityType.VIDEO for d in combination.devices):
-            risk_deduction += 0.1
+            risk_deduction += VIDEO_RISK
         
         if any(d.capability_type == CapabilityType.SENSING for d in combination.devices):
-            risk_deduction += 0.05
+            risk_deduction += SENSING_RISK
         
         # Security risks
         if any(d.capability_type == CapabilityType.ACCESS_CONTROL for d in combination.devices):
-            risk_deduction += 0.05
+            risk_deduction += ACCESS_CONTROL_RISK
         
         # Fragile steps (many dependencies)
-        if len(combination.devices) + len(combination.services) > 4:
-            risk_deduction += 0.1
+        if len(combination.devices) + len(combination.services) > FRAGILE_ITEM_COUNT:
+            risk_deduction += FRAGILE_RISK
         
-        return min(0.3, risk_deduction)  # Cap at 30% risk deduction
+        return min(MAX_RISK_DEDUCTION, risk_deduction)
     
     def _assess_privacy_level(self, combination: CombinationCandidate) -> PrivacyLevel:
         """Assess privacy level of the combination."""
         privacy_score = 0
         
         for device in combination.devices:
-            if device.capability_type == CapabilityType.VIDEO:
-                privacy_score += 3
-            elif device.capability_type == CapabilityType.SENSING:
-                privacy_score += 2
-            elif device.capability_type == CapabilityType.AUDIO:
-                privacy_score += 2
-            elif device.capability_type == CapabilityType.ACCESS_CONTROL:
-                privacy_score += 1
+            privacy_score += PRIVACY_WEIGHTS.get(device.capability_type, 0)
         
         if privacy_score >= 3:
             return PrivacyLevel.SENSITIVE
@@ -506,12 +581,7 @@ class CombinationEvaluator:
         safety_score = 0
         
         for device in combination.devices:
-            if device.capability_type == CapabilityType.ACCESS_CONTROL:
-                safety_score += 2
-            elif device.capability_type == CapabilityType.SECURITY:
-                safety_score += 1
-            elif device.capability_type == CapabilityType.ACTUATION:
-                safety_score += 1
+            safety_score += SAFETY_WEIGHTS.get(device.capability_type, 0)
         
         if safety_score >= 3:
             return SafetyLevel.RESTRICTED
@@ -566,13 +636,13 @@ class CombinationEvaluator:
         # Device affinities
         for device in combination.devices:
             device_affinity = user_overlay.device_affinities.get(device.device_id, 0.5)
-            preference_adjustment += (device_affinity - 0.5) * 0.1
+            preference_adjustment += (device_affinity - 0.5) * DEVICE_AFFINITY_SCALE
         
         # Room affinities
         for device in combination.devices:
             if device.room:
                 room_affinity = user_overlay.room_affinities.get(device.room, 0.5)
-                preference_adjustment += (room_affinity - 0.5) * 0.05
+                preference_adjustment += (room_affinity - 0.5) * ROOM_AFFINITY_SCALE
         
         # Apply adjustment
         combination.estimated_value += preference_adjustment
@@ -580,31 +650,16 @@ class CombinationEvaluator:
     
     def _get_time_profile_key(self, context_snapshot: ContextSnapshot) -> str:
         """Get time profile key for user overlay lookup."""
-        hour = context_snapshot.time_of_day.hour
-        
-        if context_snapshot.is_quiet_hours:
-            return "quiet_hours"
-        elif 6 <= hour < 12:
-            return "morning"
-        elif 12 <= hour < 17:
-            return "afternoon"
-        elif 17 <= hour < 22:
-            return "evening"
-        else:
-            return "night"
+        return time_profile(context_snapshot.time_of_day.hour, context_snapshot.is_quiet_hours)
     
     def _violates_safety_rule(self, combination: CombinationCandidate, rule: Dict[str, Any]) -> bool:
         """Check if combination violates a safety rule."""
-        rule_type = rule["type"]
-        
-        if rule_type == "no_auto_unlock":
-            return any(d.capability_type == CapabilityType.ACCESS_CONTROL for d in combination.devices)
-        
-        if rule_type == "no_remote_security":
-            # This would check if user is away and trying to control security devices
-            return False  # Simplified for now
-        
-        return False
+        # no_remote_security would check if user is away and trying to control
+        # security devices; it has no mapping and never fires for now
+        capability = SAFETY_RULE_CAPABILITIES.get(rule["type"])
+        if capability is None:
+            return False
+        return any(d.capability_type == capability for d in combination.devices)
     
     def _violates_context_rule(
         self,
@@ -613,17 +668,13 @@ class CombinationEvaluator:
         rule: Dict[str, Any]
     ) -> bool:
         """Check if combination violates a context rule."""
-        rule_type = rule["type"]
-        
-        if rule_type == "quiet_hours_audio":
-            if context_snapshot.is_quiet_hours:
-                return any(d.capability_type == CapabilityType.AUDIO for d in combination.devices)
-        
-        if rule_type == "meeting_disruption":
-            if context_snapshot.calendar_state == "meeting":
-                return any(d.capability_type == CapabilityType.AUDIO for d in combination.devices)
-        
-        return False
+        mapping = CONTEXT_RULE_CAPABILITIES.get(rule["type"])
+        if mapping is None:
+            return False
+        applies, capability = mapping
+        if not applies(context_snapshot):
+            return False
+        return any(d.capability_type == capability for d in combination.devices)
     
     def _initialize_outcome_templates(self) -> List[OutcomeTemplate]:
         """Initialize outcome templates."""
@@ -8,7 +8,7 @@ from __future__ import annotations
 import asyncio
 import logging
 from typing import Dict, List, Any, Optional, Tuple
-from datetime import datetime, time
+from datetime import datetime
 from dataclasses import dataclass, field
 import json
 
@@ -18,8 +18,9 @@ from shared.database.models import Device, ApiEndpoint
 
 from .models import (
     DeviceCapability, ServiceCapability, ContextSnapshot, CapabilityType,
-    SuggestionRequest
+    SuggestionRequest, SuggestionConfig
 )
+from .cache import is_quiet_hours
 
 logger = logging.getLogger(__name__)
 
@@ -45,7 +46,8 @@ class DeviceIngestionService:
     - Build capability graph and service readiness map
     """
     
-    def __init__(self):
+    def __init__(self, config: Optional[SuggestionConfig] = None):
+        self.config = config or SuggestionConfig()
         self._session_factory = get_session_factory(settings.database_url)
         self._running = False
         
@@ -276,13 +278,8 @@ class DeviceIngestionService:
         """Create a snapshot of current context."""
         now = datetime.now()
         
-        # Determine if it's quiet hours
-        quiet_hours_start = time(22, 0)  # 10 PM
-        quiet_hours_end = time(7, 0)     # 7 AM
-        is_quiet_hours = (
-            now.time() >= quiet_hours_start or 
-            now.time() <= quiet_hours_end
-        )
+        # Determine if it's quiet hours; the result cache derives the same from the config
+        quiet_hours = is_quiet_hours(now.time(), self.config.quiet_hours_start, self.config.quiet_hours_end)
         
         # Get weather conditions
         weather_conditions = await self._get_current_weather()
@@ -297,7 +294,7 @@ class DeviceIngestionService:
             timestamp=now,
             time_of_day=now.time(),
             is_weekend=now.weekday() >= 5,
-            is_quiet_hours=is_quiet_hours,
+            is_quiet_hours=quiet_hours,
             user_present=user_present,
             user_location=context_hints.get("location") if context_hints else None,
             calendar_state=calendar_state,
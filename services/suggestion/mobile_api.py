@@ -63,6 +63,7 @@ class SuggestionResponseModel(BaseModel):
     what_if_items: List[Dict[str, Any]]
     generated_at: datetime
     expires_at: Optional[datetime] = None
+    cached: bool = False
 
 
 class FeedbackRequestModel(BaseModel):
@@ -231,7 +232,8 @@ async def get_device_suggestions(
             recommendations=recommendations,
             what_if_items=response.what_if_items,
             generated_at=response.generated_at,
-            expires_at=response.expires_at
+            expires_at=response.expires_at,
+            cached=response.cached
         )
         
     except HTTPException:
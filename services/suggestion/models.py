@@ -99,6 +99,9 @@ class SuggestionConfig:
     cloud_sync_optional: bool = True
     quiet_hours_start: str = "22:00"
     quiet_hours_end: str = "07:00"
+    enable_result_cache: bool = True
+    result_cache_ttl_seconds: int = 300  # Serve cached suggestions without revalidating
+    result_cache_stale_seconds: int = 3600  # Serve stale suggestions while revalidating
 
 
 @dataclass
@@ -257,6 +260,9 @@ class SuggestionResponse:
     errors: List[str] = field(default_factory=list)
     warnings: List[str] = field(default_factory=list)
     llm_generated: bool = False
+    generated_at: datetime = field(default_factory=datetime.utcnow)
+    expires_at: Optional[datetime] = None
+    cached: bool = False
 
 
 @dataclass
@@ -7,10 +7,9 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from typing import Dict, List, Any, Optional, Set, Tuple
+from typing import AsyncIterator, Dict, List, Any, Optional, Set, Tuple, Union
 from datetime import datetime
 import time
-import itertools
 import hashlib
 import json
 from dataclasses import dataclass
@@ -19,6 +18,7 @@ from .models import (
     CombinationCandidate, DeviceCapability, ServiceCapability, ContextSnapshot,
     CapabilityType, SuggestionConfig
 )
+from .enumeration import BitmaskEnumerator, ClassEnumerator, TopSelector, select_top
 
 logger = logging.getLogger(__name__)
 
@@ -44,10 +44,19 @@ class PowersetGenerator:
     - Apply early pruning to remove infeasible combinations
     - Collapse equivalent combinations by capability signature
     - Respect strict time budget and always yield candidates
+    
+    Enumeration runs on bitmasks (see ``enumeration.BitmaskEnumerator``) and,
+    with signature reduction on, over signature-equivalence classes
+    (``enumeration.ClassEnumerator``); the per-candidate rule methods below
+    remain the reference semantics.
     """
     
-    def __init__(self, config: SuggestionConfig):
+    def __init__(self, config: SuggestionConfig, powerset_config: Optional[PowersetConfig] = None):
         self.config = config
+        self.powerset_config = powerset_config or PowersetConfig(
+            max_combinations=config.max_combinations,
+            time_budget_ms=config.time_budget_ms
+        )
         self._outcome_templates = self._initialize_outcome_templates()
         self._pruning_rules = self._initialize_pruning_rules()
         
@@ -69,7 +78,6 @@ class PowersetGenerator:
             List of combination candidates
         """
         start_time = time.time()
-        combinations = []
         
         try:
             # Extract devices and services from capability graph
@@ -78,99 +86,122 @@ class PowersetGenerator:
             
             logger.info(f"Generating combinations from {len(devices)} devices and {len(services)} services")
             
-            # Generate combinations of different sizes
-            for size in range(self.config.min_combination_size, 
-                            min(self.config.max_combination_size + 1, len(devices) + len(services) + 1)):
-                
-                # Check time budget
-                if (time.time() - start_time) * 1000 > time_budget_ms:
-                    logger.info(f"Time budget reached, stopping at size {size}")
-                    break
-                
-                # Generate combinations of this size
-                size_combinations = await self._generate_size_combinations(
-                    devices, services, size, context_snapshot, start_time, time_budget_ms
-                )
-                
-                combinations.extend(size_combinations)
-                
-                # Check if we have enough combinations
-                if len(combinations) >= self.config.max_combinations:
-                    logger.info(f"Reached max combinations limit: {len(combinations)}")
-                    break
-            
-            # Apply signature reduction to deduplicate
-            if self.config.enable_signature_reduction:
-                combinations = self._reduce_by_signature(combinations)
-            
-            # Sort by estimated value
-            combinations.sort(key=lambda c: c.estimated_value, reverse=True)
+            enumerator, sizes = self._build_enumerator(devices, services, context_snapshot)
+            leaves, survivors, cut_at = select_top(
+                enumerator,
+                sizes,
+                limit=self.powerset_config.max_combinations,
+                deadline=start_time + time_budget_ms / 1000.0,
+                dedupe=self.powerset_config.enable_signature_reduction
+            )
+            if cut_at is not None:
+                logger.info(f"Time budget reached, stopping at size {cut_at}")
             
-            # Limit to max combinations
-            combinations = combinations[:self.config.max_combinations]
+            all_items = devices + services
+            combinations = [
+                self._materialize(all_items, path, value) for value, path in leaves
+            ]
             
-            logger.info(f"Generated {len(combinations)} unique combinations")
+            logger.info(
+                f"Generated {len(combinations)} unique combinations from {survivors} survivors "
+                f"({enumerator.nodes_visited} nodes visited)"
+            )
             return combinations
             
         except Exception as e:
             logger.error(f"Error generating combinations: {e}")
             return []
     
-    async def _generate_size_combinations(
+    async def iter_combinations(
         self,
-        devices: List[DeviceCapability],
-        services: List[ServiceCapability],
-        size: int,
+        capability_graph: Dict[str, Any],
         context_snapshot: ContextSnapshot,
-        start_time: float,
-        time_budget_ms: int
-    ) -> List[CombinationCandidate]:
-        """Generate combinations of a specific size."""
-        combinations = []
+        time_budget_ms: int = 5000,
+        first_size: int = 2
+    ) -> AsyncIterator[Tuple[List[CombinationCandidate], bool]]:
+        """
+        Progressive form of ``generate_combinations``.
         
-        # Generate all possible combinations of this size
+        Yields ``(combinations, final)`` once sizes up to ``first_size`` are
+        enumerated and again after every larger size. Each yield is the full
+        current top list, best first; the final one equals what
+        ``generate_combinations`` returns. A combination keeps the same
+        candidate object (and combination_id) across yields.
+        """
+        start_time = time.time()
+        deadline = start_time + time_budget_ms / 1000.0
+        devices = self._extract_devices_from_graph(capability_graph)
+        services = self._extract_services_from_graph(capability_graph)
         all_items = devices + services
         
-        for item_indices in itertools.combinations(range(len(all_items)), size):
-            # Check time budget
-            if (time.time() - start_time) * 1000 > time_budget_ms:
-                break
-            
-            # Extract items for this combination
-            combination_devices = []
-            combination_services = []
-            
-            for idx in item_indices:
-                item = all_items[idx]
-                if isinstance(item, DeviceCapability):
-                    combination_devices.append(item)
-                else:
-                    combination_services.append(item)
-            
-            # Create combination candidate
-            candidate = CombinationCandidate(
-                devices=combination_devices,
-                services=combination_services
-            )
-            
-            # Apply early pruning
-            if self.config.enable_early_pruning:
-                if not await self._should_keep_combination(candidate, context_snapshot):
-                    continue
-            
-            # Calculate capability signature
-            candidate.capability_signature = self._calculate_signature(candidate)
-            
-            # Estimate initial value
-            candidate.estimated_value = await self._estimate_combination_value(
-                candidate, context_snapshot
-            )
-            
-            # Check if combination can satisfy any outcome
-            if await self._can_satisfy_outcome(candidate):
-                combinations.append(candidate)
+        enumerator, sizes = self._build_enumerator(devices, services, context_snapshot)
+        selector = TopSelector(
+            enumerator,
+            limit=self.powerset_config.max_combinations,
+            deadline=deadline,
+            dedupe=self.powerset_config.enable_signature_reduction
+        )
+        materialized: Dict[Tuple[int, ...], CombinationCandidate] = {}
+        
+        def current() -> List[CombinationCandidate]:
+            combinations = []
+            for value, path in selector.leaves():
+                if path not in materialized:
+                    materialized[path] = self._materialize(all_items, path, value)
+                combinations.append(materialized[path])
+            return combinations
         
-        return combinations
+        sizes = list(sizes)
+        for position, size in enumerate(sizes):
+            selector.add_size(size)
+            last = selector.done or position == len(sizes) - 1
+            if last or size >= first_size:
+                if selector.cut_at is not None:
+                    logger.info(f"Time budget reached, stopping at size {selector.cut_at}")
+                yield current(), last
+            if last:
+                break
+            # Let streamed results go out before the next (larger) size
+            await asyncio.sleep(0)
+        else:
+            yield [], True
+    
+    def _build_enumerator(
+        self,
+        devices: List[DeviceCapability],
+        services: List[ServiceCapability],
+        context_snapshot: ContextSnapshot
+    ) -> Tuple[Union[BitmaskEnumerator, ClassEnumerator], range]:
+        """Set up the enumerator and the sizes to walk."""
+        cfg = self.powerset_config
+        sizes = range(cfg.min_combination_size,
+                      min(cfg.max_combination_size + 1, len(devices) + len(services) + 1))
+        
+        # Walk all sizes as bitmasks; only the best survivors become candidates
+        enumerator = BitmaskEnumerator(
+            devices, services, context_snapshot, self._get_capability_value,
+            prune=cfg.enable_early_pruning
+        )
+        if cfg.enable_signature_reduction:
+            # Collapse identical devices/services up front and walk class multisets
+            enumerator = ClassEnumerator(enumerator)
+            logger.info(f"Collapsed {len(enumerator.base.items)} items into {len(enumerator.classes)} signature classes")
+        return enumerator, sizes
+    
+    def _materialize(
+        self,
+        all_items: List[Any],
+        path: Tuple[int, ...],
+        value: float
+    ) -> CombinationCandidate:
+        """Build the candidate for an enumerated combination."""
+        candidate = CombinationCandidate(
+            devices=[all_items[i] for i in path if isinstance(all_items[i], DeviceCapability)],
+            services=[all_items[i] for i in path if not isinstance(all_items[i], DeviceCapability)]
+        )
+        candidate.capability_signature = self._calculate_signature(candidate)
+        candidate.estimated_value = value
+        return candidate
     
     async def _should_keep_combination(
         self,
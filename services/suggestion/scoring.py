@@ -0,0 +1,95 @@
+"""
+Scoring Rules
+Weights, penalties and rule definitions shared by the per-candidate and batch evaluators.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Dict, Tuple
+
+from .models import CapabilityType, ContextSnapshot
+
+# Base utility per capability type; anything missing scores DEFAULT_UTILITY
+CAPABILITY_UTILITIES: Dict[CapabilityType, float] = {
+    CapabilityType.LIGHTING: 0.3,
+    CapabilityType.SENSING: 0.4,
+    CapabilityType.ACTUATION: 0.2,
+    CapabilityType.AUDIO: 0.2,
+    CapabilityType.VIDEO: 0.5,
+    CapabilityType.SECURITY: 0.6,
+    CapabilityType.CLIMATE: 0.4,
+    CapabilityType.ENERGY: 0.3,
+    CapabilityType.ACCESS_CONTROL: 0.5,
+    CapabilityType.WEATHER: 0.2,
+    CapabilityType.CALENDAR: 0.3,
+    CapabilityType.PRESENCE: 0.4
+}
+DEFAULT_UTILITY = 0.1
+
+# Per-device contributions to the privacy and safety level scores
+PRIVACY_WEIGHTS: Dict[CapabilityType, int] = {
+    CapabilityType.VIDEO: 3,
+    CapabilityType.SENSING: 2,
+    CapabilityType.AUDIO: 2,
+    CapabilityType.ACCESS_CONTROL: 1,
+}
+SAFETY_WEIGHTS: Dict[CapabilityType, int] = {
+    CapabilityType.ACCESS_CONTROL: 2,
+    CapabilityType.SECURITY: 1,
+    CapabilityType.ACTUATION: 1,
+}
+
+# Feasibility multipliers, applied in this order
+SAFETY_PENALTY = 0.0
+CONTEXT_PENALTY = 0.5
+UNREACHABLE_PENALTY = 0.8
+UNAVAILABLE_PENALTY = 0.9
+ROOM_CONFLICT_PENALTY = 0.7
+
+# Weights of the value components
+CONTEXT_FIT_WEIGHT = 0.3
+UTILITY_WEIGHT = 0.25
+PREFERENCE_WEIGHT = 0.2
+NOVELTY_WEIGHT = 0.15
+
+# Affinity scales for user overlay device and room preferences (neutral at 0.5)
+DEVICE_AFFINITY_SCALE = 0.1
+ROOM_AFFINITY_SCALE = 0.05
+PREFERRED_CAPABILITY_BONUS = 0.1
+
+# Context fit adjustments
+QUIET_HOURS_QUIET_BONUS = 0.3  # no audio during quiet hours
+QUIET_HOURS_AUDIO_PENALTY = 0.2
+WEEKEND_LIGHTING_BONUS = 0.2
+WEEKEND_AUDIO_BONUS = 0.1
+BAD_WEATHER_CONDITIONS = ("rain", "snow", "cloudy")
+BAD_WEATHER_LIGHTING_BONUS = 0.2
+MEETING_QUIET_BONUS = 0.2  # no audio during meetings
+
+# Utility bonuses on top of the per-capability utilities
+SAFETY_UTILITY_BONUS = 0.2  # security or access control devices
+ENERGY_UTILITY_BONUS = 0.1
+
+# Novelty terms
+NOVELTY_PER_CAPABILITY_TYPE = 0.1
+DEVICE_SERVICE_NOVELTY_BONUS = 0.2
+CROSS_ROOM_NOVELTY_BONUS = 0.1
+
+# Risk deductions, capped at MAX_RISK_DEDUCTION
+VIDEO_RISK = 0.1
+SENSING_RISK = 0.05
+ACCESS_CONTROL_RISK = 0.05
+FRAGILE_ITEM_COUNT = 4  # more devices and services than this is fragile
+FRAGILE_RISK = 0.1
+MAX_RISK_DEDUCTION = 0.3
+
+# Safety rule type -> device capability that violates it
+SAFETY_RULE_CAPABILITIES: Dict[str, CapabilityType] = {
+    "no_auto_unlock": CapabilityType.ACCESS_CONTROL,
+}
+
+# Context rule type -> (whether the rule applies in a context, device capability that violates it)
+CONTEXT_RULE_CAPABILITIES: Dict[str, Tuple[Callable[[ContextSnapshot], bool], CapabilityType]] = {
+    "quiet_hours_audio": (lambda ctx: ctx.is_quiet_hours, CapabilityType.AUDIO),
+    "meeting_disruption": (lambda ctx: ctx.calendar_state == "meeting", CapabilityType.AUDIO),
+}
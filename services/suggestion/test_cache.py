@@ -0,0 +1,174 @@
+"""
+Tests for the per-household suggestion cache.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime
+
+from .cache import SuggestionCache, clock_bucket, context_bucket, graph_fingerprint
+from .engine import SuggestionEngine
+from . import ingestion
+from .ingestion import IngestionResult
+from .models import ContextSnapshot, SuggestionConfig, SuggestionRequest
+
+GRAPH = {
+    "devices": {
+        "d1": {"name": "Hall light", "brand": "acme", "model": "b1", "room": "hall",
+               "capabilities": [{"type": "lighting"}], "reachable": True},
+        "d2": {"name": "Hall sensor", "brand": "acme", "model": "s1", "room": "hall",
+               "capabilities": [{"type": "sensing"}], "reachable": True},
+    },
+    "services": {"weather": {"type": "weather", "name": "Weather", "available": True}},
+}
+
+
+def _engine(graph):
+    engine = SuggestionEngine(SuggestionConfig(result_cache_ttl_seconds=60))
+    calls = {"ingest": 0, "evaluate": 0}
+
+    async def ingest(user_id, session_id=None, context_hints=None):
+        calls["ingest"] += 1
+        now = datetime.now()
+        quiet = clock_bucket(now, "22:00", "07:00")[1]
+        snapshot = ContextSnapshot(timestamp=now, time_of_day=now.time(), is_quiet_hours=quiet)
+        return IngestionResult(success=True, capability_graph=graph, context_snapshot=snapshot)
+
+    evaluate = engine._evaluate_combinations
+
+    async def counting_evaluate(*args, **kwargs):
+        calls["evaluate"] += 1
+        return await evaluate(*args, **kwargs)
+
+    engine.ingestion_service.ingest = ingest
+    engine._evaluate_combinations = counting_evaluate
+    return engine, calls
+
+
+def test_fingerprint_ignores_key_order():
+    reordered = {"services": GRAPH["services"], "devices": dict(reversed(list(GRAPH["devices"].items())))}
+    assert graph_fingerprint(GRAPH) == graph_fingerprint(reordered)
+
+
+def test_fresh_hit_skips_pipeline():
+    engine, calls = _engine(GRAPH)
+
+    async def run():
+        first = await engine.generate_suggestions(SuggestionRequest(user_id="u1"))
+        second = await engine.generate_suggestions(SuggestionRequest(user_id="u1"))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert not first.cached and second.cached
+    assert second.request_id != first.request_id
+    assert [r.title for r in second.recommendations] == [r.title for r in first.recommendations]
+    assert calls == {"ingest": 1, "evaluate": 1}
+
+
+def test_invalidation_serves_stale_and_revalidates():
+    graph = {**GRAPH, "devices": dict(GRAPH["devices"])}
+    engine, calls = _engine(graph)
+
+    async def run():
+        await engine.generate_suggestions(SuggestionRequest(user_id="u1"))
+        # Unchanged graph: revalidation re-ingests but skips evaluation
+        engine.invalidate_suggestions("u1")
+        stale = await engine.generate_suggestions(SuggestionRequest(user_id="u1"))
+        await asyncio.gather(*engine._revalidations)
+        assert stale.cached
+        assert calls == {"ingest": 2, "evaluate": 1}
+
+        # A device change reruns the pipeline in the background
+        graph["devices"]["d3"] = {"name": "Thermostat", "brand": "acme", "model": "t1", "room": "hall",
+                                  "capabilities": [{"type": "climate"}], "reachable": True}
+        engine.invalidate_suggestions("u1")
+        await engine.generate_suggestions(SuggestionRequest(user_id="u1"))
+        await asyncio.gather(*engine._revalidations)
+        assert calls == {"ingest": 3, "evaluate": 2}
+
+        fresh = await engine.generate_suggestions(SuggestionRequest(user_id="u1"))
+        assert fresh.cached
+        assert calls == {"ingest": 3, "evaluate": 2}
+
+    asyncio.run(run())
+
+
+def test_expired_entries_are_misses():
+    cache = SuggestionCache(ttl_seconds=0.01, stale_ttl_seconds=0.01)
+    engine, _ = _engine(GRAPH)
+    response = asyncio.run(engine.generate_suggestions(SuggestionRequest(user_id="u2")))
+    household = ("u2", "none", "variant")
+    bucket = ("morning", False, False, True, None, None)
+    cache.store(household, response, "fp", bucket)
+    assert cache.lookup(household, bucket[:3])[1] == "fresh"
+    time.sleep(0.012)
+    assert cache.lookup(household, bucket[:3])[1] == "stale"
+    time.sleep(0.012)
+    assert cache.lookup(household, bucket[:3]) == (None, None)
+
+
+def test_requests_with_other_hints_or_preferences_miss():
+    engine, calls = _engine(GRAPH)
+
+    async def run():
+        plain = await engine.generate_suggestions(SuggestionRequest(user_id="u1"))
+        hinted = await engine.generate_suggestions(
+            SuggestionRequest(user_id="u1", context_hints={"location": "kitchen"})
+        )
+        preferring = await engine.generate_suggestions(
+            SuggestionRequest(user_id="u1", preferences={"lighting": "warm"})
+        )
+        again = await engine.generate_suggestions(
+            SuggestionRequest(user_id="u1", context_hints={"location": "kitchen"})
+        )
+        return plain, hinted, preferring, again
+
+    plain, hinted, preferring, again = asyncio.run(run())
+    assert not plain.cached and not hinted.cached and not preferring.cached
+    assert again.cached
+    assert calls["ingest"] == 3
+
+
+def test_scoring_context_changes_revalidate():
+    base = ContextSnapshot(time_of_day=datetime(2024, 1, 6, 9).time(), is_weekend=True)
+    meeting = ContextSnapshot(time_of_day=base.time_of_day, is_weekend=True, calendar_state="meeting")
+    rainy = ContextSnapshot(time_of_day=base.time_of_day, is_weekend=True, weather_conditions={"condition": "rain"})
+    weekday = ContextSnapshot(time_of_day=base.time_of_day, is_weekend=False)
+    buckets = {context_bucket(c) for c in (base, meeting, rainy, weekday)}
+    assert len(buckets) == 4
+    assert clock_bucket(datetime(2024, 1, 6, 9), "22:00", "07:00") == context_bucket(base)[:3]
+
+
+def test_ingestion_and_cache_clock_share_configured_quiet_hours(monkeypatch):
+    config = SuggestionConfig(quiet_hours_start="20:00", quiet_hours_end="06:00")
+    service = SuggestionEngine(config).ingestion_service
+
+    for hour in (6, 21, 23):
+        now = datetime(2024, 1, 3, hour)
+
+        class _Clock(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return now
+
+        monkeypatch.setattr(ingestion, "datetime", _Clock)
+        snapshot = asyncio.run(service._create_context_snapshot("u1", None, None))
+        assert context_bucket(snapshot)[:3] == clock_bucket(now, config.quiet_hours_start, config.quiet_hours_end)
+    # 21:00 is outside the default window but inside the configured one
+    assert clock_bucket(datetime(2024, 1, 3, 21), "20:00", "06:00")[1]
+
+
+def test_device_change_listener_registers_once():
+    from sqlalchemy import inspect
+    from shared.database.models import Device
+
+    def registered():
+        return len(inspect(Device).dispatch.after_update)
+
+    before = registered()
+    cache = SuggestionCache()
+    cache.listen_for_device_changes()
+    cache.listen_for_device_changes()
+    assert registered() == before + 1
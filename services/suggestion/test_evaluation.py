@@ -0,0 +1,137 @@
+"""
+Tests for batch combination scoring.
+Checks the NumPy path against the per-candidate evaluator.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import random
+import time
+from datetime import time as clock_time
+
+from .evaluation import CombinationEvaluator
+from .models import (
+    CapabilityType, CombinationCandidate, ContextSnapshot, DeviceCapability, ServiceCapability, UserOverlay
+)
+
+ROOMS = ["kitchen", "bedroom", "office", None]
+
+
+def _candidates(n: int, seed: int = 3):
+    rng = random.Random(seed)
+    devices = [
+        DeviceCapability(
+            capability_type=rng.choice(list(CapabilityType)[:10]),
+            device_id=f"d{i}",
+            device_name=f"Device {i}",
+            device_brand="acme",
+            device_model="m1",
+            room=rng.choice(ROOMS),
+            reachable=rng.random() > 0.1,
+        )
+        for i in range(40)
+    ]
+    services = [
+        ServiceCapability(
+            capability_type=rng.choice(list(CapabilityType)[10:]),
+            service_name=f"Service {i}",
+            service_id=f"s{i}",
+            available=rng.random() > 0.2,
+        )
+        for i in range(8)
+    ]
+    return [
+        CombinationCandidate(
+            devices=rng.sample(devices, rng.randint(0, 5)),
+            services=rng.sample(services, rng.randint(0, 2)),
+        )
+        for _ in range(n)
+    ]
+
+
+def _fields(candidate):
+    return (
+        candidate.combination_id,
+        candidate.feasibility_score,
+        candidate.estimated_value,
+        candidate.context_fit,
+        candidate.novelty_score,
+        candidate.effort_required,
+        candidate.privacy_level,
+        candidate.safety_level,
+        candidate.missing_prerequisites,
+    )
+
+
+def test_batch_matches_per_candidate():
+    overlay = UserOverlay(
+        user_id="u1",
+        device_affinities={"d1": 0.9, "d2": 0.1, "d7": 0.7},
+        room_affinities={"kitchen": 0.8, "office": 0.3},
+        time_profiles={"quiet_hours": {"preferred_capabilities": ["lighting", "sensing"]}},
+    )
+    contexts = [
+        ContextSnapshot(is_quiet_hours=True, is_weekend=True, weather_conditions={"condition": "rain"}),
+        ContextSnapshot(is_quiet_hours=False, is_weekend=False, calendar_state="meeting"),
+    ]
+    evaluator = CombinationEvaluator()
+    for ctx in contexts:
+        for user_overlay in (None, overlay):
+            candidates = _candidates(2000)
+            batch = asyncio.run(evaluator.evaluate_combinations(copy.deepcopy(candidates), ctx, "u1", user_overlay))
+            single, missing = asyncio.run(evaluator._evaluate_each(copy.deepcopy(candidates), ctx, user_overlay))
+            assert [_fields(c) for c in batch.combinations] == [_fields(c) for c in single]
+            assert sorted(batch.missing_capabilities) == sorted(missing)
+            assert batch.feasible_count == len(single)
+
+
+def _random_context(rng: random.Random) -> ContextSnapshot:
+    return ContextSnapshot(
+        time_of_day=clock_time(rng.randrange(24)),
+        is_weekend=rng.random() < 0.5,
+        is_quiet_hours=rng.random() < 0.4,
+        calendar_state=rng.choice([None, "free", "busy", "meeting"]),
+        weather_conditions=rng.choice([None, {}, {"condition": "snow"}, {"condition": "sunny"}]),
+    )
+
+
+def _random_overlay(rng: random.Random) -> UserOverlay:
+    capabilities = [cap.value for cap in CapabilityType]
+    return UserOverlay(
+        user_id="u1",
+        device_affinities={f"d{i}": rng.random() for i in rng.sample(range(40), 10)},
+        room_affinities={room: rng.random() for room in ROOMS if room and rng.random() < 0.7},
+        time_profiles={
+            profile: {"preferred_capabilities": rng.sample(capabilities, 3)}
+            for profile in ("quiet_hours", "morning", "afternoon", "evening", "night")
+            if rng.random() < 0.8
+        },
+    )
+
+
+def test_batch_matches_per_candidate_on_random_inputs():
+    for seed in range(12):
+        rng = random.Random(seed)
+        evaluator = CombinationEvaluator()
+        # Drop some rules so the batch path only applies the enabled ones
+        evaluator._safety_rules = [r for r in evaluator._safety_rules if rng.random() < 0.7]
+        evaluator._context_rules = [r for r in evaluator._context_rules if rng.random() < 0.7]
+        ctx = _random_context(rng)
+        user_overlay = _random_overlay(rng) if rng.random() < 0.7 else None
+        candidates = _candidates(300, seed=seed)
+        # Call the NumPy path directly so a fallback to per-candidate scoring can't hide a mismatch
+        batch, batch_missing = evaluator._evaluate_batch(copy.deepcopy(candidates), ctx, user_overlay)
+        single, missing = asyncio.run(evaluator._evaluate_each(copy.deepcopy(candidates), ctx, user_overlay))
+        assert [_fields(c) for c in batch] == [_fields(c) for c in single], seed
+        assert batch_missing == missing, seed
+
+
+def test_batch_scores_ten_thousand_quickly():
+    candidates = _candidates(10_000)
+    evaluator = CombinationEvaluator()
+    started = time.time()
+    result = asyncio.run(evaluator.evaluate_combinations(candidates, ContextSnapshot(), "u1", UserOverlay()))
+    assert result.total_evaluated == 10_000
+    assert time.time() - started < 2.0
@@ -0,0 +1,141 @@
+"""
+Tests for bitmask powerset enumeration.
+Checks the enumerator against a plain itertools walk over the same pruning rules.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+import time
+
+from .models import CapabilityType, CombinationCandidate, ContextSnapshot, DeviceCapability, SuggestionConfig
+from .powerset import PowersetConfig, PowersetGenerator
+
+DEVICE_TYPES = [
+    CapabilityType.LIGHTING, CapabilityType.SENSING, CapabilityType.AUDIO,
+    CapabilityType.SECURITY, CapabilityType.CLIMATE, CapabilityType.ACTUATION,
+]
+SERVICE_TYPES = [CapabilityType.WEATHER, CapabilityType.CALENDAR, CapabilityType.NOTIFICATION]
+ROOMS = ["kitchen", "bedroom", "office", None]
+
+
+def _graph(n_devices: int, n_services: int, seed: int = 7):
+    rng = random.Random(seed)
+    devices = {}
+    for i in range(n_devices):
+        devices[f"d{i}"] = {
+            "name": f"Device {i}",
+            "brand": "acme",
+            "model": "m1",
+            "room": rng.choice(ROOMS),
+            "reachable": rng.random() > 0.1,
+            "capabilities": [{"type": rng.choice(DEVICE_TYPES).value}],
+        }
+    services = {}
+    for i in range(n_services):
+        services[f"s{i}"] = {
+            "type": rng.choice(SERVICE_TYPES).value,
+            "name": f"Service {i}",
+            "available": rng.random() > 0.2,
+        }
+    return {"devices": devices, "services": services}
+
+
+async def _reference(generator: PowersetGenerator, graph, ctx):
+    """The per-tuple walk the enumerator replaces."""
+    cfg = generator.powerset_config
+    devices = generator._extract_devices_from_graph(graph)
+    services = generator._extract_services_from_graph(graph)
+    all_items = devices + services
+    combinations = []
+    for size in range(cfg.min_combination_size, min(cfg.max_combination_size + 1, len(all_items) + 1)):
+        for indices in itertools.combinations(range(len(all_items)), size):
+            items = [all_items[i] for i in indices]
+            candidate = CombinationCandidate(
+                devices=[x for x in items if isinstance(x, DeviceCapability)],
+                services=[x for x in items if not isinstance(x, DeviceCapability)],
+            )
+            if not await generator._should_keep_combination(candidate, ctx):
+                continue
+            candidate.capability_signature = generator._calculate_signature(candidate)
+            candidate.estimated_value = await generator._estimate_combination_value(candidate, ctx)
+            combinations.append(candidate)
+        if len(combinations) >= cfg.max_combinations:
+            break
+    if cfg.enable_signature_reduction:
+        combinations = generator._reduce_by_signature(combinations)
+    combinations.sort(key=lambda c: c.estimated_value, reverse=True)
+    return combinations[: cfg.max_combinations]
+
+
+def _key(candidate):
+    return (
+        [d.device_id for d in candidate.devices],
+        [s.service_id for s in candidate.services],
+        candidate.capability_signature,
+        candidate.estimated_value,
+    )
+
+
+def test_matches_reference_walk():
+    for quiet, present, weekend in [(False, True, False), (True, True, True), (True, False, False)]:
+        ctx = ContextSnapshot(
+            is_quiet_hours=quiet, user_present=present, is_weekend=weekend,
+            weather_conditions={"condition": "rain"},
+        )
+        generator = PowersetGenerator(SuggestionConfig(), PowersetConfig(max_combinations=300, max_combination_size=4))
+        graph = _graph(12, 3)
+        got = asyncio.run(generator.generate_combinations(graph, ctx, time_budget_ms=60_000))
+        want = asyncio.run(_reference(generator, graph, ctx))
+        assert [_key(c) for c in got] == [_key(c) for c in want]
+
+
+def test_class_collapsing_matches_item_walk():
+    # Many identical roomless bulbs and sensors: a handful of classes, thousands of tuples
+    graph = _graph(6, 2)
+    for i in range(14):
+        graph["devices"][f"bulb{i}"] = {
+            "name": f"Bulb {i}", "brand": "acme", "model": "b1", "room": None,
+            "capabilities": [{"type": (CapabilityType.LIGHTING if i % 2 else CapabilityType.SENSING).value}],
+        }
+    ctx = ContextSnapshot(is_quiet_hours=True, is_weekend=False)
+    for limit in (50, 5000):
+        config = PowersetConfig(max_combinations=limit, max_combination_size=4)
+        got = asyncio.run(PowersetGenerator(SuggestionConfig(), config).generate_combinations(graph, ctx, 60_000))
+        want = asyncio.run(_reference(PowersetGenerator(SuggestionConfig(), config), graph, ctx))
+        assert [_key(c) for c in got] == [_key(c) for c in want]
+
+
+def test_without_signature_reduction_keeps_duplicates():
+    config = PowersetConfig(max_combinations=200, max_combination_size=3, enable_signature_reduction=False)
+    generator = PowersetGenerator(SuggestionConfig(), config)
+    graph = _graph(10, 2)
+    got = asyncio.run(generator.generate_combinations(graph, ContextSnapshot(), time_budget_ms=60_000))
+    want = asyncio.run(_reference(generator, graph, ContextSnapshot()))
+    assert [_key(c) for c in got] == [_key(c) for c in want]
+
+
+def test_default_config_generates_candidates():
+    generator = PowersetGenerator(SuggestionConfig())
+    got = asyncio.run(generator.generate_combinations(_graph(6, 2), ContextSnapshot(), time_budget_ms=5_000))
+    assert got
+    assert len({c.capability_signature for c in got}) == len(got)
+
+
+def test_large_home_within_budget():
+    # 60 bulbs and sensors in two rooms: room conflicts prune almost every prefix
+    graph = {"devices": {}, "services": {}}
+    for i in range(60):
+        graph["devices"][f"d{i}"] = {
+            "name": f"Device {i}", "brand": "acme", "model": "m1",
+            "room": "kitchen" if i % 2 else "office",
+            "capabilities": [{"type": (CapabilityType.LIGHTING if i % 3 else CapabilityType.SENSING).value}],
+        }
+    generator = PowersetGenerator(SuggestionConfig(), PowersetConfig(max_combinations=100_000, max_combination_size=5))
+    started = time.time()
+    got = asyncio.run(generator.generate_combinations(graph, ContextSnapshot(), time_budget_ms=5_000))
+    assert (time.time() - started) < 5.0
+    assert got
+    assert max(len(c.devices) for c in got) == 4
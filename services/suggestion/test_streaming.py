@@ -0,0 +1,74 @@
+"""
+Tests for progressive suggestion generation.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+
+from .engine import SuggestionEngine, SuggestionStatus
+from .ingestion import IngestionResult
+from .models import ContextSnapshot, SuggestionConfig, SuggestionRequest
+from .powerset import PowersetConfig, PowersetGenerator
+from .test_powerset import _graph, _key
+
+GRAPH = _graph(10, 3)
+
+
+def _engine(enable_result_cache: bool = False):
+    engine = SuggestionEngine(SuggestionConfig(enable_result_cache=enable_result_cache))
+
+    async def ingest(user_id, session_id=None, context_hints=None):
+        snapshot = ContextSnapshot(timestamp=datetime.now(), is_quiet_hours=False, user_present=True)
+        return IngestionResult(success=True, capability_graph=GRAPH, context_snapshot=snapshot)
+
+    engine.ingestion_service.ingest = ingest
+    return engine
+
+
+async def _collect(engine, request):
+    return [response async for response in engine.stream_suggestions(request)]
+
+
+def test_final_yield_matches_generate_combinations():
+    config = PowersetConfig(max_combinations=100_000, max_combination_size=4)
+    ctx = ContextSnapshot()
+
+    async def run():
+        stages = [stage async for stage in PowersetGenerator(SuggestionConfig(), config).iter_combinations(GRAPH, ctx, 60_000)]
+        want = await PowersetGenerator(SuggestionConfig(), config).generate_combinations(GRAPH, ctx, 60_000)
+        return stages, want
+
+    stages, want = asyncio.run(run())
+    # Sizes 1-2 together, then one stage per larger size
+    assert [final for _, final in stages] == [False, False, True]
+    assert [_key(c) for c in stages[-1][0]] == [_key(c) for c in want]
+
+
+def test_stream_refines_then_completes():
+    request = SuggestionRequest(user_id="u1")
+    responses = asyncio.run(_collect(_engine(), request))
+    expected = asyncio.run(_engine().generate_suggestions(request))
+
+    assert responses[0].status == SuggestionStatus.PARTIAL
+    assert responses[0].recommendations
+    assert responses[-1].status == SuggestionStatus.COMPLETED
+    assert len({r.request_id for r in responses}) == 1
+    assert [r.title for r in responses[-1].recommendations] == [r.title for r in expected.recommendations]
+    assert responses[-1].what_if_items == expected.what_if_items
+
+
+def test_cached_stream_is_single_event():
+    engine = _engine(enable_result_cache=True)
+    request = SuggestionRequest(user_id="u1")
+
+    async def run():
+        first = await _collect(engine, request)
+        second = await _collect(engine, request)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(first) > 1 and not first[-1].cached
+    assert len(second) == 1 and second[0].cached
+    assert [r.title for r in second[0].recommendations] == [r.title for r in first[-1].recommendations]
@@ -0,0 +1,271 @@
+"""
+Device Name Index
+
+Inverted indexes for resolving spoken device names to device IDs.
+"""
+
+import math
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+# Legacy similarity: substring containment scores this, word-set Jaccard must beat the threshold
+CONTAINMENT_SCORE = 0.8
+MATCH_THRESHOLD = 0.7
+
+# Trigram fallback for names that no other rule matches (e.g. "living room lite")
+TRIGRAM_THRESHOLD = 0.5
+EDIT_RATIO_THRESHOLD = 0.8
+
+
+def similarity(text1: str, text2: str) -> float:
+    """Similarity between two lowercase names (exact, containment, then word overlap)."""
+    if text1 == text2:
+        return 1.0
+    if text1 in text2 or text2 in text1:
+        return CONTAINMENT_SCORE
+    words1 = set(text1.split())
+    words2 = set(text2.split())
+    overlap = len(words1 & words2)
+    total = len(words1 | words2)
+    return overlap / total if total > 0 else 0.0
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(text1: str, text2: str, limit: int) -> int:
+    """Levenshtein distance, or ``limit + 1`` once it is known to exceed ``limit``."""
+    if abs(len(text1) - len(text2)) > limit:
+        return limit + 1
+    if len(text1) > len(text2):
+        text1, text2 = text2, text1
+    previous = list(range(len(text2) + 1))
+    for i, c1 in enumerate(text1, 1):
+        # Only cells within ``limit`` of the diagonal can stay under the limit
+        lo = max(1, i - limit)
+        hi = min(len(text2), i + limit)
+        current = [limit + 1] * (len(text2) + 1)
+        current[0] = i
+        for j in range(lo, hi + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (c1 != text2[j - 1]))
+        if min(current[lo - 1:hi + 1]) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+
+def _min_overlap(size: int, threshold: float, strict: bool) -> int:
+    """Fewest shared items a set of ``size`` needs for Jaccard above (or at) ``threshold``."""
+    bound = threshold * size
+    if strict:
+        return max(1, math.floor(bound - 1e-9) + 1)
+    return max(1, math.ceil(bound - 1e-9))
+
+
+class DeviceNameIndex:
+    """
+    Voice names and aliases of mapped devices, indexed for lookup.
+
+    Exact names resolve through a hash map. Fuzzy matching only scores names
+    that can pass: word Jaccard candidates come from a token inverted index
+    with prefix filtering (rarest words first), containment candidates from
+    trigram postings and the substrings of the utterance. Results match a
+    full scan with ``similarity``: best score wins, ties go to the device
+    mapped first. Only when nothing passes does a trigram + edit-distance
+    scorer look for near misses.
+    """
+
+    def __init__(self):
+        self._names: Dict[str, List[str]] = {}          # device_id -> lowercase names
+        self._order: Dict[str, int] = {}                # device_id -> first-mapped sequence
+        self._sequence = 0
+        self._devices: Dict[str, Set[str]] = {}         # name -> device_ids
+        self._words: Dict[str, FrozenSet[str]] = {}     # name -> its words
+        self._tokens: Dict[str, Dict[int, Set[str]]] = {}  # word -> word count -> names
+        self._grams: Dict[str, FrozenSet[str]] = {}     # name -> its trigrams
+        self._trigrams: Dict[str, Set[str]] = {}        # trigram -> names
+        self._heads: Dict[str, Dict[int, int]] = {}     # first three chars -> name length -> count
+        self._short_names: Set[str] = set()             # names under three chars
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, device_id: str, names: List[str]) -> None:
+        """Index (or re-index) a device's names."""
+        if device_id in self._names:
+            self._unindex(device_id)
+        else:
+            self._order[device_id] = self._sequence
+            self._sequence += 1
+        lowered = [name.lower() for name in names]
+        self._names[device_id] = lowered
+        for name in set(lowered):
+            devices = self._devices.setdefault(name, set())
+            if not devices:
+                self._add_name(name)
+            devices.add(device_id)
+
+    def remove(self, device_id: str) -> None:
+        if device_id in self._names:
+            self._unindex(device_id)
+            del self._names[device_id]
+            del self._order[device_id]
+
+    def _unindex(self, device_id: str) -> None:
+        for name in set(self._names[device_id]):
+            devices = self._devices[name]
+            devices.discard(device_id)
+            if not devices:
+                del self._devices[name]
+                self._drop_name(name)
+
+    def _add_name(self, name: str) -> None:
+        words = frozenset(name.split())
+        self._words[name] = words
+        for token in words:
+            self._tokens.setdefault(token, {}).setdefault(len(words), set()).add(name)
+        grams = frozenset(trigrams(name))
+        self._grams[name] = grams
+        for gram in grams:
+            self._trigrams.setdefault(gram, set()).add(name)
+        if len(name) < 3:
+            self._short_names.add(name)
+        else:
+            lengths = self._heads.setdefault(name[:3], {})
+            lengths[len(name)] = lengths.get(len(name), 0) + 1
+
+    def _drop_name(self, name: str) -> None:
+        words = self._words.pop(name)
+        for token in words:
+            by_size = self._tokens[token]
+            self._discard(by_size, len(words), name)
+            if not by_size:
+                del self._tokens[token]
+        for gram in self._grams.pop(name):
+            self._discard(self._trigrams, gram, name)
+        if len(name) < 3:
+            self._short_names.discard(name)
+        else:
+            lengths = self._heads[name[:3]]
+            lengths[len(name)] -= 1
+            if not lengths[len(name)]:
+                del lengths[len(name)]
+                if not lengths:
+                    del self._heads[name[:3]]
+
+    @staticmethod
+    def _discard(index: Dict, key, name: str) -> None:
+        names = index.get(key)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del index[key]
+
+    def _first_device(self, names: List[str]) -> Optional[str]:
+        best = None
+        for name in names:
+            for device_id in self._devices.get(name, ()):
+                if best is None or self._order[device_id] < self._order[best]:
+                    best = device_id
+        return best
+
+    def resolve(self, voice_name: str, fuzzy: bool = True) -> Optional[str]:
+        """Device ID for a spoken name, or None."""
+        query = voice_name.lower().strip()
+        if query in self._devices:
+            return self._first_device([query])
+        if not fuzzy or not query:
+            return None
+
+        # Same scores as ``similarity``: containment first, then word Jaccard
+        contained = self._containment_candidates(query)
+        best_score = CONTAINMENT_SCORE if contained else MATCH_THRESHOLD
+        best_names: List[str] = list(contained)
+        words = frozenset(query.split())
+        for name in self._word_candidates(words, best_score, strict=not contained):
+            if name in contained:
+                continue
+            name_words = self._words[name]
+            score = len(words & name_words) / len(words | name_words)
+            if score > best_score:
+                best_score, best_names = score, [name]
+            elif score == best_score and best_names:
+                best_names.append(name)
+        if best_names:
+            return self._first_device(best_names)
+        return self._near_miss(query)
+
+    def _containment_candidates(self, query: str) -> Set[str]:
+        candidates: Set[str] = set()
+        # Names inside the query start at one of its positions
+        candidates.update(name for name in self._short_names if name in query)
+        for start in range(len(query) - 2):
+            for length in self._heads.get(query[start:start + 3], ()):
+                part = query[start:start + length]
+                if len(part) == length and part in self._devices:
+                    candidates.add(part)
+        # Names containing the query are all posted under its rarest inner trigram
+        if len(query) >= 3:
+            rarest = min(
+                (self._trigrams.get(query[i:i + 3], ()) for i in range(len(query) - 2)),
+                key=len
+            )
+            candidates.update(name for name in rarest if query in name)
+        else:
+            candidates.update(name for name in self._devices if query in name)
+        return candidates
+
+    def _word_candidates(self, words: FrozenSet[str], threshold: float, strict: bool) -> Set[str]:
+        """Names whose word Jaccard with ``words`` can exceed (or, if not strict, reach) ``threshold``."""
+        if not words:
+            return set()
+        # Prefix filter: such a name shares one of the rarest words of the query
+        ordered = sorted(words, key=lambda w: sum(map(len, self._tokens.get(w, {}).values())))
+        prefix = len(ordered) - _min_overlap(len(ordered), threshold, strict) + 1
+        # Size filter: Jaccard is at most the ratio of the smaller set to the larger
+        low = threshold * len(words)
+        high = len(words) / threshold
+        candidates: Set[str] = set()
+        for word in ordered[:prefix]:
+            for size, names in self._tokens.get(word, {}).items():
+                if low < size < high or (not strict and (size == low or size == high)):
+                    candidates.update(names)
+        return candidates
+
+    def _near_miss(self, query: str) -> Optional[str]:
+        grams = trigrams(query)
+        ordered = sorted(grams, key=lambda g: len(self._trigrams.get(g, ())))
+        prefix = len(ordered) - _min_overlap(len(ordered), TRIGRAM_THRESHOLD, strict=False) + 1
+        candidates: Set[str] = set()
+        for gram in ordered[:prefix]:
+            candidates.update(self._trigrams.get(gram, ()))
+
+        # Edit ratio above the threshold bounds the length difference
+        shortest = len(query) * EDIT_RATIO_THRESHOLD
+        longest = len(query) / EDIT_RATIO_THRESHOLD
+        scored: List[Tuple[float, str]] = []
+        for name in candidates:
+            if not shortest < len(name) < longest:
+                continue
+            name_grams = self._grams[name]
+            shared = len(grams & name_grams)
+            jaccard = shared / (len(grams) + len(name_grams) - shared)
+            if jaccard >= TRIGRAM_THRESHOLD:
+                scored.append((jaccard, name))
+        if not scored:
+            return None
+
+        # Confirm the closest few by edit distance
+        scored.sort(key=lambda item: item[0], reverse=True)
+        best_ratio = EDIT_RATIO_THRESHOLD
+        best_names: List[str] = []
+        for _, name in scored[:5]:
+            longer = max(len(query), len(name))
+            limit = math.ceil(longer * (1 - EDIT_RATIO_THRESHOLD))
+            ratio = 1.0 - edit_distance(query, name, limit) / longer
+            if ratio > best_ratio:
+                best_ratio, best_names = ratio, [name]
+            elif ratio == best_ratio:
+                best_names.append(name)
+        return self._first_device(best_names) if best_names else None
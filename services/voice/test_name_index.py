@@ -0,0 +1,129 @@
+"""
+Tests for the voice device name index against the linear scan it replaced.
+"""
+
+import random
+from typing import Dict, List, Optional
+
+from .name_index import MATCH_THRESHOLD, DeviceNameIndex, EDIT_RATIO_THRESHOLD, similarity
+
+WORDS = ["living", "room", "light", "lamp", "kitchen", "bed", "bedroom", "main", "hall",
+         "fan", "tv", "desk", "floor", "ceiling", "left", "right", "a", "up", "on", "ligh"]
+
+
+def _linear_scan(mappings: Dict[str, List[str]], voice_name: str) -> Optional[str]:
+    """The resolver before indexing: exact names first, then the best score in mapping order."""
+    query = voice_name.lower().strip()
+    for device_id, names in mappings.items():
+        if query in [name.lower() for name in names]:
+            return device_id
+    best_match, best_score = None, 0
+    for device_id, names in mappings.items():
+        for name in names:
+            score = similarity(query, name.lower())
+            if score > best_score and score > MATCH_THRESHOLD:
+                best_score, best_match = score, device_id
+    return best_match
+
+
+def _levenshtein(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def _name(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+
+
+def _query(rng: random.Random, names: List[str]) -> str:
+    name = rng.choice(names)
+    words = name.split()
+    kind = rng.randrange(5)
+    if kind == 0:
+        return name.upper()
+    if kind == 1 and len(name) > 3:
+        start = rng.randrange(len(name) - 2)
+        return name[start:start + rng.randint(2, len(name) - start)]
+    if kind == 2:
+        return " ".join(words + [rng.choice(WORDS)])
+    if kind == 3 and len(words) > 1:
+        words.pop(rng.randrange(len(words)))
+        return " ".join(words)
+    return _name(rng)
+
+
+def test_resolve_matches_the_linear_scan():
+    rng = random.Random(20)
+    for _ in range(30):
+        index = DeviceNameIndex()
+        mappings: Dict[str, List[str]] = {}
+        for n in range(rng.randint(5, 60)):
+            names = [_name(rng) for _ in range(rng.randint(1, 3))]
+            mappings[f"d{n}"] = names
+            index.add(f"d{n}", names)
+        all_names = [name for names in mappings.values() for name in names]
+        for _ in range(400):
+            query = _query(rng, all_names)
+            expected = _linear_scan(mappings, query)
+            got = index.resolve(query)
+            if expected is not None:
+                assert got == expected, query
+            elif got is not None:
+                # Only the near-miss fallback may resolve what the scan could not
+                q = query.lower().strip()
+                assert any(
+                    1 - _levenshtein(q, name.lower()) / max(len(q), len(name)) > EDIT_RATIO_THRESHOLD
+                    for name in mappings[got]
+                ), query
+
+
+def test_ties_follow_mapping_order_across_add_remove_and_readd():
+    index = DeviceNameIndex()
+    mappings: Dict[str, List[str]] = {}
+
+    def add(device_id, names):
+        mappings[device_id] = names
+        index.add(device_id, names)
+
+    def remove(device_id):
+        del mappings[device_id]
+        index.remove(device_id)
+
+    add("a", ["Desk Lamp"])
+    add("b", ["desk lamp", "reading light"])
+    add("c", ["desk lamp left"])
+    for query in ("desk lamp", "desk", "lamp left desk"):
+        assert index.resolve(query) == _linear_scan(mappings, query) == ("c" if "left" in query else "a")
+
+    # Re-indexing a mapped device keeps its place
+    add("a", ["desk lamp", "study lamp"])
+    assert index.resolve("desk lamp") == "a"
+
+    # Removing and mapping again moves it behind the others
+    remove("a")
+    assert index.resolve("study lamp") is None
+    add("a", ["desk lamp"])
+    for query in ("desk lamp", "desk"):
+        assert index.resolve(query) == _linear_scan(mappings, query) == "b"
+    assert len(index) == 3
+
+
+def test_near_misses_resolve_only_close_spellings():
+    index = DeviceNameIndex()
+    index.add("light", ["living room light"])
+    index.add("lamp", ["bedroom lamp"])
+    index.add("door", ["garage door"])
+
+    assert index.resolve("living room lite") == "light"
+    assert index.resolve("bedrom lamp") == "lamp"
+    assert index.resolve("garage dor") == "door"
+    # Too far from every name
+    assert index.resolve("kitchen fan") is None
+    assert index.resolve("garden hose") is None
+    assert index.resolve("bedroom lamp", fuzzy=False) == "lamp"
+    assert index.resolve("bedrom lamp", fuzzy=False) is None
@@ -14,9 +14,30 @@ from .models import (
     VoiceCommand, VoiceResponse, Intent, Entity, IntentType, EntityType,
     VoiceAssistant, DeviceVoiceMapping, ConfidenceLevel
 )
+from .name_index import DeviceNameIndex, similarity
 
 logger = logging.getLogger(__name__)
 
+# Device control patterns
+CONTROL_PATTERNS = [
+    (re.compile(r"(turn|switch) (on|off) (?:the )?(.+)"), IntentType.DEVICE_CONTROL),
+    (re.compile(r"(set|adjust) (?:the )?(.+) to (.+)"), IntentType.DEVICE_CONTROL),
+    (re.compile(r"(dim|brighten) (?:the )?(.+)"), IntentType.DEVICE_CONTROL),
+    (re.compile(r"(start|stop|pause) (?:the )?(.+)"), IntentType.DEVICE_CONTROL),
+    (re.compile(r"(open|close) (?:the )?(.+)"), IntentType.DEVICE_CONTROL),
+    (re.compile(r"(lock|unlock) (?:the )?(.+)"), IntentType.DEVICE_CONTROL),
+]
+
+# Status query patterns
+STATUS_PATTERNS = [
+    (re.compile(r"what.+status.+(.+)"), IntentType.DEVICE_STATUS),
+    (re.compile(r"how.+(.+)"), IntentType.DEVICE_STATUS),
+    (re.compile(r"is (?:the )?(.+) (on|off|open|closed|locked|unlocked)"), IntentType.DEVICE_STATUS),
+    (re.compile(r"check (?:the )?(.+)"), IntentType.DEVICE_STATUS),
+]
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
 
 class VoiceManager:
     """Manages voice control integration and command processing."""
@@ -24,6 +45,7 @@ class VoiceManager:
     def __init__(self, config: Dict[str, Any] = None):
         self.config = config or {}
         self.device_mappings: Dict[str, DeviceVoiceMapping] = {}
+        self.name_index = DeviceNameIndex()
         self.command_history: List[VoiceCommand] = []
         self.response_history: List[VoiceResponse] = []
         
@@ -151,33 +173,15 @@ class VoiceManager:
         """Extract intent and entities from text using rule-based NLP."""
         text_lower = text.lower()
         
-        # Device control patterns
-        control_patterns = [
-            (r"(turn|switch) (on|off) (?:the )?(.+)", IntentType.DEVICE_CONTROL),
-            (r"(set|adjust) (?:the )?(.+) to (.+)", IntentType.DEVICE_CONTROL),
-            (r"(dim|brighten) (?:the )?(.+)", IntentType.DEVICE_CONTROL),
-            (r"(start|stop|pause) (?:the )?(.+)", IntentType.DEVICE_CONTROL),
-            (r"(open|close) (?:the )?(.+)", IntentType.DEVICE_CONTROL),
-            (r"(lock|unlock) (?:the )?(.+)", IntentType.DEVICE_CONTROL),
-        ]
-        
-        # Status query patterns
-        status_patterns = [
-            (r"what.+status.+(.+)", IntentType.DEVICE_STATUS),
-            (r"how.+(.+)", IntentType.DEVICE_STATUS),
-            (r"is (?:the )?(.+) (on|off|open|closed|locked|unlocked)", IntentType.DEVICE_STATUS),
-            (r"check (?:the )?(.+)", IntentType.DEVICE_STATUS),
-        ]
-        
         # Try control patterns
-        for pattern, intent_type in control_patterns:
-            match = re.search(pattern, text_lower)
+        for pattern, intent_type in CONTROL_PATTERNS:
+            match = pattern.search(text_lower)
             if match:
                 return await self._create_control_intent(match, intent_type)
                 
         # Try status patterns
-        for pattern, intent_type in status_patterns:
-            match = re.search(pattern, text_lower)
+        for pattern, intent_type in STATUS_PATTERNS:
+            match = pattern.search(text_lower)
             if match:
                 return await self._create_status_intent(match, intent_type)
                 
@@ -264,49 +268,11 @@ class VoiceManager:
         
     async def _resolve_device_name(self, voice_name: str) -> Optional[str]:
         """Resolve voice name to device ID."""
-        voice_name_lower = voice_name.lower().strip()
-        
-        # Exact match
-        for device_id, mapping in self.device_mappings.items():
-            if voice_name_lower in [name.lower() for name in mapping.voice_names]:
-                return device_id
-            if voice_name_lower in [alias.lower() for alias in mapping.aliases]:
-                return device_id
-                
-        # Fuzzy matching
-        if self.enable_fuzzy_matching:
-            best_match = None
-            best_score = 0
-            
-            for device_id, mapping in self.device_mappings.items():
-                all_names = mapping.voice_names + mapping.aliases
-                for name in all_names:
-                    score = self._calculate_similarity(voice_name_lower, name.lower())
-                    if score > best_score and score > 0.7:
-                        best_score = score
-                        best_match = device_id
-                        
-            return best_match
-            
-        return None
+        return self.name_index.resolve(voice_name, fuzzy=self.enable_fuzzy_matching)
         
     def _calculate_similarity(self, text1: str, text2: str) -> float:
         """Calculate similarity between two strings."""
-        # Simple similarity calculation (could use more advanced algorithms)
-        if text1 == text2:
-            return 1.0
-            
-        # Check if one is contained in the other
-        if text1 in text2 or text2 in text1:
-            return 0.8
-            
-        # Check word overlap
-        words1 = set(text1.split())
-        words2 = set(text2.split())
-        overlap = len(words1.intersection(words2))
-        total = len(words1.union(words2))
-        
-        return overlap / total if total > 0 else 0.0
+        return similarity(text1, text2)
         
     async def _generate_response(self, command: VoiceCommand) -> VoiceResponse:
         """Generate response for a voice command."""
@@ -559,7 +525,7 @@ class VoiceManager:
     def _preprocess_text(self, text: str) -> str:
         """Preprocess text for better NLP."""
         # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text.strip())
+        text = WHITESPACE_PATTERN.sub(' ', text.strip())
         
         # Expand contractions
         contractions = {
@@ -606,6 +572,7 @@ class VoiceManager:
             )
             
             self.device_mappings[device_id] = mapping
+            self.name_index.add(device_id, mapping.voice_names + mapping.aliases)
             logger.info(f"Added voice mapping for device {device_id}")
             return True
             
@@ -618,6 +585,7 @@ class VoiceManager:
         try:
             if device_id in self.device_mappings:
                 del self.device_mappings[device_id]
+                self.name_index.remove(device_id)
                 logger.info(f"Removed voice mapping for device {device_id}")
                 return True
             return False